@@ -1,18 +1,37 @@
+import base64
+import binascii
 import secrets
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 
 security = HTTPBasic()
 
 
+def is_authorized(username: str, password: str) -> bool:
+    correct_username = secrets.compare_digest(username, "serenity")
+    correct_password = secrets.compare_digest(password, "feelplango")
+    return correct_username and correct_password
+
+
 def auth(credentials: HTTPBasicCredentials = Depends(security)) -> bool:
-    correct_username = secrets.compare_digest(credentials.username, "serenity")
-    correct_password = secrets.compare_digest(credentials.password, "feelplango")
-    if not (correct_username and correct_password):
+    if not is_authorized(credentials.username, credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Basic"},
         )
     return True
+
+
+def websocket_auth(websocket: WebSocket) -> bool:
+    """Browsers send the basic credentials of the page with the handshake"""
+    scheme, _, param = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "basic":
+        return False
+    try:
+        decoded = base64.b64decode(param).decode("ascii")
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return False
+    username, _, password = decoded.partition(":")
+    return is_authorized(username, password)
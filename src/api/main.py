@@ -1,14 +1,22 @@
+import asyncio
+
+import simplejson  # type: ignore
 import uvicorn
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, status
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+import src.pubsub.log_pub as log_pub
 import src.sentry
+from src.api.auth import websocket_auth
 from src.api.routers.home import router as home_router
 from src.api.routers.robot import router as robot_router
 from src.api.routers.stg import router as stg_router
 from src.flow import flow_api
 from src.monitoring import logger
+from src.monitoring.latency import timings
+from src.pubsub.hub import Client, log_hub
+from src.recorder import book_recorder
 
 app = FastAPI(title="BlackOps API", docs_url="/ctrl", redoc_url="/ctrl-redoc")
 
@@ -19,13 +27,42 @@ app.include_router(robot_router, prefix="/robot", tags=["Robot"])
 app.include_router(home_router, tags=["Home"])
 
 
-# @app.websocket("/ws")
-# async def websocket_endpoint(websocket: WebSocket):
-#     await websocket.accept()
-#     while True:
-#         # data = await websocket.receive_text()
-#         await websocket.send_json({"hello": "world"})
-#         await asyncio.sleep(1)
+async def send_events(websocket: WebSocket, client: Client):
+    while True:
+        events = await client.next_events()
+        await websocket.send_text(simplejson.dumps(events, default=str))
+
+
+async def receive_until_closed(websocket: WebSocket):
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.websocket("/ws")
+async def stream_logs(websocket: WebSocket):
+    """Errors, messages and stats deltas, a json list of events per frame"""
+    if not websocket_auth(websocket):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    client = log_hub.subscribe()
+    tasks = [
+        asyncio.create_task(send_events(websocket, client)),
+        asyncio.create_task(receive_until_closed(websocket)),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception():
+                logger.info(f"/ws: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        log_hub.unsubscribe(client)
 
 
 @app.exception_handler(Exception)
@@ -38,12 +75,15 @@ async def global_exception_handler(request, exc: Exception):
 
 @app.on_event("startup")
 async def startup_event():
-    pass
+    log_hub.start()
+    timings.start_watching_loop()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    await flow_api.stop_all_tasks()
+    await flow_api.shutdown()
+    log_pub.log_publisher.flush()
+    book_recorder.close()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, FastAPI, WebSocket
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
 from src.api.auth import auth
+from src.flow import flow_api
 from src.monitoring import logger
 
 router = APIRouter(dependencies=[Depends(auth)])
@@ -10,3 +11,16 @@ router = APIRouter(dependencies=[Depends(auth)])
 @router.get("/")
 async def root():
     return FileResponse("static/index.html")
+
+
+@router.get("/latency")
+async def latency():
+    """Stage timings in microseconds, LATENCY_TIMERS=1 to collect them"""
+    return await flow_api.latency()
+
+
+@router.get("/metrics")
+async def scrape_metrics():
+    """Prometheus text format"""
+    scrape = await flow_api.scrape()
+    return PlainTextResponse(scrape.text(), media_type="text/plain; version=0.0.4")
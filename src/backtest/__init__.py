@@ -0,0 +1,9 @@
+from .historical import (
+    BacktestResult,
+    MarketData,
+    StrategyParams,
+    Ticks,
+    align,
+    run_backtest,
+    simulate,
+)
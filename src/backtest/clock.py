@@ -0,0 +1,50 @@
+import asyncio
+import selectors
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):  # type: ignore
+    """
+    An event loop whose time only moves when it would otherwise sleep
+
+    Instead of waiting for the next timer the loop jumps to it,
+    every asyncio.sleep and periodic is over as soon as nothing else can run.
+    I/O is still polled, without blocking, as long as any timer is pending
+    """
+
+    def __init__(self, start: float = 0) -> None:
+        super().__init__(selectors.DefaultSelector())
+        self.virtual_time = start
+
+        select = self._selector.select  # type: ignore
+
+        def virtual_select(timeout: Optional[float] = None):
+            if timeout is None:
+                # no timers, only I/O or another thread can wake us up
+                return select(None)
+
+            events = select(0)
+            if not events and timeout > 0:
+                self.virtual_time += timeout
+            return events
+
+        self._selector.select = virtual_select  # type: ignore
+
+    def time(self) -> float:
+        return self.virtual_time
+
+
+def run_virtual(main: Awaitable[T], start: float = 0) -> T:
+    """asyncio.run on a virtual clock"""
+    loop = VirtualClockLoop(start)
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
@@ -0,0 +1,352 @@
+"""
+Sliding window strategy on recorded books, without the event loop
+
+Every book series is aligned as of each leader or follower tick with searchsorted,
+the ticks where a trade is possible at all are found with array masks,
+only those are walked in python to follow the position
+"""
+import bisect
+import math
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Optional
+
+import numpy as np
+
+from src.domain.models import BPS, taker_fee_bps
+from src.numberops import round_decimal_half_up
+from src.recorder import read_all_records
+
+BUY = 1
+SELL = -1
+
+TRADE_DTYPE = np.dtype(
+    [("time", "<i8"), ("side", "<i1"), ("price", "<f8"), ("qty", "<f8")]
+)
+
+NS = 1_000_000_000
+
+
+@dataclass
+class StrategyParams:
+    """
+    robots.sliding.config.Settings as floats, signals in bps
+
+    The waits are how long the robot keeps away after an order
+    """
+
+    buy_bps: float = 12
+    sell_bps: float = 6
+    step_bps: float = 1
+
+    max_step: float = 20
+    quote_step_qty: float = 1000
+    sell_step: float = 2
+    min_sell_qty: float = 300
+    max_spread_bps: float = 15
+
+    fee_bps: float = float(taker_fee_bps)
+
+    wait_before_cancel: float = 0.12
+    wait_after_deliver_buy: float = 0.42
+    wait_after_deliver_sell: float = 0.12
+
+    @classmethod
+    def from_settings(
+        cls, settings: Any, sleep_seconds: Any = None, **kwargs
+    ) -> "StrategyParams":
+        params = dict(
+            buy_bps=float(settings.unit_signal_bps.buy / BPS),
+            sell_bps=float(settings.unit_signal_bps.sell / BPS),
+            step_bps=float(settings.unit_signal_bps.step / BPS),
+            max_step=float(settings.max_step),
+            quote_step_qty=float(settings.quote_step_qty),
+            sell_step=float(settings.sell_step),
+            min_sell_qty=float(settings.min_sell_qty),
+            max_spread_bps=float(settings.max_spread_bps),
+        )
+        if sleep_seconds:
+            params.update(
+                wait_before_cancel=sleep_seconds.wait_before_cancel,
+                wait_after_deliver_buy=sleep_seconds.wait_after_deliver_buy,
+                wait_after_deliver_sell=sleep_seconds.wait_after_deliver_sell,
+            )
+        params.update(kwargs)
+        return cls(**params)
+
+
+@dataclass
+class MarketData:
+    """Recorded books, each with time, ask and bid columns"""
+
+    leader: np.ndarray
+    bridge: np.ndarray
+    follower: np.ndarray
+
+    @classmethod
+    def load(
+        cls, directory: str, leader_key: str, bridge_key: str, follower_key: str
+    ) -> "MarketData":
+        series = []
+        for key in (leader_key, bridge_key, follower_key):
+            records = read_all_records(directory, key)
+            if records is None:
+                raise ValueError(f"no records of {key} in {directory}")
+            series.append(records)
+        return cls(*series)
+
+
+@dataclass
+class Ticks:
+    """Every series as of each leader or follower tick"""
+
+    time: np.ndarray
+    taker_mid: np.ndarray
+    leader_spread_bps: np.ndarray
+    ask: np.ndarray
+    bid: np.ndarray
+    follower_spread_bps: np.ndarray
+    # the follower book changed at this tick, only then the robot buys
+    on_follower: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in TICK_COLUMNS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "Ticks":
+        """Memory mapped read only by default, processes share the pages"""
+        columns = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in TICK_COLUMNS
+        }
+        return cls(**columns)
+
+
+TICK_COLUMNS = tuple(Ticks.__dataclass_fields__)
+
+
+def as_of(series_time: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Index of the last row at or before each time, -1 if none yet"""
+    return np.searchsorted(series_time, times, side="right") - 1
+
+
+def spread_bps(ask: np.ndarray, bid: np.ndarray) -> np.ndarray:
+    mid = (ask + bid) / 2
+    return (ask - bid) / mid / float(BPS)
+
+
+def align(data: MarketData) -> Ticks:
+    # both are sorted already, a merge and a diff beat np.union1d
+    times = np.concatenate([data.leader["time"], data.follower["time"]])
+    times.sort(kind="mergesort")
+    times = times[np.concatenate([[True], np.diff(times) != 0])]
+
+    leader_i = as_of(data.leader["time"], times)
+    bridge_i = as_of(data.bridge["time"], times)
+    follower_i = as_of(data.follower["time"], times)
+
+    # trading starts once every book is there
+    valid = (leader_i >= 0) & (bridge_i >= 0) & (follower_i >= 0)
+    times = times[valid]
+    leader = data.leader[leader_i[valid]]
+    bridge = data.bridge[bridge_i[valid]]
+    follower = data.follower[follower_i[valid]]
+
+    leader_mid = (leader["ask"] + leader["bid"]) / 2
+    bridge_mid = (bridge["ask"] + bridge["bid"]) / 2
+
+    return Ticks(
+        time=times,
+        taker_mid=leader_mid * bridge_mid,
+        leader_spread_bps=spread_bps(leader["ask"], leader["bid"]),
+        ask=np.asarray(follower["ask"]),
+        bid=np.asarray(follower["bid"]),
+        follower_spread_bps=spread_bps(follower["ask"], follower["bid"]),
+        on_follower=np.asarray(follower["time"] == times),
+    )
+
+
+@dataclass
+class BacktestResult:
+    trades: np.ndarray = field(default_factory=lambda: np.empty(0, TRADE_DTYPE))
+
+    base: float = 0
+    quote: float = 0
+    fees: float = 0
+    volume: float = 0
+    pnl: float = 0
+    ticks: int = 0
+    candidates: int = 0
+
+    @property
+    def buys(self) -> int:
+        return int(np.count_nonzero(self.trades["side"] == BUY))
+
+    @property
+    def sells(self) -> int:
+        return int(np.count_nonzero(self.trades["side"] == SELL))
+
+    def summary(self) -> dict:
+        return {
+            "pnl": round(self.pnl, 2),
+            "volume": round(self.volume, 2),
+            "fees": round(self.fees, 2),
+            "buys": self.buys,
+            "sells": self.sells,
+            "base": self.base,
+            "quote": round(self.quote, 2),
+            "ticks": self.ticks,
+            "candidates": self.candidates,
+        }
+
+
+def get_base_step_qty(params: StrategyParams, taker_mid: float) -> float:
+    return float(
+        round_decimal_half_up(Decimal(params.quote_step_qty) / Decimal(taker_mid))
+    )
+
+
+def run_backtest(
+    data: MarketData,
+    params: Optional[StrategyParams] = None,
+    base: float = 0,
+    quote: Optional[float] = None,
+) -> BacktestResult:
+    return simulate(align(data), params, base, quote)
+
+
+def simulate(
+    ticks: Ticks,
+    params: Optional[StrategyParams] = None,
+    base: float = 0,
+    quote: Optional[float] = None,
+) -> BacktestResult:
+    """
+    Buys and sells fill at once at the follower ask and bid, paying the fee
+
+    Every tick may sell, only follower ticks may buy, as in the robot
+
+    quote is enough for max_step buys unless given
+    """
+    params = params or StrategyParams()
+    if not len(ticks):
+        return BacktestResult(base=base, quote=quote or 0)
+
+    base_step_qty = get_base_step_qty(params, float(ticks.taker_mid[0]))
+    if quote is None:
+        quote = params.quote_step_qty * params.max_step
+    start_value = quote + base * (ticks.ask[0] + ticks.bid[0]) / 2
+
+    buy_edge = (1 - ticks.ask / ticks.taker_mid) / float(BPS)
+    sell_edge = (ticks.bid / ticks.taker_mid - 1) / float(BPS)
+
+    # the signals move with the step, take the loosest step possible
+    most_steps = max(params.max_step, base / base_step_qty) + 1
+    spread_ok = (ticks.leader_spread_bps <= params.max_spread_bps) & (
+        ticks.follower_spread_bps <= params.max_spread_bps
+    )
+    can_buy = ticks.on_follower & spread_ok & (buy_edge >= params.buy_bps)
+    can_sell = sell_edge >= params.sell_bps - params.step_bps * most_steps
+    candidates = np.flatnonzero(can_buy | can_sell)
+
+    fee_rate = params.fee_bps * float(BPS)
+    order_wait = int(params.wait_before_cancel * NS)
+    buy_wait = order_wait + int(params.wait_after_deliver_buy * NS)
+    sell_wait = order_wait + int(params.wait_after_deliver_sell * NS)
+
+    # python floats, numpy scalars are slow one at a time
+    time_list = ticks.time[candidates].tolist()
+    buy_list = buy_edge[candidates].tolist()
+    sell_list = sell_edge[candidates].tolist()
+    can_buy_list = can_buy[candidates].tolist()
+    buy_positions = np.flatnonzero(can_buy[candidates]).tolist()
+    ask_list = ticks.ask[candidates].tolist()
+    bid_list = ticks.bid[candidates].tolist()
+
+    buy_bps, sell_bps, step_bps = params.buy_bps, params.sell_bps, params.step_bps
+
+    trades = []
+    next_buy = next_sell = np.iinfo(np.int64).min
+    fees = volume = 0.0
+
+    k = 0
+    while k < len(time_list):
+        t = time_list[k]
+        step = base / base_step_qty
+        traded = False
+
+        # sell first, as the robot does
+        if t >= next_sell and sell_list[k] >= sell_bps - step_bps * step:
+            qty = float(int(min(base_step_qty * params.sell_step, math.floor(base))))
+            price = bid_list[k]
+            if qty and qty * price >= params.min_sell_qty:
+                fee = qty * price * fee_rate
+                base -= qty
+                quote += qty * price - fee
+                fees += fee
+                volume += qty * price
+                trades.append((t, SELL, price, qty))
+                next_sell = t + sell_wait
+                next_buy = max(next_buy, t + order_wait)
+                traded = True
+
+        if (
+            not traded
+            and t >= next_buy
+            and can_buy_list[k]
+            and buy_list[k] >= buy_bps + step_bps * step
+            and params.max_step - step >= 1
+        ):
+            qty = float(int(base_step_qty))
+            price = ask_list[k]
+            if qty and quote >= qty * price:
+                fee = qty * price * fee_rate
+                base += qty
+                quote -= qty * price + fee
+                fees += fee
+                volume += qty * price
+                trades.append((t, BUY, price, qty))
+                next_buy = t + buy_wait
+                next_sell = max(next_sell, t + order_wait)
+                traded = True
+
+        if traded:
+            # skip the ticks the robot sleeps through
+            k = max(k + 1, bisect.bisect_left(time_list, t + order_wait))
+        elif base < 1:
+            # nothing to sell, only a buy can happen next
+            i = bisect.bisect_right(buy_positions, k)
+            k = buy_positions[i] if i < len(buy_positions) else len(time_list)
+        else:
+            k += 1
+
+    last_mid = (ticks.ask[-1] + ticks.bid[-1]) / 2
+    return BacktestResult(
+        trades=np.array(trades, dtype=TRADE_DTYPE),
+        base=base,
+        quote=quote,
+        fees=fees,
+        volume=volume,
+        pnl=float(quote + base * last_mid - start_value),
+        ticks=len(ticks),
+        candidates=len(candidates),
+    )
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    from src.environment import sleep_seconds
+    from src.robots.sliding.config import settings
+
+    directory, leader_key, bridge_key, follower_key = sys.argv[1:5]
+    data = MarketData.load(directory, leader_key, bridge_key, follower_key)
+    params = StrategyParams.from_settings(settings, sleep_seconds)
+    print(json.dumps(run_backtest(data, params).summary(), indent=2))
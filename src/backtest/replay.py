@@ -0,0 +1,209 @@
+"""
+The real LeaderFollowerTrader on recorded books, on a virtual clock
+
+Pubs read the recorded books as stream frames, orders go to the testnet exchange,
+every sleep and periodic jumps ahead instead of waiting.
+The same books and seed give the same orders every time
+
+    python -m src.backtest.replay <record dir> <leader key> <bridge key> <follower key>
+"""
+import asyncio
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import src.streams.btcturk as btc_streams
+from src.domain import Asset
+from src.domain.frames import BookFrame, BookTicker, Level
+from src.exchanges.binance.main import BinanceBase
+from src.exchanges.btcturk.testnet.dummy import BtcturkDummy
+from src.exchanges.btcturk.testnet.testnet import BtcturkApiClientTestnet
+from src.pubsub.pubs import BalancePub, BinancePub, BTPub
+from src.robots.sliding.main import LeaderFollowerTrader
+from src.stgs.sliding.config import LeaderFollowerConfig
+from src.stgs.sliding.inputs import LeaderFollowerInput
+from src.streams.queued import LEADER, SOURCES, use_queues
+
+from .clock import run_virtual
+from .historical import NS, MarketData
+
+
+def format_levels(row, side: str, price: float) -> List[Level]:
+    if side in (row.dtype.names or ()):
+        levels = [Level(str(p), str(a)) for p, a in row[side].tolist() if a > 0]
+        if levels:
+            return levels
+    return [Level(str(price), "1")]
+
+
+def create_leader_frame(row) -> BookTicker:
+    return BookTicker(ask=str(row["ask"]), bid=str(row["bid"]))
+
+
+def create_bt_frame(row) -> BookFrame:
+    return BookFrame(
+        type=btc_streams.ORDERBOOK_FULL,
+        sequence=int(row["seen"]),
+        asks=format_levels(row, "asks", float(row["ask"])),
+        bids=format_levels(row, "bids", float(row["bid"])),
+    )
+
+
+def merge(data: MarketData) -> Iterator[Tuple[int, str, np.void]]:
+    """Rows of every series, oldest first"""
+    series = (data.leader, data.bridge, data.follower)
+    times = np.concatenate([s["time"] for s in series])
+    sources = np.concatenate([np.full(len(s), i) for i, s in enumerate(series)])
+    rows = np.concatenate([np.arange(len(s)) for s in series])
+
+    for i in np.argsort(times, kind="stable").tolist():
+        source = int(sources[i])
+        yield int(times[i]), SOURCES[source], series[source][rows[i]]
+
+
+@dataclass
+class ReplayResult:
+    frames: int = 0
+    virtual_seconds: float = 0
+    wall_seconds: float = 0
+    stats: dict = field(default_factory=dict)
+    balances: Dict[str, str] = field(default_factory=dict)
+    orders: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class Replay:
+    data: MarketData
+    base: str = "XRP"
+    quote: str = "TRY"
+    bridge: str = "USDT"
+    balances: Dict[str, Decimal] = field(default_factory=dict)
+    seed: int = 0
+    tail_seconds: float = 1  # let the last orders play out
+
+    def __post_init__(self):
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.robot: Optional[LeaderFollowerTrader] = None
+
+    def create_robot(self, start_time: float) -> LeaderFollowerTrader:
+        loop = asyncio.get_running_loop()
+
+        dummy = BtcturkDummy(
+            rnd=random.Random(self.seed), clock=lambda: start_time + loop.time()
+        )
+        balances = {self.base: Decimal(0), self.quote: Decimal(0), **self.balances}
+        for symbol, amount in balances.items():
+            dummy.add_balance(Asset(symbol=symbol), amount)
+
+        exchange = BtcturkApiClientTestnet(dummy_exchange=dummy)
+        exchange.limits.use_clock(loop.time)
+
+        balance_pub = BalancePub(pubsub_key="replay_balance", exchange=exchange)
+        balance_pub.add_asset(Asset(symbol=self.base))
+        balance_pub.add_asset(Asset(symbol=self.quote))
+
+        leader_pub = BinancePub(
+            pubsub_key="replay_leader",
+            api_client=BinanceBase(),
+            symbol=self.base + self.bridge,
+        )
+        bridge_pub = BTPub(
+            pubsub_key="replay_bridge",
+            api_client=exchange,
+            symbol=self.bridge + self.quote,
+        )
+        follower_pub = BTPub(
+            pubsub_key="replay_follower",
+            api_client=exchange,
+            symbol=self.base + self.quote,
+        )
+
+        config = LeaderFollowerConfig(
+            input=LeaderFollowerInput(
+                base=self.base, quote=self.quote, bridge=self.bridge
+            )
+        )
+        return LeaderFollowerTrader(
+            config=config,
+            leader_pub=leader_pub,
+            follower_pub=follower_pub,
+            bridge_pub=bridge_pub,
+            balance_pub=balance_pub,
+        )
+
+    async def feed(self, first_time: int) -> int:
+        loop = asyncio.get_running_loop()
+
+        frames = 0
+        for t, source, row in merge(self.data):
+            delay = (t - first_time) / NS - loop.time()
+            await asyncio.sleep(max(delay, 0))
+
+            if source == LEADER:
+                frame = create_leader_frame(row)
+            else:
+                frame = create_bt_frame(row)
+            self.queues[source].put_nowait(frame)
+            frames += 1
+
+        for queue in self.queues.values():
+            await queue.join()
+        return frames
+
+    async def run(self) -> ReplayResult:
+        first_time = int(
+            min(
+                s["time"][0]
+                for s in (self.data.leader, self.data.bridge, self.data.follower)
+            )
+        )
+        robot = self.robot = self.create_robot(first_time / NS)
+        self.queues = await use_queues(
+            (robot.leader_pub, robot.bridge_pub, robot.follower_pub)
+        )
+
+        pubs = [
+            robot.leader_pub,
+            robot.bridge_pub,
+            robot.follower_pub,
+            robot.balance_pub,
+        ]
+        tasks = [asyncio.create_task(pub.run()) for pub in pubs]  # type: ignore
+        tasks.append(asyncio.create_task(robot.run()))
+
+        wall = time.perf_counter()
+        try:
+            frames = await self.feed(first_time)
+            await asyncio.sleep(self.tail_seconds)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        dummy = robot.follower_pub.api_client.dummy_exchange  # type: ignore
+        return ReplayResult(
+            frames=frames,
+            virtual_seconds=asyncio.get_running_loop().time(),
+            wall_seconds=time.perf_counter() - wall,
+            stats=asdict(robot.order_api.stats),
+            balances={s: str(a.free) for s, a in dummy.account.assets.items()},
+            orders=[o.dict() for o in dummy.account.all_orders],
+        )
+
+
+def run_replay(data: MarketData, **kwargs) -> ReplayResult:
+    return run_virtual(Replay(data=data, **kwargs).run())
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    record_dir, leader_key, bridge_key, follower_key = sys.argv[1:5]
+    data = MarketData.load(record_dir, leader_key, bridge_key, follower_key)
+    result = run_replay(data, balances={"TRY": Decimal(40000)})
+    print(json.dumps(asdict(result), indent=2, default=str))
@@ -0,0 +1,133 @@
+"""
+Try many StrategyParams on the same books, one chunk of them per process
+
+The books are aligned once and saved as .npy files,
+every worker maps them read only instead of getting a pickled copy
+"""
+import itertools
+import os
+import random
+from concurrent.futures import Executor, as_completed
+from dataclasses import replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.proc import process_pool_executor
+
+from .historical import MarketData, StrategyParams, Ticks, align, simulate
+
+Overrides = Dict[str, float]
+
+# ticks of a directory, loaded once per worker
+_ticks: Dict[str, Ticks] = {}
+
+
+def grid_search(space: Dict[str, Sequence[float]]) -> List[Overrides]:
+    """Every combination of the values"""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+
+def random_search(
+    space: Dict[str, Tuple[float, float]], n: int, seed: int = 0
+) -> List[Overrides]:
+    """n draws, each key uniform in its (low, high)"""
+    rnd = random.Random(seed)
+    return [
+        {key: rnd.uniform(low, high) for key, (low, high) in space.items()}
+        for _ in range(n)
+    ]
+
+
+def check_keys(combos: List[Overrides]) -> None:
+    fields = set(StrategyParams.__dataclass_fields__)
+    for combo in combos:
+        unknown = set(combo) - fields
+        if unknown:
+            raise ValueError(f"not a StrategyParams field: {unknown}")
+
+
+def prepare(data: MarketData, directory: str) -> str:
+    """Align the books once, for every worker to map"""
+    align(data).save(directory)
+    return directory
+
+
+def get_ticks(directory: str) -> Ticks:
+    if directory not in _ticks:
+        _ticks[directory] = Ticks.load(directory)
+    return _ticks[directory]
+
+
+def run_chunk(directory: str, base: StrategyParams, combos: List[Overrides]) -> list:
+    ticks = get_ticks(directory)
+    rows = []
+    for combo in combos:
+        result = simulate(ticks, replace(base, **combo))
+        summary = result.summary()
+        summary["pnl/volume bps"] = (
+            round(result.pnl / result.volume * 10000, 2) if result.volume else 0
+        )
+        rows.append({**combo, **summary})
+    return rows
+
+
+def chunk(combos: List[Overrides], size: int) -> List[List[Overrides]]:
+    return [combos[i : i + size] for i in range(0, len(combos), size)]
+
+
+def run_sweep(
+    directory: str,
+    combos: List[Overrides],
+    base: Optional[StrategyParams] = None,
+    executor: Executor = process_pool_executor,
+    chunk_size: Optional[int] = None,
+) -> List[dict]:
+    """Rows of overrides and results, best pnl first"""
+    check_keys(combos)
+    base = base or StrategyParams()
+
+    if not chunk_size:
+        # a few chunks per core keeps them all busy till the end
+        chunk_size = max(1, len(combos) // ((os.cpu_count() or 1) * 4))
+
+    futures = [
+        executor.submit(run_chunk, directory, base, part)
+        for part in chunk(combos, chunk_size)
+    ]
+
+    rows = []
+    for future in as_completed(futures):
+        rows += future.result()
+
+    return sorted(rows, key=lambda row: row["pnl"], reverse=True)
+
+
+def format_table(rows: List[dict], top: int = 20) -> str:
+    if not rows:
+        return ""
+    keys = list(rows[0])
+    lines = ["\t".join(keys)]
+    lines += ["\t".join(str(row[key]) for key in keys) for row in rows[:top]]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from src.environment import sleep_seconds
+    from src.robots.sliding.config import settings
+
+    record_dir, leader_key, bridge_key, follower_key, ticks_dir = sys.argv[1:6]
+    data = MarketData.load(record_dir, leader_key, bridge_key, follower_key)
+    prepare(data, ticks_dir)
+
+    combos = grid_search(
+        {
+            "buy_bps": [8, 10, 12, 14, 16],
+            "sell_bps": [2, 4, 6, 8],
+            "step_bps": [0, 0.5, 1, 2],
+            "max_step": [10, 20, 30],
+        }
+    )
+    base = StrategyParams.from_settings(settings, sleep_seconds)
+    print(format_table(run_sweep(ticks_dir, combos, base)))
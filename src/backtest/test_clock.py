@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from .clock import run_virtual
+
+
+async def sleep_a_day():
+    loop = asyncio.get_running_loop()
+    woke = []
+
+    async def sleeper(name: str, seconds: float):
+        await asyncio.sleep(seconds)
+        woke.append((name, loop.time()))
+
+    await asyncio.gather(sleeper("b", 3600), sleeper("a", 0.12), sleeper("c", 86400))
+    return woke
+
+
+def test_virtual_sleeps():
+    start = time.perf_counter()
+    woke = run_virtual(sleep_a_day())
+    assert time.perf_counter() - start < 1
+
+    assert [name for name, _ in woke] == ["a", "b", "c"]
+    assert [round(t, 6) for _, t in woke] == [0.12, 3600, 86400]
+
+
+def test_same_every_time():
+    async def race():
+        order = []
+
+        async def tick(name: str, every: float):
+            for _ in range(50):
+                await asyncio.sleep(every)
+                order.append(name)
+
+        await asyncio.gather(tick("x", 0.2), tick("y", 0.3), tick("z", 0.7))
+        return order
+
+    assert run_virtual(race()) == run_virtual(race())
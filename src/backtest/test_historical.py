@@ -0,0 +1,68 @@
+import numpy as np
+
+from src.recorder.format import row_dtype
+
+from .historical import BUY, NS, SELL, MarketData, StrategyParams, as_of, run_backtest
+
+
+def create_series(rows) -> np.ndarray:
+    """(seconds, ask, bid) rows"""
+    series = np.zeros(len(rows), dtype=row_dtype(0))
+    for i, (seconds, ask, bid) in enumerate(rows):
+        series[i] = (int(seconds * NS), i + 1, ask, bid)
+    return series
+
+
+def create_market_data(follower_rows) -> MarketData:
+    return MarketData(
+        leader=create_series([(0, 1.00005, 0.99995)]),
+        bridge=create_series([(0, 10.0005, 9.9995)]),
+        follower=create_series(follower_rows),
+    )
+
+
+def test_as_of():
+    times = np.array([5, 10, 20])
+    assert as_of(times, np.array([1, 5, 12, 30])).tolist() == [-1, 0, 1, 2]
+
+
+def test_buy_then_sell():
+    data = create_market_data(
+        [
+            (0.5, 10.001, 9.999),  # nothing to do
+            (1.0, 9.98, 9.979),  # 20 bps under, buy
+            (1.1, 9.97, 9.969),  # waiting after the buy
+            (2.0, 10.02, 10.01),  # 10 bps over, sell
+        ]
+    )
+    result = run_backtest(data, StrategyParams(fee_bps=0))
+
+    assert result.trades["side"].tolist() == [BUY, SELL]
+    assert result.trades["price"].tolist() == [9.98, 10.01]
+    assert result.trades["qty"].tolist() == [100, 100]
+    assert result.base == 0
+    assert round(result.pnl, 6) == 3.0
+    assert result.candidates == 4  # the first may sell at a deep step
+
+
+def test_fees_and_spread():
+    data = create_market_data([(1.0, 9.98, 9.9)])  # 80 bps wide, no buy
+    assert not len(run_backtest(data).trades)
+
+    data = create_market_data([(1.0, 9.98, 9.979)])
+    result = run_backtest(data, StrategyParams(fee_bps=10))
+    assert round(result.fees, 6) == round(998 * 0.001, 6)
+    assert round(result.quote, 6) == round(20000 - 998 - 0.998, 6)
+
+
+def test_buys_on_follower_ticks_only():
+    data = create_market_data([(1.0, 9.98, 9.979)])
+    # the leader moves later, the follower ask is still 20 bps under
+    data.leader = create_series([(0, 1.00005, 0.99995), (2.0, 1.00006, 0.99994)])
+
+    result = run_backtest(data, StrategyParams(fee_bps=0, max_step=1))
+    assert result.trades["time"].tolist() == [1 * NS]
+
+    # the first follower tick is before the leader is there, no buy at all
+    data.leader = create_series([(2.0, 1.00005, 0.99995)])
+    assert not len(run_backtest(data, StrategyParams(fee_bps=0)).trades)
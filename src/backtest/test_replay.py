@@ -0,0 +1,33 @@
+from decimal import Decimal
+
+from .historical import MarketData
+from .replay import run_replay
+from .test_historical import create_series
+
+
+def create_swings() -> MarketData:
+    """The follower swings 2% around leader mid * bridge mid, buys and sells"""
+    follower = []
+    for i in range(40):
+        mid = 10 * (0.98 if i % 8 < 4 else 1.02)
+        follower.append((0.5 * (i + 1), round(mid + 0.001, 3), round(mid - 0.001, 3)))
+
+    return MarketData(
+        # the robot acts when the leader mid changes
+        leader=create_series(
+            [(0.25 * i, 1.00005 + i % 2 * 1e-5, 0.99995) for i in range(100)]
+        ),
+        bridge=create_series([(0.25 * i, 10.0005, 9.9995) for i in range(100)]),
+        follower=create_series(follower),
+    )
+
+
+def test_replay_is_deterministic():
+    data = create_swings()
+    first = run_replay(data, balances={"TRY": Decimal(40000)}, seed=1)
+    second = run_replay(data, balances={"TRY": Decimal(40000)}, seed=1)
+
+    assert first.orders
+    assert first.orders == second.orders
+    assert first.stats == second.stats
+    assert first.balances == second.balances
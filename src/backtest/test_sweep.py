@@ -0,0 +1,42 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from .historical import StrategyParams, run_backtest
+from .sweep import grid_search, prepare, random_search, run_sweep
+from .test_historical import create_market_data
+
+
+def test_search_spaces():
+    combos = grid_search({"buy_bps": [10, 12], "sell_bps": [4, 6, 8]})
+    assert len(combos) == 6
+    assert combos[0] == {"buy_bps": 10, "sell_bps": 4}
+
+    combos = random_search({"buy_bps": (5, 20)}, n=10, seed=1)
+    assert len(combos) == 10
+    assert all(5 <= c["buy_bps"] <= 20 for c in combos)
+    assert combos == random_search({"buy_bps": (5, 20)}, n=10, seed=1)
+
+
+def test_run_sweep(tmp_path):
+    data = create_market_data(
+        [
+            (1.0, 9.98, 9.979),  # 20 bps under
+            (2.0, 10.02, 10.01),  # 10 bps over
+        ]
+    )
+    directory = prepare(data, str(tmp_path))
+    combos = grid_search({"buy_bps": [10, 30], "sell_bps": [5, 15]})
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        rows = run_sweep(directory, combos, executor=executor, chunk_size=1)
+
+    assert len(rows) == 4
+    assert [row["pnl"] for row in rows] == sorted(
+        (row["pnl"] for row in rows), reverse=True
+    )
+
+    for row in rows:
+        params = StrategyParams(buy_bps=row["buy_bps"], sell_bps=row["sell_bps"])
+        assert row["pnl"] == round(run_backtest(data, params).pnl, 2)
+
+    # 30 bps is never reached, no trades
+    assert [row["buys"] for row in rows if row["buy_bps"] == 30] == [0, 0]
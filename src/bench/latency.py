@@ -0,0 +1,306 @@
+"""
+Tick to order latency
+
+Replays leader, bridge and follower frames through the real pubs and
+LeaderFollowerTrader, orders go to a local BTCTurk stand-in
+
+    python -m src.bench.latency [frames.jsonl]
+
+A frames file has one {"source": "leader" | "bridge" | "follower", "frame": {..}}
+per line, without one a seeded random walk is replayed
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+import src.streams.btcturk as btc_streams
+from src.domain import Asset
+from src.domain.frames import BookFrame, BookTicker
+from src.environment import sleep_seconds
+from src.exchanges.binance.main import BinanceBase
+from src.exchanges.btcturk.main import BtcturkApiClient
+from src.exchanges.btcturk.testnet.server import BtcturkStandin
+from src.exchanges.limits import RateLimits, TokenBucket
+from src.monitoring.latency import timings
+from src.pubsub.pubs import BalancePub, BinancePub, BTPub
+from src.robots.sliding.main import LeaderFollowerTrader
+from src.stgs.sliding.config import LeaderFollowerConfig
+from src.stgs.sliding.inputs import LeaderFollowerInput
+from src.streams.decode import book_frame_of, book_ticker_of
+from src.streams.queued import BRIDGE, FOLLOWER, LEADER, use_queues
+
+Frame = Tuple[str, dict]
+
+PERCENTILES = (50, 99, 99.9)
+
+# the robot waits for fills, the bench only cares about the code path
+NO_WAITS = {
+    "wait_before_cancel": 0,
+    "wait_after_deliver_sell": 0,
+    "wait_after_deliver_buy": 0,
+    "wait_after_failed_order": 0,
+}
+
+
+def create_frames(n: int = 5000, seed: int = 7) -> List[Frame]:
+    """
+    XRPUSDT book tickers, USDTTRY and XRPTRY order book diffs
+
+    The follower mid wanders around leader mid * bridge mid,
+    far enough now and then to buy or sell
+    """
+    rnd = random.Random(seed)
+
+    leader_mid = 0.8
+    bridge_bid, bridge_ask = "13.50", "13.51"
+    follower = {"ask": "", "bid": ""}
+    sequence = 0
+
+    def leader_frame() -> dict:
+        bid = round(leader_mid, 4)
+        return {
+            "stream": "xrpusdt@bookTicker",
+            "data": {"s": "XRPUSDT", "b": f"{bid:.4f}", "a": f"{bid + 0.0001:.4f}"},
+        }
+
+    def follower_frame() -> dict:
+        nonlocal sequence
+        fair = leader_mid * 13.505
+        mid = fair * (1 + rnd.gauss(0, 0.001))
+        ask, bid = f"{mid + 0.0005:.3f}", f"{mid - 0.0005:.3f}"
+
+        if not follower["ask"]:
+            message_type = btc_streams.ORDERBOOK_FULL
+            asks = [{"P": ask, "A": "1000"}]
+            bids = [{"P": bid, "A": "1000"}]
+        else:
+            message_type = btc_streams.ORDERBOOK_DIFF
+            asks = [{"P": follower["ask"], "A": "0"}, {"P": ask, "A": "1000"}]
+            bids = [{"P": follower["bid"], "A": "0"}, {"P": bid, "A": "1000"}]
+
+        follower["ask"], follower["bid"] = ask, bid
+        sequence += 1
+        return {"type": message_type, "CS": sequence, "AO": asks, "BO": bids}
+
+    frames: List[Frame] = [
+        (
+            BRIDGE,
+            {
+                "type": btc_streams.ORDERBOOK_FULL,
+                "CS": 1,
+                "AO": [{"P": bridge_ask, "A": "10000"}],
+                "BO": [{"P": bridge_bid, "A": "10000"}],
+            },
+        ),
+        (LEADER, leader_frame()),
+        (FOLLOWER, follower_frame()),
+    ]
+
+    while len(frames) < n:
+        if rnd.random() < 0.6:
+            leader_mid *= 1 + rnd.gauss(0, 0.0002)
+            frames.append((LEADER, leader_frame()))
+        else:
+            frames.append((FOLLOWER, follower_frame()))
+
+    return frames
+
+
+def load_frames(path: str) -> List[Frame]:
+    with open(path) as f:
+        return [(line["source"], line["frame"]) for line in map(json.loads, f)]
+
+
+def decode_frame(source: str, frame: dict) -> Union[BookTicker, BookFrame]:
+    """What the streams hand to the pubs"""
+    if source == LEADER:
+        return book_ticker_of(frame["data"])
+    return book_frame_of(frame)
+
+
+@dataclass
+class LatencyReport:
+    messages: int = 0
+    seconds: float = 0
+    decisions: List[float] = field(default_factory=list)
+    submits: List[float] = field(default_factory=list)
+    responses: List[float] = field(default_factory=list)
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages / self.seconds if self.seconds else 0
+
+    @staticmethod
+    def percentiles(samples: List[float]) -> Dict[str, float]:
+        """Microseconds"""
+        if not samples:
+            return {}
+        values = np.percentile(np.asarray(samples) * 1e6, PERCENTILES)
+        return {f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, values)}
+
+    def summary(self) -> dict:
+        return {
+            "messages": self.messages,
+            "messages/sec": round(self.messages_per_second),
+            "decision us": self.percentiles(self.decisions),
+            "submit us": self.percentiles(self.submits),
+            "response us": self.percentiles(self.responses),
+            "orders": len(self.submits),
+        }
+
+
+@dataclass
+class LatencyProbe:
+    """
+    Remembers when the latest book change arrived,
+    every decision and submit is measured from there
+    """
+
+    report: LatencyReport = field(default_factory=LatencyReport)
+    clock: Callable[[], float] = time.perf_counter
+    tick: Optional[float] = None
+
+    def watch_pub(self, pub) -> None:
+        parse_book = pub.parse_book
+
+        def timed_parse_book(book):
+            now = self.clock()
+            seen = pub.book.seen
+            parse_book(book)
+            self.report.messages += 1
+            if pub.book.seen != seen:
+                self.tick = now
+
+        pub.parse_book = timed_parse_book
+
+    def watch_robot(self, robot: LeaderFollowerTrader) -> None:
+        order_api = robot.order_api
+        exchange = order_api.exchange
+
+        send_order = order_api.send_order
+        submit_limit_order = exchange.submit_limit_order
+
+        async def timed_send_order(*args, **kwargs):
+            self.since_tick(self.report.decisions)
+            return await send_order(*args, **kwargs)
+
+        async def timed_submit_limit_order(*args, **kwargs):
+            start = self.since_tick(self.report.submits)
+            res = await submit_limit_order(*args, **kwargs)
+            self.report.responses.append(self.clock() - start)
+            return res
+
+        order_api.send_order = timed_send_order
+        exchange.submit_limit_order = timed_submit_limit_order
+
+    def since_tick(self, samples: List[float]) -> float:
+        now = self.clock()
+        if self.tick is not None:
+            samples.append(now - self.tick)
+        return now
+
+
+def create_trader(urls, probe: LatencyProbe) -> Tuple[LeaderFollowerTrader, list]:
+    config = LeaderFollowerConfig(
+        input=LeaderFollowerInput(base="XRP", quote="TRY", bridge="USDT")
+    )
+
+    # no rate limits, the stand-in never says 429
+    limits = RateLimits(
+        order=TokenBucket(rate=10000, capacity=100),
+        cancel=TokenBucket(rate=10000, capacity=100),
+        read=TokenBucket(rate=10000, capacity=100),
+        balance=TokenBucket(rate=10000, capacity=100),
+    )
+    api_client = BtcturkApiClient(urls=urls, limits=limits)
+
+    balance_pub = BalancePub(pubsub_key="bench_balance", exchange=api_client)
+    balance_pub.add_asset(Asset(symbol="XRP", free=Decimal(300)))
+    balance_pub.add_asset(Asset(symbol="TRY", free=Decimal(100000)))
+
+    leader_pub = BinancePub(
+        pubsub_key="bench_leader", symbol="XRPUSDT", api_client=BinanceBase()
+    )
+    bridge_pub = BTPub(
+        pubsub_key="bench_bridge", symbol="USDTTRY", api_client=api_client
+    )
+    follower_pub = BTPub(
+        pubsub_key="bench_follower", symbol="XRPTRY", api_client=api_client
+    )
+
+    robot = LeaderFollowerTrader(
+        config=config,
+        leader_pub=leader_pub,
+        follower_pub=follower_pub,
+        bridge_pub=bridge_pub,
+        balance_pub=balance_pub,
+    )
+
+    for pub in (leader_pub, bridge_pub, follower_pub):
+        probe.watch_pub(pub)
+    probe.watch_robot(robot)
+
+    return robot, [leader_pub, bridge_pub, follower_pub]
+
+
+async def run_bench(
+    frames: List[Frame], interval: float = 0.001, no_waits: bool = True
+) -> LatencyReport:
+    """Feed a frame every interval seconds, 0 for as fast as the pubs take them"""
+    standin = BtcturkStandin()
+    urls = await standin.start()
+
+    saved = sleep_seconds.dict()
+    if no_waits:
+        for key, value in NO_WAITS.items():
+            setattr(sleep_seconds, key, value)
+
+    probe = LatencyProbe()
+    robot, pubs = create_trader(urls, probe)
+
+    queues = await use_queues(pubs)
+
+    tasks = [asyncio.create_task(pub.run()) for pub in pubs]
+    tasks.append(asyncio.create_task(robot.run()))
+
+    decoded = [(source, decode_frame(source, frame)) for source, frame in frames]
+
+    try:
+        start = time.perf_counter()
+        for source, frame in decoded:
+            queues[source].put_nowait(frame)
+            await asyncio.sleep(interval)
+        for queue in queues.values():
+            await queue.join()
+        probe.report.seconds = time.perf_counter() - start
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await robot.close()
+        await robot.follower_pub.api_client.http.close()
+        await standin.stop()
+        for key, value in saved.items():
+            setattr(sleep_seconds, key, value)
+
+    return probe.report
+
+
+def main(frames: Iterator[Frame]) -> None:
+    report = asyncio.run(run_bench(list(frames)))
+    summary = report.summary()
+    if timings.enabled:
+        # LATENCY_TIMERS=1, the same stages the live robots time
+        summary["stages"] = timings.dict()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main(load_frames(sys.argv[1]) if len(sys.argv) > 1 else create_frames())
@@ -1,3 +1,4 @@
+from .ledger import Ledger
 from .models import (
     BPS,
     Asset,
@@ -10,3 +11,5 @@ from .models import (
     maker_fee_bps,
     taker_fee_bps,
 )
+from .orderbook import BookSide, OrderBook
+from .registry import Order, OrderRegistry, OrderState
@@ -0,0 +1,54 @@
+"""
+Market data frames as the exchanges send them, prices and amounts as strings
+
+msgspec structs when it is installed, so frames decode straight into them,
+named tuples otherwise. Field names map to the short keys of the exchanges
+"""
+from typing import List, NamedTuple, Optional
+
+try:
+    import msgspec  # type: ignore
+except ImportError:
+    msgspec = None
+
+if msgspec:
+
+    class Level(msgspec.Struct):
+        price: str = msgspec.field(name="P")
+        amount: str = msgspec.field(name="A")
+
+    class BookFrame(msgspec.Struct):
+        """A BTCTurk order book, full or diff"""
+
+        type: int = 0
+        sequence: Optional[int] = msgspec.field(default=None, name="CS")
+        asks: List[Level] = msgspec.field(default_factory=list, name="AO")
+        bids: List[Level] = msgspec.field(default_factory=list, name="BO")
+
+    class BookTicker(msgspec.Struct):
+        """A Binance best ask and bid"""
+
+        ask: str = msgspec.field(default="", name="a")
+        bid: str = msgspec.field(default="", name="b")
+        update_id: int = msgspec.field(default=0, name="u")
+
+else:
+
+    class Level(NamedTuple):  # type: ignore
+        price: str
+        amount: str
+
+    class BookFrame(NamedTuple):  # type: ignore
+        """A BTCTurk order book, full or diff"""
+
+        type: int = 0
+        sequence: Optional[int] = None
+        asks: List[Level] = []
+        bids: List[Level] = []
+
+    class BookTicker(NamedTuple):  # type: ignore
+        """A Binance best ask and bid"""
+
+        ask: str = ""
+        bid: str = ""
+        update_id: int = 0
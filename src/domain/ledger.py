@@ -0,0 +1,321 @@
+import collections
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .models import ZERO, Asset, AssetSymbol, OrderType
+
+RECONCILE = "reconcile"
+
+
+@dataclass
+class Reservation:
+    side: str
+    base: AssetSymbol
+    quote: AssetSymbol
+    price: Decimal
+    qty: Decimal  # still open
+    time: float = 0
+    # our total of the locked asset when it was sent
+    total: Decimal = ZERO
+    # off the book without an event, when we learned it
+    closed_at: Optional[float] = None
+    # its funds are still in our balances, no snapshot settled it
+    held: bool = True
+
+    @property
+    def symbol(self) -> AssetSymbol:
+        """The asset the order locks"""
+        return self.quote if self.side == OrderType.BUY else self.base
+
+    def locked(self, qty: Decimal) -> Decimal:
+        return qty * self.price if self.side == OrderType.BUY else qty
+
+    @property
+    def bought(self) -> AssetSymbol:
+        return self.base if self.side == OrderType.BUY else self.quote
+
+    def gain(self, qty: Decimal) -> Decimal:
+        """Of the bought asset, when qty fills"""
+        return qty if self.side == OrderType.BUY else qty * self.price
+
+
+@dataclass
+class Adjustment:
+    time: float
+    symbol: AssetSymbol
+    free: Decimal
+    locked: Decimal
+    reason: str
+
+
+@dataclass
+class Ledger:
+    """
+    Balances as we expect them between exchange snapshots
+
+    A submit moves funds from free to locked, a cancel moves them back,
+    a fill takes them from locked and adds the other asset to free.
+    The exchange snapshot wins when it arrives, a total off by more than
+    drift_bps from what we expected is drift.
+    A snapshot already holds the orders sent before it, whether they filled
+    or not, so their reservations are settled and their late events ignored.
+    An order closed without telling how is judged by the first snapshot after:
+    filled if its locked funds are gone from the total since it was sent,
+    cancelled if they are still there
+    """
+
+    assets: Dict[AssetSymbol, Asset] = field(default_factory=dict)
+    # by client order id, known before the exchange gives an id
+    reservations: Dict[str, Reservation] = field(default_factory=dict)
+    # the last ones a snapshot settled, in case they close without an event
+    settled: collections.OrderedDict = field(default_factory=collections.OrderedDict)
+    settled_size: int = 128
+
+    drift_bps: Decimal = Decimal(10)
+    drift: Dict[AssetSymbol, Decimal] = field(default_factory=dict)
+
+    adjustments: collections.deque = field(
+        default_factory=lambda: collections.deque(maxlen=128)
+    )
+    clock: Callable[[], float] = time.time
+
+    # called with the client id of a closed order and whether it filled
+    listeners: List[Callable[[str, bool], None]] = field(default_factory=list)
+
+    def adjust(
+        self,
+        symbol: AssetSymbol,
+        free: Decimal,
+        locked: Decimal,
+        reason: str,
+        at: Optional[float] = None,
+    ) -> None:
+        asset = self.assets.get(symbol)
+        if not asset:
+            return
+        asset.free += free
+        asset.locked += locked
+        at = self.clock() if at is None else at
+        self.adjustments.append(Adjustment(at, symbol, free, locked, reason))
+
+    def reserve(
+        self,
+        client_id: str,
+        side: str,
+        base: AssetSymbol,
+        quote: AssetSymbol,
+        price: Decimal,
+        qty: Decimal,
+    ) -> None:
+        reservation = Reservation(side, base, quote, price, qty, self.clock())
+        asset = self.assets.get(reservation.symbol)
+        if asset:
+            reservation.total = asset.free + asset.locked
+        self.reservations[client_id] = reservation
+        amount = reservation.locked(qty)
+        self.adjust(reservation.symbol, -amount, amount, f"submit {client_id}")
+
+    def release(self, client_id: str) -> None:
+        """Cancelled, what is left goes back to free"""
+        reservation = self.reservations.pop(client_id, None)
+        if not reservation or not reservation.held:
+            return
+        amount = reservation.locked(reservation.qty)
+        self.adjust(reservation.symbol, amount, -amount, f"cancel {client_id}")
+
+    def fill(self, client_id: str, left: Decimal = ZERO) -> None:
+        """Matched down to left, all of it by default"""
+        reservation = self.reservations.get(client_id)
+        if not reservation or left >= reservation.qty:
+            return
+
+        qty = reservation.qty - left
+        reservation.qty = left
+        if not left:
+            del self.reservations[client_id]
+        if not reservation.held:
+            return
+
+        reason = f"fill {client_id}"
+        self.adjust(reservation.symbol, ZERO, -reservation.locked(qty), reason)
+        self.adjust(reservation.bought, reservation.gain(qty), ZERO, reason)
+
+    def closed(
+        self,
+        client_id: str,
+        side: str,
+        base: AssetSymbol,
+        quote: AssetSymbol,
+        price: Decimal,
+        qty: Decimal,
+    ) -> None:
+        """
+        Off the book without an event, funds stay where they are until a snapshot.
+        Judged from when it was sent if we still know, from now if not
+        """
+        reservation = self.reservations.get(client_id) or self.settled.pop(
+            client_id, None
+        )
+        if not reservation:
+            reservation = Reservation(side, base, quote, price, qty, self.clock())
+            reservation.held = False
+        asset = self.assets.get(reservation.symbol)
+        if not asset or reservation.closed_at is not None:
+            return
+        if not reservation.total:
+            reservation.total = asset.free + asset.locked
+        reservation.closed_at = self.clock()
+        self.reservations[client_id] = reservation
+
+    def since(self, symbol: AssetSymbol, taken_at: float) -> Adjustment:
+        """Our own changes to symbol after taken_at, summed"""
+        free = locked = ZERO
+        for adjustment in self.adjustments:
+            if (
+                adjustment.time >= taken_at
+                and adjustment.symbol == symbol
+                and adjustment.reason != RECONCILE
+            ):
+                free += adjustment.free
+                locked += adjustment.locked
+        return Adjustment(taken_at, symbol, free, locked, "since")
+
+    def reconcile(
+        self,
+        symbol: AssetSymbol,
+        free: Decimal,
+        locked: Decimal,
+        taken_at: Optional[float] = None,
+    ) -> None:
+        self.reconcile_all({symbol: (free, locked)}, taken_at)
+
+    def reconcile_all(
+        self,
+        balances: Dict[AssetSymbol, Tuple[Decimal, Decimal]],
+        taken_at: Optional[float] = None,
+    ) -> None:
+        """
+        Replace with the exchange snapshot of free and locked by symbol
+
+        A snapshot requested at taken_at misses what we did after,
+        that is applied on top of it again.
+        Closed orders are judged first, a fill moves the asset it bought too
+        """
+        snapshot = {}
+        for symbol, (free, locked) in balances.items():
+            if symbol not in self.assets:
+                continue
+            if taken_at is not None:
+                pending = self.since(symbol, taken_at)
+                free += pending.free
+                locked += pending.locked
+            snapshot[symbol] = (free, locked)
+
+        # the part of each diff fills explain
+        explained: Dict[AssetSymbol, Decimal] = {}
+        for symbol, (free, locked) in snapshot.items():
+            for client_id, reservation in self.settle(symbol, taken_at):
+                if not self.judge(client_id, reservation, free + locked):
+                    continue
+                qty = reservation.qty
+                self.explain(explained, snapshot, symbol, -reservation.locked(qty))
+                bought = reservation.bought
+                if bought in snapshot:
+                    self.explain(explained, snapshot, bought, reservation.gain(qty))
+                elif reservation.held:
+                    # before the snapshot, since must not add it again
+                    reason = f"fill {client_id}"
+                    at = reservation.closed_at
+                    self.adjust(bought, reservation.gain(qty), ZERO, reason, at)
+
+        for symbol, (free, locked) in snapshot.items():
+            self.replace(symbol, free, locked, explained.get(symbol, ZERO))
+
+    def explain(
+        self,
+        explained: Dict[AssetSymbol, Decimal],
+        snapshot: Dict[AssetSymbol, Tuple[Decimal, Decimal]],
+        symbol: AssetSymbol,
+        amount: Decimal,
+    ) -> None:
+        """A fill of amount is not drift, if the diff of symbol looks like it"""
+        free, locked = snapshot[symbol]
+        asset = self.assets[symbol]
+        diff = free + locked - asset.free - asset.locked - explained.get(symbol, ZERO)
+        if amount and diff / amount * 2 >= 1:
+            explained[symbol] = explained.get(symbol, ZERO) + amount
+
+    def replace(
+        self, symbol: AssetSymbol, free: Decimal, locked: Decimal, explained: Decimal
+    ) -> None:
+        asset = self.assets[symbol]
+        expected = asset.free + asset.locked
+        diff = free + locked - expected
+        if diff or free != asset.free:
+            self.adjustments.append(
+                Adjustment(
+                    self.clock(),
+                    symbol,
+                    free - asset.free,
+                    locked - asset.locked,
+                    RECONCILE,
+                )
+            )
+
+        diff -= explained
+        if abs(diff) * 10000 > self.drift_bps * max(abs(expected), abs(free + locked)):
+            self.drift[symbol] = diff
+        else:
+            self.drift.pop(symbol, None)
+
+        asset.free = free
+        asset.locked = locked
+
+    def settle(
+        self, symbol: AssetSymbol, taken_at: Optional[float]
+    ) -> List[Tuple[str, Reservation]]:
+        """Drop the reservations the snapshot holds, returns the closed ones"""
+        closed = []
+        for client_id, reservation in list(self.reservations.items()):
+            if reservation.symbol != symbol:
+                continue
+            since = reservation.time
+            if reservation.closed_at is not None:
+                since = reservation.closed_at
+            if taken_at is not None and since >= taken_at:
+                continue
+            del self.reservations[client_id]
+            if reservation.closed_at is not None:
+                closed.append((client_id, reservation))
+                continue
+            reservation.held = False
+            self.settled[client_id] = reservation
+            while len(self.settled) > self.settled_size:
+                self.settled.popitem(last=False)
+        return closed
+
+    def judge(self, client_id: str, reservation: Reservation, total: Decimal) -> bool:
+        """
+        Filled if the locked funds left the total, cancelled if they are still in.
+        Our own changes since it was sent are taken out, the snapshots are not,
+        so one that came in between does not matter
+        """
+        amount = reservation.locked(reservation.qty)
+        ours = self.since(reservation.symbol, reservation.time)
+        change = total - reservation.total - ours.free - ours.locked
+        filled = change * 2 <= -amount
+        for listener in self.listeners:
+            listener(client_id, filled)
+        return filled
+
+    @property
+    def drifted(self) -> bool:
+        return bool(self.drift)
+
+    def dict(self) -> dict:
+        return {
+            "reserved": len(self.reservations),
+            "drift": {symbol: str(diff) for symbol, diff in self.drift.items()},
+        }
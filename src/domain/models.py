@@ -1,10 +1,11 @@
 from dataclasses import dataclass, field
 from decimal import Decimal
 from enum import Enum
-from typing import Dict
+from typing import Dict, NamedTuple
 
 from pydantic.main import BaseModel
 
+ZERO = Decimal(0)
 DECIMAL_2 = Decimal(2)
 
 AssetSymbol = str
@@ -15,14 +16,61 @@ taker_fee_bps: Decimal = Decimal("8")
 maker_fee_bps: Decimal = taker_fee_bps / 2
 
 
-@dataclass
+class Quote(NamedTuple):
+    ask: Decimal
+    bid: Decimal
+    mid: Decimal
+    spread_bps: Decimal
+    version: int
+
+
+EMPTY_QUOTE = Quote(ZERO, ZERO, ZERO, ZERO, 0)
+
+
 class Book:
-    ask: Decimal = Decimal(0)
-    mid: Decimal = Decimal(0)
-    bid: Decimal = Decimal(0)
-    spread_bps: Decimal = Decimal(0)
-    seen: int = 0
-    processed: int = 0
+    """
+    The top of a book, replaced as a whole on every update
+
+    quote is immutable and its version grows by one per update,
+    a reader holding it never sees an ask of one update and a bid of another.
+    seen counts the updates readers are woken up for
+    """
+
+    __slots__ = ("quote", "seen", "processed")
+
+    def __init__(self) -> None:
+        self.quote: Quote = EMPTY_QUOTE
+        self.seen = 0
+        self.processed = 0
+
+    def update(
+        self, ask: Decimal, bid: Decimal, mid: Decimal, spread_bps: Decimal
+    ) -> Quote:
+        self.quote = Quote(ask, bid, mid, spread_bps, self.quote.version + 1)
+        return self.quote
+
+    @property
+    def ask(self) -> Decimal:
+        return self.quote.ask
+
+    @property
+    def bid(self) -> Decimal:
+        return self.quote.bid
+
+    @property
+    def mid(self) -> Decimal:
+        return self.quote.mid
+
+    @property
+    def spread_bps(self) -> Decimal:
+        return self.quote.spread_bps
+
+    @property
+    def version(self) -> int:
+        return self.quote.version
+
+    def dict(self) -> dict:
+        return {**self.quote._asdict(), "seen": self.seen, "processed": self.processed}
 
 
 class Asset(BaseModel):
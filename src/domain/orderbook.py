@@ -0,0 +1,112 @@
+import bisect
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Level = Tuple[int, int]  # price, amount in ticks of numberops.fixed
+
+
+@dataclass
+class BookSide:
+    """
+    Price levels kept sorted ascending, amounts by price
+
+    Lookup is a dict hit, insert and delete a bisect on the price list
+    """
+
+    is_bid: bool = False
+    prices: List[int] = field(default_factory=list)
+    amounts: Dict[int, int] = field(default_factory=dict)
+
+    def clear(self) -> None:
+        self.prices.clear()
+        self.amounts.clear()
+
+    def set(self, price: int, amount: int) -> None:
+        if not amount:
+            self.remove(price)
+            return
+
+        if price not in self.amounts:
+            bisect.insort(self.prices, price)
+        self.amounts[price] = amount
+
+    def remove(self, price: int) -> None:
+        if price in self.amounts:
+            del self.amounts[price]
+            del self.prices[bisect.bisect_left(self.prices, price)]
+
+    def best(self) -> Optional[int]:
+        if not self.prices:
+            return None
+        return self.prices[-1] if self.is_bid else self.prices[0]
+
+    def levels(self, depth: int) -> List[Level]:
+        """Best levels first"""
+        if self.is_bid:
+            prices = self.prices[: -depth - 1 : -1]
+        else:
+            prices = self.prices[:depth]
+        return [(price, self.amounts[price]) for price in prices]
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+@dataclass
+class OrderBook:
+    """
+    L2 book built from a snapshot and the diffs after it
+
+    Every diff must carry the next sequence number,
+    a missing one sets gap and the book needs a new snapshot
+    """
+
+    asks: BookSide = field(default_factory=BookSide)
+    bids: BookSide = field(default_factory=lambda: BookSide(is_bid=True))
+
+    sequence: Optional[int] = None
+    gap: bool = False
+
+    def clear(self) -> None:
+        self.asks.clear()
+        self.bids.clear()
+        self.sequence = None
+        self.gap = False
+
+    def apply_snapshot(
+        self, asks: Iterable[Level], bids: Iterable[Level], sequence: Optional[int]
+    ) -> None:
+        self.clear()
+        for price, amount in asks:
+            self.asks.set(price, amount)
+        for price, amount in bids:
+            self.bids.set(price, amount)
+        self.sequence = sequence
+
+    def apply_diff(
+        self, asks: Iterable[Level], bids: Iterable[Level], sequence: Optional[int]
+    ) -> bool:
+        # wait for a snapshot first
+        if self.sequence is None or sequence is None or self.gap:
+            return False
+
+        # already in the snapshot
+        if sequence <= self.sequence:
+            return False
+
+        if sequence != self.sequence + 1:
+            self.gap = True
+            return False
+
+        for price, amount in asks:
+            self.asks.set(price, amount)
+        for price, amount in bids:
+            self.bids.set(price, amount)
+        self.sequence = sequence
+        return True
+
+    def best_ask(self) -> Optional[int]:
+        return self.asks.best()
+
+    def best_bid(self) -> Optional[int]:
+        return self.bids.best()
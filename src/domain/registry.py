@@ -0,0 +1,242 @@
+import collections
+import time
+import uuid
+from dataclasses import dataclass, field
+from decimal import Decimal
+from enum import Enum
+from typing import Callable, Dict, List, Optional
+
+from .models import ZERO, OrderId
+
+
+class OrderState(str, Enum):
+    PENDING = "pending"  # sent, no id yet
+    OPEN = "open"
+    PARTIAL = "partially_filled"
+    CANCEL_PENDING = "cancel_pending"  # asked to cancel, not confirmed
+    CLOSED = "closed"  # gone from the book without an event, filled or cancelled
+    FILLED = "filled"
+    CANCELLED = "cancelled"
+    REJECTED = "rejected"
+
+
+# may still trade on the book
+LIVE = (OrderState.PENDING, OrderState.OPEN, OrderState.PARTIAL)
+DONE = (OrderState.FILLED, OrderState.CANCELLED, OrderState.REJECTED)
+# off the book, closed ones wait for an event or the balances to tell how
+GONE = (*DONE, OrderState.CLOSED)
+
+TRANSITIONS = {
+    OrderState.PENDING: set(OrderState) - {OrderState.PENDING},
+    OrderState.OPEN: {
+        OrderState.PARTIAL,
+        OrderState.CANCEL_PENDING,
+        *GONE,
+    },
+    OrderState.PARTIAL: {
+        OrderState.PARTIAL,
+        OrderState.CANCEL_PENDING,
+        *GONE,
+    },
+    OrderState.CANCEL_PENDING: {
+        OrderState.OPEN,
+        OrderState.PARTIAL,
+        *GONE,
+    },
+    OrderState.CLOSED: {OrderState.FILLED, OrderState.CANCELLED},
+}
+
+
+@dataclass
+class Order:
+    order_id: Optional[OrderId]
+    symbol: str
+    side: str
+    price: Decimal
+    qty: Decimal
+    client_id: str = ""
+    left: Decimal = ZERO
+    state: OrderState = OrderState.PENDING
+    updated: float = 0
+
+    @property
+    def done(self) -> bool:
+        return self.state in DONE
+
+    @property
+    def gone(self) -> bool:
+        return self.state in GONE
+
+    def resting_state(self) -> OrderState:
+        return OrderState.PARTIAL if self.left < self.qty else OrderState.OPEN
+
+
+def create_client_id() -> str:
+    return str(uuid.uuid4())
+
+
+@dataclass
+class OrderRegistry:
+    """
+    Our orders by client id and by exchange id, and the state they are in
+
+    Orders on the book stay in live, gone ones move to a history
+    of history_size, so a late event or cancel of them is recognized.
+    A transition the state does not allow, a stale event for example, is ignored
+    """
+
+    history_size: int = 256
+    clock: Callable[[], float] = time.monotonic
+
+    live: Dict[str, Order] = field(default_factory=dict)
+    by_id: Dict[OrderId, Order] = field(default_factory=dict)
+    history: collections.OrderedDict = field(default_factory=collections.OrderedDict)
+    history_by_id: Dict[OrderId, Order] = field(default_factory=dict)
+
+    def new(
+        self,
+        symbol: str,
+        side: str,
+        price: Decimal,
+        qty: Decimal,
+        client_id: Optional[str] = None,
+    ) -> Order:
+        order = Order(
+            order_id=None,
+            symbol=symbol,
+            side=side,
+            price=price,
+            qty=qty,
+            client_id=client_id or create_client_id(),
+            left=qty,
+            updated=self.clock(),
+        )
+        self.live[order.client_id] = order
+        return order
+
+    def get(self, order_id: Optional[OrderId]) -> Optional[Order]:
+        if order_id is None:
+            return None
+        return self.by_id.get(order_id) or self.history_by_id.get(order_id)
+
+    def get_client(self, client_id: Optional[str]) -> Optional[Order]:
+        if client_id is None:
+            return None
+        return self.live.get(client_id) or self.history.get(client_id)
+
+    def set_id(self, order: Order, order_id: OrderId) -> None:
+        order.order_id = order_id
+        if order.gone:
+            self.history_by_id[order_id] = order
+        else:
+            self.by_id[order_id] = order
+
+    def transition(self, order: Order, state: OrderState) -> bool:
+        if state not in TRANSITIONS.get(order.state, ()):
+            return False
+
+        order.state = state
+        order.updated = self.clock()
+        if state in GONE:
+            self.archive(order)
+        return True
+
+    def archive(self, order: Order) -> None:
+        self.live.pop(order.client_id, None)
+        self.history[order.client_id] = order
+        if order.order_id is not None:
+            self.by_id.pop(order.order_id, None)
+            self.history_by_id[order.order_id] = order
+
+        while len(self.history) > self.history_size:
+            _, old = self.history.popitem(last=False)
+            self.history_by_id.pop(old.order_id, None)
+
+    def opened(self, order: Order, order_id: OrderId) -> bool:
+        if order.order_id is None:
+            self.set_id(order, order_id)
+        return self.transition(order, OrderState.OPEN)
+
+    def matched(self, order: Order, left: Decimal) -> bool:
+        """A fill leaving left"""
+        if order.done or left >= order.left:
+            return False
+        order.left = left
+        if not left:
+            return self.transition(order, OrderState.FILLED)
+        if order.state in (OrderState.CANCEL_PENDING, OrderState.CLOSED):
+            order.updated = self.clock()
+            return True
+        return self.transition(order, OrderState.PARTIAL)
+
+    def cancelling(self, order: Order) -> bool:
+        return self.transition(order, OrderState.CANCEL_PENDING)
+
+    def cancelled(self, order: Order) -> bool:
+        return self.transition(order, OrderState.CANCELLED)
+
+    def closed(self, order: Order) -> bool:
+        return self.transition(order, OrderState.CLOSED)
+
+    def rejected(self, order: Order) -> bool:
+        return self.transition(order, OrderState.REJECTED)
+
+    def has_live(self) -> bool:
+        """Any order that may still trade, the robot keeps one at a time"""
+        return any(order.state in LIVE for order in self.live.values())
+
+    def cancellable(self) -> List[Order]:
+        return [
+            order
+            for order in self.live.values()
+            if order.state in (OrderState.OPEN, OrderState.PARTIAL)
+        ]
+
+    def reconcile(self, orderlist: List[dict], taken_at: float) -> List[Order]:
+        """
+        The open orders of the exchange, requested at taken_at
+
+        Unknown ones are adopted so they can be cancelled,
+        ours missing from the list are gone, unless they changed after taken_at:
+        rejected if they never got an id, else closed, filled or cancelled.
+        Returns the orders that closed or were rejected
+        """
+        seen = set()
+        for order_dict in orderlist:
+            order_id = order_dict.get("id")
+            if order_id is None:
+                continue
+            client_id = order_dict.get("orderClientId")
+            order = self.get(order_id) or self.get_client(client_id)
+            if order and order.gone:
+                continue  # closed after taken_at
+            if not order:
+                order = self.new(
+                    symbol=order_dict.get("pairSymbol", ""),
+                    side=order_dict.get("type", ""),
+                    price=Decimal(order_dict["price"]),
+                    qty=Decimal(order_dict.get("quantity", order_dict["leftAmount"])),
+                    client_id=client_id or str(order_id),
+                )
+            if order.order_id is None:
+                self.set_id(order, order_id)
+
+            seen.add(order.client_id)
+            order.left = Decimal(order_dict.get("leftAmount", order.left))
+            if order.state != OrderState.CANCEL_PENDING or order.updated < taken_at:
+                self.transition(order, order.resting_state())
+
+        closed = []
+        for order in list(self.live.values()):
+            if order.client_id in seen or order.updated >= taken_at:
+                continue
+            if order.state == OrderState.PENDING:
+                self.rejected(order)
+            else:
+                self.closed(order)
+            closed.append(order)
+        return closed
+
+    def dict(self) -> dict:
+        states = collections.Counter(order.state.value for order in self.live.values())
+        return {**states, "done": len(self.history)}
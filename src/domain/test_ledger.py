@@ -0,0 +1,128 @@
+from decimal import Decimal
+
+from .ledger import Ledger
+from .models import Asset
+
+
+def create_ledger():
+    now = [0.0]
+    ledger = Ledger(clock=lambda: now[0])
+    ledger.assets["XRP"] = Asset(symbol="XRP", free=Decimal(100))
+    ledger.assets["TRY"] = Asset(symbol="TRY", free=Decimal(1000))
+    return ledger, now
+
+
+def test_reserve_release_fill():
+    ledger, _ = create_ledger()
+    xrp, try_ = ledger.assets["XRP"], ledger.assets["TRY"]
+
+    # a buy locks the quote
+    ledger.reserve("a", "buy", "XRP", "TRY", Decimal("5.5"), Decimal(10))
+    assert try_.free == 945 and try_.locked == 55
+
+    # half filled, then the rest cancelled
+    ledger.fill("a", left=Decimal(5))
+    assert xrp.free == 105
+    assert try_.free == 945 and try_.locked == Decimal("27.5")
+
+    ledger.release("a")
+    assert try_.free == Decimal("972.5") and try_.locked == 0
+    assert not ledger.reservations
+
+    # a sell locks the base, a late cancel of a filled order changes nothing
+    ledger.reserve("b", "sell", "XRP", "TRY", Decimal(6), Decimal(20))
+    assert xrp.free == 85 and xrp.locked == 20
+    ledger.fill("b")
+    ledger.release("b")
+    assert xrp.free == 85 and xrp.locked == 0
+    assert try_.free == Decimal("1092.5")
+
+
+def test_reconcile():
+    ledger, now = create_ledger()
+    xrp = ledger.assets["XRP"]
+
+    # the snapshot agrees
+    ledger.reconcile("XRP", Decimal(100), Decimal(0))
+    assert not ledger.drifted
+
+    # a snapshot asked for before the submit does not undo it
+    now[0] = 1
+    ledger.reserve("a", "sell", "XRP", "TRY", Decimal(6), Decimal(20))
+    ledger.reconcile("XRP", Decimal(100), Decimal(0), taken_at=0.5)
+    assert xrp.free == 80 and xrp.locked == 20
+    assert not ledger.drifted
+
+    # the exchange knows better
+    ledger.reconcile("XRP", Decimal(70), Decimal(20))
+    assert xrp.free == 70
+    assert ledger.drift == {"XRP": Decimal(-10)}
+    assert ledger.adjustments[-1].reason == "reconcile"
+
+    # the snapshot holds the order, its fill learned later is not counted twice
+    assert not ledger.reservations
+    ledger.fill("a")
+    assert xrp.free == 70 and xrp.locked == 20
+
+    ledger.reconcile("XRP", Decimal(70), Decimal(20))
+    assert not ledger.drifted
+
+
+def test_closed_orders_are_judged_by_the_balances():
+    ledger, now = create_ledger()
+    xrp, try_ = ledger.assets["XRP"], ledger.assets["TRY"]
+    outcomes = []
+    ledger.listeners.append(lambda *outcome: outcomes.append(outcome))
+
+    ledger.reserve("a", "buy", "XRP", "TRY", Decimal(5), Decimal(10))
+    ledger.reserve("b", "sell", "XRP", "TRY", Decimal(6), Decimal(20))
+
+    # gone from the open orders, the funds stay where they are
+    now[0] = 1
+    ledger.closed("a", "buy", "XRP", "TRY", Decimal(5), Decimal(10))
+    ledger.closed("b", "sell", "XRP", "TRY", Decimal(6), Decimal(20))
+    assert try_.locked == 50 and xrp.locked == 20
+
+    # a snapshot asked for before that can not tell, even if it holds the fill
+    ledger.reconcile("TRY", Decimal(950), Decimal(0), taken_at=0.5)
+    assert not outcomes and "a" in ledger.reservations
+
+    # the buy filled, the sell was cancelled
+    now[0] = 2
+    snapshot = {"XRP": (Decimal(110), Decimal(0)), "TRY": (Decimal(950), Decimal(0))}
+    ledger.reconcile_all(snapshot, taken_at=1.5)
+    assert sorted(outcomes) == [("a", True), ("b", False)]
+    assert not ledger.reservations
+
+    # the bought XRP came with the fill, it is not drift
+    assert xrp.free == 110 and try_.free == 950
+    assert not ledger.drifted
+
+
+def test_closed_after_a_snapshot_settled_it():
+    ledger, now = create_ledger()
+    outcomes = []
+    ledger.listeners.append(lambda *outcome: outcomes.append(outcome))
+
+    now[0] = 1
+    ledger.reserve("a", "sell", "XRP", "TRY", Decimal(6), Decimal(20))
+    ledger.reconcile("XRP", Decimal(80), Decimal(20), taken_at=2)
+    assert not ledger.reservations
+
+    now[0] = 3
+    ledger.closed("a", "sell", "XRP", "TRY", Decimal(6), Decimal(20))
+    ledger.reconcile_all(
+        {"XRP": (Decimal(80), Decimal(0)), "TRY": (Decimal(1120), Decimal(0))},
+        taken_at=4,
+    )
+    assert outcomes == [("a", True)]
+    assert not ledger.drifted
+
+    # a fill event of an order the snapshot settled moves nothing
+    now[0] = 5
+    ledger.reserve("b", "buy", "XRP", "TRY", Decimal(5), Decimal(10))
+    ledger.reconcile("TRY", Decimal(1070), Decimal(50), taken_at=6)
+    ledger.closed("b", "buy", "XRP", "TRY", Decimal(5), Decimal(10))
+    ledger.fill("b")
+    assert not ledger.reservations
+    assert ledger.assets["TRY"].locked == 50
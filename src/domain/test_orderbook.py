@@ -0,0 +1,47 @@
+from src.numberops.fixed import to_ticks
+
+from .orderbook import OrderBook
+
+
+def levels(*pairs):
+    return [(to_ticks(price), to_ticks(amount)) for price, amount in pairs]
+
+
+def test_order_book():
+    book = OrderBook()
+
+    # diffs before the snapshot are ignored
+    assert not book.apply_diff(levels(("15.1", "1")), [], 3)
+    assert book.best_ask() is None
+
+    book.apply_snapshot(
+        asks=levels(("15.3", "1"), ("14.9", "2"), ("15.5", "1")),
+        bids=levels(("14.1", "1"), ("14.7", "3"), ("13.2", "1")),
+        sequence=10,
+    )
+    assert book.best_ask() == to_ticks("14.9")
+    assert book.best_bid() == to_ticks("14.7")
+
+    # stale diff
+    assert not book.apply_diff(levels(("14.8", "1")), [], 10)
+    assert book.best_ask() == to_ticks("14.9")
+
+    # new best ask, best bid removed
+    assert book.apply_diff(levels(("14.8", "1")), levels(("14.7", "0")), 11)
+    assert book.best_ask() == to_ticks("14.8")
+    assert book.best_bid() == to_ticks("14.1")
+
+    # update amount in place
+    assert book.apply_diff(levels(("14.8", "5")), [], 12)
+    assert book.asks.levels(2) == levels(("14.8", "5"), ("14.9", "2"))
+    assert book.bids.levels(2) == levels(("14.1", "1"), ("13.2", "1"))
+
+    # a missing sequence is a gap
+    assert not book.apply_diff(levels(("14.2", "1")), [], 14)
+    assert book.gap
+    assert book.best_ask() == to_ticks("14.8")
+
+    book.apply_snapshot(levels(("16", "1")), levels(("15", "1")), 20)
+    assert not book.gap
+    assert book.best_ask() == to_ticks("16")
+    assert len(book.asks) == 1
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from .registry import OrderRegistry, OrderState
+
+
+def create_registry(**kwargs):
+    now = [0.0]
+    return OrderRegistry(clock=lambda: now[0], **kwargs), now
+
+
+def test_order_states():
+    registry, _ = create_registry()
+
+    order = registry.new("XRPTRY", "buy", Decimal("5.5"), Decimal(10))
+    assert order.state == OrderState.PENDING
+    assert registry.has_live()
+    assert registry.get_client(order.client_id) is order
+
+    assert registry.opened(order, 7)
+    assert registry.get(7) is order
+
+    assert registry.matched(order, Decimal(4))
+    assert order.state == OrderState.PARTIAL and order.left == 4
+    # a repeated event changes nothing
+    assert not registry.matched(order, Decimal(4))
+
+    assert registry.cancellable() == [order]
+    assert registry.cancelling(order)
+    assert not registry.cancellable()
+    # asked to cancel, it does not keep the next order waiting
+    assert not registry.has_live()
+
+    assert registry.cancelled(order)
+    assert order.done and not registry.live
+    # a late event of a closed order
+    assert not registry.matched(order, Decimal(0))
+    assert registry.get(7) is order
+
+
+def test_bounded_history():
+    registry, _ = create_registry(history_size=2)
+    for order_id in range(3):
+        order = registry.new("XRPTRY", "sell", Decimal(6), Decimal(1))
+        registry.opened(order, order_id)
+        registry.matched(order, Decimal(0))
+        assert order.state == OrderState.FILLED
+
+    assert len(registry.history) == 2
+    assert registry.get(0) is None
+    assert registry.get(2)
+
+
+def test_reconcile():
+    registry, now = create_registry()
+
+    resting = registry.new("XRPTRY", "buy", Decimal(5), Decimal(10))
+    registry.opened(resting, 1)
+    gone = registry.new("XRPTRY", "buy", Decimal(5), Decimal(10))
+    registry.opened(gone, 2)
+    lost = registry.new("XRPTRY", "buy", Decimal(5), Decimal(10))
+
+    now[0] = 2
+    late = registry.new("XRPTRY", "sell", Decimal(6), Decimal(10))
+
+    orderlist = [
+        {"id": 1, "price": "5", "quantity": "10", "leftAmount": "3"},
+        {"id": 9, "price": "7", "quantity": "1", "leftAmount": "1", "type": "sell"},
+    ]
+    closed = registry.reconcile(orderlist, taken_at=1)
+
+    assert resting.state == OrderState.PARTIAL and resting.left == 3
+    # filled or cancelled, not known yet
+    assert gone.state == OrderState.CLOSED and gone.left == 10
+    assert registry.get(2) is gone and gone not in registry.live.values()
+    assert lost.state == OrderState.REJECTED
+    assert closed == [gone, lost]
+
+    # sent after the poll
+    assert late.state == OrderState.PENDING
+
+    # not ours, adopted to be cancelled
+    stranger = registry.get(9)
+    assert stranger and stranger.state == OrderState.OPEN
+    assert stranger in registry.cancellable()
+
+    # a late fill event of a closed order still counts
+    assert registry.matched(gone, Decimal(0))
+    assert gone.state == OrderState.FILLED
@@ -16,13 +16,21 @@ class SleepSeconds(BaseModel):
 
     rate_limit: float = 5
 
-    read_wait: float = 0.16  # 300/min
-    cancel_wait: float = 0.16  # 300/min
+    # how long a request may wait for its rate limit token
+    order_deadline: float = 0.05
+    read_deadline: float = 0.5
+    cancel_deadline: float = 1
 
     update_balances: float = 0.72  # 90/min
 
     refresh_open_orders: float = 0.2
 
+    # while the user data socket is up, REST only reconciles now and then
+    reconcile_balances: float = 10
+    reconcile_open_orders: float = 2
+    user_stream_retry: float = 5
+    book_stream_retry: float = 1
+
     broadcast_stats: float = 1
 
     wait_before_cancel: float = 0.12
@@ -33,10 +41,30 @@ class SleepSeconds(BaseModel):
 
     poll_for_lock: float = 0.05
 
+    # a robot worker not answering this long is restarted
+    shard_call: float = 10
+
+    # the book board without a wake up, as in tests
+    poll_board: float = 0.001
+
 
 sleep_seconds = SleepSeconds()
 
 
+class HttpPool(BaseModel):
+    """Connections of the REST session of each exchange client"""
+
+    limit: int = 20
+    limit_per_host: int = 0  # no limit
+    keepalive_timeout: float = 30
+    ttl_dns_cache: int = 300
+    # opened before the first order needs them
+    warm_connections: int = 4
+
+
+http_pool = HttpPool()
+
+
 @dataclass
 class Environment:
     pass
@@ -55,6 +83,13 @@ else:
     apiSecret = os.getenv("BTCTURK_PRIVATE_KEY_PROD", "")
     LOG_RADIO = "LOG_RADIO"
 
+# record books under this directory, levels per side besides the top of book
+RECORD_DIR = os.getenv("RECORD_DIR", "")
+RECORD_DEPTH = int(os.getenv("RECORD_DEPTH", "0"))
+
+# run robots in this many worker processes, 0 runs them in the api process
+robot_workers = int(os.getenv("ROBOT_WORKERS", "0"))
+
 
 def test_debug():
     print(debug)
@@ -1,10 +1,12 @@
 from abc import ABC
 from dataclasses import dataclass, field
 from decimal import Decimal
-from typing import List, Optional, Tuple
+from typing import AsyncGenerator, List, Optional, Tuple
 
 from src.domain import Asset, AssetPair
+from src.domain.frames import Level
 from src.domain.models import OrderType
+from src.exchanges.limits import RateLimits
 from src.exchanges.locks import Locks
 
 
@@ -12,12 +14,7 @@ from src.exchanges.locks import Locks
 class ExchangeAPIClientBase(ABC):
     name: Optional[str] = None
     locks: Locks = field(default_factory=Locks)
-
-    orders_in_last_second: int = 0
-    max_orders_per_second: int = 6
-
-    async def clear_orders_in_last_second(self):
-        self.orders_in_last_second = 0
+    limits: RateLimits = field(default_factory=RateLimits)
 
     async def get_account_balance(self) -> Optional[dict]:
         pass
@@ -30,6 +27,14 @@ class ExchangeAPIClientBase(ABC):
     def parse_open_orders(open_orders: dict) -> Tuple[list, list]:
         return ([], [])
 
+    def create_user_stream(self) -> Optional[AsyncGenerator]:
+        """(type, event) of the account as they happen, if the exchange pushes them"""
+        return None
+
+    @staticmethod
+    def parse_levels(levels: List[Level]) -> List[Tuple[int, int]]:
+        return []
+
     @staticmethod
     def get_best_ask(book: dict) -> Optional[Decimal]:
         pass
@@ -48,7 +53,12 @@ class ExchangeAPIClientBase(ABC):
         return (best_bid + best_ask) / Decimal("2")
 
     async def submit_limit_order(
-        self, pair: AssetPair, side: OrderType, price: float, quantity: float
+        self,
+        pair: AssetPair,
+        side: OrderType,
+        price: float,
+        quantity: float,
+        client_id: Optional[str] = None,
     ) -> Optional[dict]:
         pass
 
@@ -57,8 +67,8 @@ class ExchangeAPIClientBase(ABC):
         new in the bottom of the page
         """
 
-    async def cancel_order(self, order_id: int) -> Optional[dict]:
-        pass
+    async def cancel_order(self, order_id: int, acquire: bool = True) -> Optional[dict]:
+        """acquire False when the caller holds a cancel token already"""
 
     async def cancel_multiple_orders(self, orders: list) -> list:
         return []
@@ -68,3 +78,9 @@ class ExchangeAPIClientBase(ABC):
 
     def get_sorted_order_list(self, order_res: dict):
         pass
+
+    async def warm_up(self) -> None:
+        pass
+
+    def pool_stats(self) -> dict:
+        return {}
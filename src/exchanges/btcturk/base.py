@@ -1,18 +1,19 @@
 import asyncio
 import itertools
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from decimal import Decimal
 from typing import List, Optional, Tuple
 
-import aiohttp
-
 from src.domain import Asset
+from src.domain.frames import Level
 from src.domain.models import AssetPair
 from src.environment import sleep_seconds
 from src.exchanges.base import ExchangeAPIClientBase
 from src.monitoring import logger
+from src.numberops.fixed import to_ticks
 from src.periodic import lock_with_timeout
+from src.web.session import PooledSession
 
 
 @dataclass
@@ -21,16 +22,15 @@ class BtcturkBase(ExchangeAPIClientBase):
     api_key: str = "no key"
     api_secret: str = "no secret"
 
-    session: Optional[aiohttp.ClientSession] = None
+    http: PooledSession = field(default_factory=PooledSession)
 
     async def activate_rate_limit(self) -> None:
         async with lock_with_timeout(
             self.locks.rate_limit, sleep_seconds.rate_limit
         ) as ok:
             if ok:
-                await self._close_session()
-                if not self.session or self.session.closed:
-                    self.session = aiohttp.ClientSession()
+                # keep the warm connections, only stop sending for a while
+                self.limits.drain(sleep_seconds.rate_limit)
 
     @staticmethod
     def parse_prices(orders: List[dict]) -> list:
@@ -41,6 +41,11 @@ class BtcturkBase(ExchangeAPIClientBase):
         except Exception as e:
             return []
 
+    @staticmethod
+    def parse_levels(levels: List[Level]) -> List[Tuple[int, int]]:
+        """Price and amount in ticks"""
+        return [(to_ticks(level.price), to_ticks(level.amount)) for level in levels]
+
     @staticmethod
     def get_best_bid(book: dict) -> Optional[Decimal]:
         if not book:
@@ -143,16 +148,18 @@ class BtcturkBase(ExchangeAPIClientBase):
         order_ids = [order.get("id") for order in orders]
         order_ids = [i for i in order_ids if i]
 
-        cancelled = []
         if len(order_ids) == 1:
             await asyncio.sleep(0.04)  # allow 30 ms for order to be filled
-        for order_id in order_ids:
-            ok = await self.cancel_order(order_id)
-            if ok:
-                cancelled.append(order_id)
-            await asyncio.sleep(sleep_seconds.cancel_wait)
-            await asyncio.sleep(0)  #  allow others to cancel too
-        return cancelled
+
+        # together, the cancel bucket spaces them out
+        results = await asyncio.gather(
+            *(self.cancel_order(order_id) for order_id in order_ids)
+        )
+        return [
+            order_id
+            for order_id, res in zip(order_ids, results)
+            if res and res.get("success")
+        ]
 
     @staticmethod
     def parse_submit_order_response(res: dict):
@@ -165,6 +172,8 @@ class BtcturkBase(ExchangeAPIClientBase):
 
         return order_time
 
+    def pool_stats(self) -> dict:
+        return self.http.stats()
+
     async def _close_session(self):
-        if self.session:
-            await self.session.close()
+        await self.http.close()
@@ -1,21 +1,17 @@
-import base64
-import hashlib
-import hmac
-import time
 import urllib.parse
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Callable, Optional
-
-import aiohttp
+from typing import AsyncGenerator, Callable, Optional
 
 import src.pubsub.log_pub as log_pub
+import src.streams.btcturk as btc_streams
 from src.domain import Asset, AssetPair
 from src.domain.models import OrderType
 from src.environment import sleep_seconds
 from src.exchanges.btcturk.base import BtcturkBase
+from src.exchanges.btcturk.signer import HmacSigner
 from src.monitoring import logger
-from src.periodic import lock_with_timeout
+from src.monitoring.latency import timed
 from src.web import update_url_query_params
 
 
@@ -27,6 +23,7 @@ class URLs:
     all_orders_url = urllib.parse.urljoin(api_base, "/api/v1/allOrders")
     open_orders_url = urllib.parse.urljoin(api_base, "/api/v1/openOrders")
     ticker_url = urllib.parse.urljoin(api_base, "/api/v2/ticker")
+    ws_url = btc_streams.USER_URI
 
 
 @dataclass
@@ -37,24 +34,23 @@ class BtcturkApiClient(BtcturkBase):
 
     urls: URLs = URLs()
 
-    def _get_headers(self) -> dict:
-        decoded_api_secret = base64.b64decode(self.api_secret)  # type: ignore
-
-        stamp = str(int(time.time()) * 1000)
+    signer: Optional[HmacSigner] = None
 
-        data = "{}{}".format(self.api_key, stamp).encode("utf-8")
+    async def warm_up(self) -> None:
+        await self.http.warm_up(self.urls.api_base)
 
-        signature = hmac.new(decoded_api_secret, data, hashlib.sha256).digest()  # type: ignore
-        signature = base64.b64encode(signature)
+    def _get_signer(self) -> HmacSigner:
+        if not self.signer:
+            self.signer = HmacSigner(api_key=self.api_key, api_secret=self.api_secret)
+        return self.signer
 
-        headers = {
-            "X-PCK": self.api_key,
-            "X-Stamp": stamp,
-            "X-Signature": signature.decode(),  # turn bytes into str because aiothhp headers expects str
-            "Content-Type": "application/json",
-        }
+    def _get_headers(self) -> dict:
+        return self._get_signer().get_headers()
 
-        return headers
+    def create_user_stream(self) -> AsyncGenerator:
+        return btc_streams.create_user_stream(
+            self.urls.ws_url, self._get_signer().get_ws_login
+        )
 
     async def _http(self, uri: str, method: Callable):
         try:
@@ -90,15 +86,22 @@ class BtcturkApiClient(BtcturkBase):
          'requestFund': '0'},
         """
         try:
-            if not self.session or self.session.closed:
-                self.session = aiohttp.ClientSession()
+            if not await self.limits.balance.acquire(sleep_seconds.read_deadline):
+                return None
 
-            return await self._http(self.urls.balance_url, self.session.get)
+            session = self.http.get()
+            return await self._http(self.urls.balance_url, session.get)
         except Exception as e:
             raise e
 
+    @timed("submit")
     async def submit_limit_order(
-        self, pair: AssetPair, side: OrderType, price: float, quantity: float
+        self,
+        pair: AssetPair,
+        side: OrderType,
+        price: float,
+        quantity: float,
+        client_id: Optional[str] = None,
     ) -> Optional[dict]:
         """
         {'code': 0,
@@ -118,10 +121,6 @@ class BtcturkApiClient(BtcturkBase):
         """
 
         try:
-
-            if self.orders_in_last_second > self.max_orders_per_second:
-                return None
-
             params = {
                 "quantity": quantity,
                 "price": price,
@@ -130,18 +129,21 @@ class BtcturkApiClient(BtcturkBase):
                 "orderType": side.value,
                 "pairSymbol": pair.symbol,
             }
+            if client_id:
+                # events and open orders carry it back, before the id is known
+                params["newOrderClientId"] = client_id
 
             if self.locks.order.locked():
                 return None
 
-            async with self.locks.order:
-                if not self.session or self.session.closed:
-                    self.session = aiohttp.ClientSession()
+            if not await self.limits.order.acquire(sleep_seconds.order_deadline):
+                return None
 
-                async with self.session.post(
+            async with self.locks.order:
+                session = self.http.get()
+                async with session.post(
                     self.urls.order_url, headers=self._get_headers(), json=params
                 ) as res:
-                    self.orders_in_last_second += 1
                     return await res.json(content_type=None)
 
         except Exception as e:
@@ -193,34 +195,28 @@ class BtcturkApiClient(BtcturkBase):
         params = {"pairSymbol": pair.symbol}
         uri = update_url_query_params(self.urls.open_orders_url, params)
 
-        if not self.session or self.session.closed:
-            self.session = aiohttp.ClientSession()
-
-        async with lock_with_timeout(self.locks.read, sleep_seconds.read_wait) as ok:
-            if ok:
-                return await self._http(uri, self.session.get)
+        if not await self.limits.read.acquire(sleep_seconds.read_deadline):
+            return None
 
-        return None
+        session = self.http.get()
+        return await self._http(uri, session.get)
 
-    async def cancel_order(self, order_id: int) -> Optional[dict]:
+    @timed("cancel")
+    async def cancel_order(self, order_id: int, acquire: bool = True) -> Optional[dict]:
+        """acquire False when the caller holds a cancel token already"""
         try:
             if not order_id:
                 return None
-            if self.locks.cancel.locked():
+
+            if acquire and not await self.limits.cancel.acquire(
+                sleep_seconds.cancel_deadline
+            ):
                 return None
 
             uri = update_url_query_params(self.urls.order_url, {"id": order_id})
 
-            if not self.session or self.session.closed:
-                self.session = aiohttp.ClientSession()
-
-            async with lock_with_timeout(
-                self.locks.cancel, sleep_seconds.cancel_wait
-            ) as ok:
-                if ok:
-                    return await self._http(uri, self.session.delete)
-
-            return None
+            session = self.http.get()
+            return await self._http(uri, session.delete)
         except Exception as e:
             # we could not cancel the order, its normal
             logger.info(f"cancel_order: {e}")
@@ -228,13 +224,12 @@ class BtcturkApiClient(BtcturkBase):
 
     # async def get_all_orders(self, params: dict) -> Optional[dict]:
     #     uri = update_url_query_params(self.all_orders_url, params)
-    #     return await self._http(uri, self.session.get)
+    #     return await self._http(uri, self.http.get().get)
 
     async def _get(self, uri: str):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(uri) as res:
-                    return await res.json(content_type=None)
+            async with self.http.get().get(uri) as res:
+                return await res.json(content_type=None)
         except Exception as e:
             logger.error(f"_get {e}")
 
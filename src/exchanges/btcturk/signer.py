@@ -0,0 +1,61 @@
+import base64
+import hashlib
+import hmac
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict
+
+
+@dataclass
+class HmacSigner:
+    """
+    Sign api_key + stamp with the decoded secret
+
+    The secret is decoded and the key hashed once,
+    each stamp copies that state and only hashes the stamp.
+    Requests in the same millisecond share the same headers, do not mutate them.
+    """
+
+    api_key: str
+    api_secret: str
+    clock: Callable[[], float] = time.time
+
+    stamp: int = 0
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        secret = base64.b64decode(self.api_secret)
+        self.mac = hmac.new(secret, self.api_key.encode("utf-8"), hashlib.sha256)
+
+    def get_headers(self) -> Dict[str, str]:
+        stamp = int(self.clock() * 1000)
+        if stamp == self.stamp:
+            return self.headers
+
+        stamp_str = str(stamp)
+        mac = self.mac.copy()
+        mac.update(stamp_str.encode("utf-8"))
+
+        self.stamp = stamp
+        self.headers = {
+            "X-PCK": self.api_key,
+            "X-Stamp": stamp_str,
+            "X-Signature": base64.b64encode(mac.digest()).decode(),
+            "Content-Type": "application/json",
+        }
+        return self.headers
+
+    def get_ws_login(self, nonce: int = 3000) -> list:
+        """The private socket signs api_key + nonce instead of a stamp"""
+        mac = self.mac.copy()
+        mac.update(str(nonce).encode("utf-8"))
+        return [
+            114,
+            {
+                "type": 114,
+                "publicKey": self.api_key,
+                "timestamp": int(self.clock() * 1000),
+                "nonce": nonce,
+                "signature": base64.b64encode(mac.digest()).decode(),
+            },
+        ]
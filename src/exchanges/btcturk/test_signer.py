@@ -0,0 +1,75 @@
+import base64
+import hashlib
+import hmac
+import time
+import timeit
+
+from .signer import HmacSigner
+
+API_KEY = "b9a5f9e7-3c6e-4d1a-8f0a-2a7c1d9e4b10"
+API_SECRET = base64.b64encode(b"not a real secret, only for tests").decode()
+
+
+def sign_every_time(api_key: str, api_secret: str, stamp: str) -> dict:
+    # what _get_headers did before the signer
+    decoded_api_secret = base64.b64decode(api_secret)
+    data = "{}{}".format(api_key, stamp).encode("utf-8")
+    signature = hmac.new(decoded_api_secret, data, hashlib.sha256).digest()
+    signature = base64.b64encode(signature)
+    return {
+        "X-PCK": api_key,
+        "X-Stamp": stamp,
+        "X-Signature": signature.decode(),
+        "Content-Type": "application/json",
+    }
+
+
+def test_signer():
+    now = [1640119334.586]
+    signer = HmacSigner(API_KEY, API_SECRET, clock=lambda: now[0])
+
+    headers = signer.get_headers()
+    assert headers == sign_every_time(API_KEY, API_SECRET, "1640119334586")
+
+    # same millisecond, same headers
+    now[0] = 1640119334.5862
+    assert signer.get_headers() is headers
+
+    now[0] = 1640119334.587
+    assert signer.get_headers() == sign_every_time(API_KEY, API_SECRET, "1640119334587")
+
+
+def test_ws_login():
+    signer = HmacSigner(API_KEY, API_SECRET, clock=lambda: 1640119334.586)
+
+    message_type, login = signer.get_ws_login(nonce=3000)
+    assert message_type == login["type"] == 114
+    assert login["timestamp"] == 1640119334586
+    headers = sign_every_time(API_KEY, API_SECRET, "3000")
+    assert login["signature"] == headers["X-Signature"]
+
+    # the headers are not touched
+    assert signer.get_headers()["X-Stamp"] == "1640119334586"
+
+
+def bench_signer(number: int = 100000):
+    signer = HmacSigner(API_KEY, API_SECRET)
+
+    def naive():
+        return sign_every_time(API_KEY, API_SECRET, str(int(time.time() * 1000)))
+
+    # bypass the stamp cache to time the signing itself
+    stamps = iter(range(10 ** 12, 10 ** 13))
+    uncached = HmacSigner(API_KEY, API_SECRET, clock=lambda: next(stamps) / 1000)
+
+    for name, func in (
+        ("sign every time", naive),
+        ("signer, new stamp", uncached.get_headers),
+        ("signer, same ms", signer.get_headers),
+    ):
+        seconds = timeit.timeit(func, number=number)
+        print(f"{name}: {seconds / number * 1e6:.2f} µs per request")
+
+
+if __name__ == "__main__":
+    bench_signer()
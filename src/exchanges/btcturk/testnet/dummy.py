@@ -2,6 +2,7 @@ import random
 import time
 from dataclasses import dataclass, field
 from decimal import Decimal
+from typing import Callable
 
 from src.domain import Asset, AssetPair
 from src.exchanges.btcturk.testnet.models import (
@@ -20,6 +21,10 @@ from src.monitoring import logger
 class BtcturkDummy:
     account: Account = field(default_factory=Account)
 
+    # seed them for the same order ids and times on every replay
+    rnd: random.Random = field(default_factory=random.Random)
+    clock: Callable[[], float] = time.time
+
     async def mock_account_balance(self) -> AccountBalanceResponse:
         return AccountBalanceResponse(
             success=True, data=list(self.account.assets.values())
@@ -119,8 +124,8 @@ class BtcturkDummy:
         self._init_pair_if_not_exists(pair.symbol)
 
         order = OrderData(
-            id=random.randint(1, 1000000),
-            datetime=int(time.time() * 1000),
+            id=self.rnd.randint(1, 1000000),
+            datetime=int(self.clock() * 1000),
             price=str(price),
             quantity=str(quantity),
             type=order_type,
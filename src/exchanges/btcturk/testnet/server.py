@@ -0,0 +1,245 @@
+import itertools
+import json
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from aiohttp import web
+
+import src.streams.btcturk as btc_streams
+from src.exchanges.btcturk.main import URLs
+from src.exchanges.btcturk.signer import HmacSigner
+
+
+def create_local_urls(api_base: str) -> URLs:
+    """The same endpoints on a local stand-in"""
+
+    class LocalURLs(URLs):
+        order_url = urllib.parse.urljoin(api_base, "/api/v1/order")
+        balance_url = urllib.parse.urljoin(api_base, "/api/v1/users/balances")
+        all_orders_url = urllib.parse.urljoin(api_base, "/api/v1/allOrders")
+        open_orders_url = urllib.parse.urljoin(api_base, "/api/v1/openOrders")
+        ticker_url = urllib.parse.urljoin(api_base, "/api/v2/ticker")
+        ws_url = urllib.parse.urljoin(api_base.replace("http", "ws", 1), "/ws")
+
+    LocalURLs.api_base = api_base
+    return LocalURLs()
+
+
+@dataclass
+class BtcturkStandin:
+    """
+    A local http server that answers like the BTCTurk REST api
+
+    Orders rest until cancelled or filled by hand with fill, and lock
+    their funds meanwhile. Logged in user sockets at /ws get the order
+    and balance events
+    """
+
+    host: str = "127.0.0.1"
+    port: int = 0  # any free port
+
+    balances: Dict[str, str] = field(default_factory=dict)  # free
+    locked: Dict[str, str] = field(default_factory=dict)
+    orders: Dict[int, dict] = field(default_factory=dict)
+
+    # checks the user socket login if set
+    api_key: str = ""
+    api_secret: str = ""
+
+    submitted: int = 0
+    cancelled: int = 0
+
+    runner: Optional[web.AppRunner] = None
+    base_url: str = ""
+    sockets: List[web.WebSocketResponse] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.ids: Iterator[int] = itertools.count(1)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("HEAD", "/", self.home)
+        app.router.add_post("/api/v1/order", self.submit_order)
+        app.router.add_delete("/api/v1/order", self.cancel_order)
+        app.router.add_get("/api/v1/openOrders", self.open_orders)
+        app.router.add_get("/api/v1/users/balances", self.account_balance)
+        app.router.add_get("/ws", self.user_socket)
+        return app
+
+    async def start(self) -> URLs:
+        self.runner = web.AppRunner(self.create_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://{self.host}:{port}"
+        return create_local_urls(self.base_url)
+
+    async def stop(self) -> None:
+        for ws in list(self.sockets):
+            await ws.close()
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def home(self, request: web.Request) -> web.Response:
+        return web.Response()
+
+    async def submit_order(self, request: web.Request) -> web.Response:
+        params = await request.json()
+        order_id = next(self.ids)
+        order = {
+            "id": order_id,
+            "datetime": int(time.time() * 1000),
+            "pairSymbol": params["pairSymbol"],
+            "type": params["orderType"],
+            "method": params["orderMethod"],
+            "price": str(params["price"]),
+            "quantity": str(params["quantity"]),
+            "leftAmount": str(params["quantity"]),
+            "newOrderClientId": params.get("newOrderClientId", ""),
+            "orderClientId": params.get("newOrderClientId", ""),
+        }
+        self.orders[order_id] = order
+        self.submitted += 1
+        self.lock(order, Decimal(order["quantity"]))
+        await self.push(btc_streams.ORDER_INSERT, order)
+        return web.json_response(
+            {"success": True, "message": "SUCCESS", "code": 0, "data": order}
+        )
+
+    async def cancel_order(self, request: web.Request) -> web.Response:
+        order_id = int(request.query.get("id", 0))
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return web.json_response(
+                {"success": False, "message": "order not found", "code": 1}
+            )
+        self.cancelled += 1
+        self.lock(order, -Decimal(order["leftAmount"]))
+        await self.push(btc_streams.ORDER_DELETE, order)
+        await self.push(btc_streams.BALANCE_UPDATE, {"data": self.balance_list()})
+        return web.json_response({"success": True, "message": "SUCCESS", "code": 0})
+
+    async def open_orders(self, request: web.Request) -> web.Response:
+        symbol = request.query.get("pairSymbol")
+        orders = [o for o in self.orders.values() if o["pairSymbol"] == symbol]
+        data = {
+            "asks": [o for o in orders if o["type"] == "sell"],
+            "bids": [o for o in orders if o["type"] == "buy"],
+        }
+        return web.json_response({"success": True, "data": data})
+
+    def split(self, symbol: str) -> Tuple[str, str]:
+        base = next((a for a in self.balances if symbol.startswith(a)), symbol[:3])
+        return base, symbol[len(base) :]
+
+    def move(self, asset: str, free: Decimal, locked: Decimal = Decimal(0)) -> None:
+        self.balances[asset] = str(Decimal(self.balances.get(asset, "0")) + free)
+        self.locked[asset] = str(Decimal(self.locked.get(asset, "0")) + locked)
+
+    def lock(self, order: dict, amount: Decimal) -> None:
+        """Lock what amount of the order needs, unlock if negative"""
+        base, quote = self.split(order["pairSymbol"])
+        if order["type"] == "buy":
+            asset, amount = quote, amount * Decimal(order["price"])
+        else:
+            asset = base
+        self.move(asset, -amount, amount)
+
+    def balance_list(self) -> List[dict]:
+        balances = []
+        for asset, free in self.balances.items():
+            locked = self.locked.get(asset, "0")
+            total = str(Decimal(free) + Decimal(locked))
+            balances.append(
+                {"asset": asset, "free": free, "locked": locked, "balance": total}
+            )
+        return balances
+
+    async def account_balance(self, request: web.Request) -> web.Response:
+        return web.json_response({"success": True, "data": self.balance_list()})
+
+    def check_login(self, login: dict) -> bool:
+        if not self.api_secret:
+            return True
+        signer = HmacSigner(api_key=self.api_key, api_secret=self.api_secret)
+        expected = signer.get_ws_login(login.get("nonce", 0))[1]["signature"]
+        return (
+            login.get("publicKey") == self.api_key
+            and login.get("signature") == expected
+        )
+
+    async def user_socket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        message_type, login = json.loads(await ws.receive_str())
+        ok = message_type == btc_streams.USER_LOGIN and self.check_login(login)
+        message = "Authenticated" if ok else "Invalid signature"
+        await ws.send_json([114, {"type": 114, "ok": ok, "message": message}])
+        if not ok:
+            await ws.close()
+            return ws
+
+        self.sockets.append(ws)
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            self.sockets.remove(ws)
+        return ws
+
+    async def push(self, message_type: int, event: dict) -> None:
+        for ws in list(self.sockets):
+            await ws.send_json([message_type, {"type": message_type, **event}])
+
+    async def fill(self, order_id: int, amount: Optional[Decimal] = None) -> None:
+        """Match amount of the order, all that is left by default"""
+        order = self.orders[order_id]
+        left = Decimal(order["leftAmount"])
+        amount = left if amount is None else min(amount, left)
+        left -= amount
+        order["leftAmount"] = str(left)
+        if not left:
+            del self.orders[order_id]
+
+        price = Decimal(order["price"])
+        symbol = order["pairSymbol"]
+        base, quote = self.split(symbol)
+
+        self.lock(order, -amount)
+        if order["type"] == "buy":
+            self.move(quote, -amount * price)
+            self.move(base, amount)
+        else:
+            self.move(base, -amount)
+            self.move(quote, amount * price)
+
+        await self.push(
+            btc_streams.ORDER_MATCHED,
+            {
+                "id": order_id,
+                "pairSymbol": symbol,
+                "isBid": order["type"] == "buy",
+                "price": order["price"],
+                "amount": str(amount),
+                "numLeft": str(left),
+            },
+        )
+        await self.push(
+            btc_streams.USER_TRADE,
+            {
+                "id": next(self.ids),
+                "orderId": order_id,
+                "pairSymbol": symbol,
+                "orderType": order["type"],
+                "price": order["price"],
+                "amount": str(amount),
+            },
+        )
+        await self.push(btc_streams.BALANCE_UPDATE, {"data": self.balance_list()})
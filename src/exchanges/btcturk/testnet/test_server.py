@@ -0,0 +1,91 @@
+import asyncio
+import base64
+from decimal import Decimal
+
+import src.streams.btcturk as btc_streams
+from src.domain import Asset, OrderType, create_asset_pair
+from src.exchanges.btcturk.main import BtcturkApiClient
+from src.exchanges.btcturk.testnet.server import BtcturkStandin
+from src.pubsub.pubs import BalancePub, UserDataPub
+
+
+async def submit_and_cancel():
+    standin = BtcturkStandin(balances={"XRP": "300", "TRY": "1000"})
+    urls = await standin.start()
+    client = BtcturkApiClient(urls=urls)
+    pair = create_asset_pair("XRP", "TRY")
+
+    try:
+        res = await client.submit_limit_order(pair, OrderType.BUY, 10.8, 90)
+        order_id = res["data"]["id"]
+
+        res = await client.get_open_orders(pair)
+        assert [o["id"] for o in res["data"]["bids"]] == [order_id]
+
+        assert await client.cancel_order(order_id)
+        assert not standin.orders
+
+        res = await client.get_account_balance()
+        assert client.parse_account_balance(res)["XRP"]["free"] == "300"
+    finally:
+        await client.http.close()
+        await standin.stop()
+
+    assert standin.submitted == standin.cancelled == 1
+
+
+def test_standin():
+    asyncio.run(submit_and_cancel())
+
+
+async def user_events():
+    api_secret = base64.b64encode(b"stand-in secret").decode()
+    standin = BtcturkStandin(
+        balances={"XRP": "0", "TRY": "1000"}, api_key="key", api_secret=api_secret
+    )
+    urls = await standin.start()
+    client = BtcturkApiClient(urls=urls, api_key="key", api_secret=api_secret)
+    pair = create_asset_pair("XRP", "TRY")
+
+    balance_pub = BalancePub(pubsub_key="balance", exchange=client)
+    balance_pub.add_asset(Asset(symbol="XRP"))
+    balance_pub.add_asset(Asset(symbol="TRY"))
+
+    events: list = []
+    user_data = UserDataPub(pubsub_key="user_data", exchange=client)
+    user_data.add_balance_pub(balance_pub)
+    user_data.listeners.append(lambda message_type, _: events.append(message_type))
+    task = asyncio.create_task(user_data.run())
+
+    try:
+        while not standin.sockets:
+            await asyncio.sleep(0.01)
+        assert user_data.live and balance_pub.live
+
+        res = await client.submit_limit_order(pair, OrderType.BUY, 10, 20)
+        await standin.fill(res["data"]["id"], Decimal(5))
+        while len(events) < 5:
+            await asyncio.sleep(0.01)
+
+        assert events == [
+            btc_streams.USER_LOGIN,
+            btc_streams.ORDER_INSERT,
+            btc_streams.ORDER_MATCHED,
+            btc_streams.USER_TRADE,
+            btc_streams.BALANCE_UPDATE,
+        ]
+        assert balance_pub.get_asset("XRP").free == 5
+        # 15 still on the book
+        assert balance_pub.get_asset("TRY").free == 800
+        assert balance_pub.get_asset("TRY").locked == 150
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await client.http.close()
+        await standin.stop()
+
+    assert not user_data.live
+
+
+def test_user_events():
+    asyncio.run(user_events())
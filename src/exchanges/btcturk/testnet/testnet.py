@@ -17,7 +17,12 @@ class BtcturkApiClientTestnet(BtcturkBase):
     dummy_exchange: BtcturkDummy = field(default_factory=BtcturkDummy)
 
     async def submit_limit_order(
-        self, pair: AssetPair, side: OrderType, price: float, quantity: float
+        self,
+        pair: AssetPair,
+        side: OrderType,
+        price: float,
+        quantity: float,
+        client_id: Optional[str] = None,
     ) -> Optional[dict]:
         try:
             if self.locks.order.locked():
@@ -0,0 +1,75 @@
+import asyncio
+import collections
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Iterable
+
+from src.domain import OrderId
+from src.environment import sleep_seconds
+from src.exchanges.base import ExchangeAPIClientBase
+from src.monitoring import logger
+
+
+class CancelOutcome(str, Enum):
+    CANCELLED = "cancelled"
+    REFUSED = "refused"  # the exchange said no, filled or gone already
+    NO_TOKEN = "no_token"  # over the cancel budget, not sent
+    FAILED = "failed"  # no answer
+
+
+@dataclass
+class CancelScheduler:
+    """
+    Cancels go out together, as many at once as the cancel bucket allows
+
+    A cancel waits for its token at most cancel_deadline, the ones after it
+    queue behind in the bucket. A cancel of an order already on its way
+    is not sent again, the caller gets the outcome of the first
+    """
+
+    exchange: ExchangeAPIClientBase
+
+    in_flight: Dict[OrderId, asyncio.Future] = field(default_factory=dict)
+    outcomes: collections.Counter = field(default_factory=collections.Counter)
+
+    def cancel(self, order_id: OrderId) -> asyncio.Future:
+        future = self.in_flight.get(order_id)
+        if future is None:
+            future = asyncio.ensure_future(self.send(order_id))
+            self.in_flight[order_id] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(order_id, None))
+        return future
+
+    async def cancel_many(
+        self, order_ids: Iterable[OrderId]
+    ) -> Dict[OrderId, CancelOutcome]:
+        order_ids = list(order_ids)
+        futures = [self.cancel(order_id) for order_id in order_ids]
+        # a caller giving up does not take the cancels down with it
+        outcomes = await asyncio.shield(asyncio.gather(*futures))
+        return dict(zip(order_ids, outcomes))
+
+    async def send(self, order_id: OrderId) -> CancelOutcome:
+        outcome = await self.request(order_id)
+        self.outcomes[outcome.value] += 1
+        return outcome
+
+    async def request(self, order_id: OrderId) -> CancelOutcome:
+        # the token is taken here, a cancel that did not get one was never sent
+        if not await self.exchange.limits.cancel.acquire(sleep_seconds.cancel_deadline):
+            return CancelOutcome.NO_TOKEN
+
+        try:
+            res = await self.exchange.cancel_order(order_id, acquire=False)
+        except Exception as e:
+            logger.info(f"cancel {order_id}: {e}")
+            return CancelOutcome.FAILED
+
+        if not res:
+            return CancelOutcome.FAILED
+        if res.get("success"):
+            return CancelOutcome.CANCELLED
+        return CancelOutcome.REFUSED
+
+    def dict(self) -> dict:
+        return {"in flight": len(self.in_flight), **self.outcomes}
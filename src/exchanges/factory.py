@@ -1,10 +1,11 @@
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict
+from typing import Dict, Optional
 
 import src.exchanges.binance.factory as binance_factory
 import src.exchanges.btcturk.factory as btcturk_factory
 from src.exchanges.base import ExchangeAPIClientBase
+from src.exchanges.limits import SharedLimits
 from src.monitoring import logger
 
 
@@ -34,6 +35,24 @@ class ApiClientFactory:
 
     API_CLIENTS: Dict[tuple, ExchangeAPIClientBase] = field(default_factory=dict)
 
+    # set with robot workers, the clients of every process share the buckets
+    shared_limits: Optional[SharedLimits] = None
+
+    def slot_of(self, key: tuple) -> int:
+        """The same in every process, one per exchange and network"""
+        keys = [
+            (ex_type, network)
+            for ex_type, networks in self.API_CLIENT_FACTORIES.items()
+            for network in networks
+        ]
+        return keys.index(key)
+
+    def share_limits(self, shared_limits: SharedLimits) -> None:
+        """Clients made already and from now on take from the shared buckets"""
+        self.shared_limits = shared_limits
+        for key, client in self.API_CLIENTS.items():
+            shared_limits.share(client.limits, self.slot_of(key))
+
     def create_api_client_if_not_exists(
         self, ex_type: ExchangeType, network: NetworkType
     ) -> ExchangeAPIClientBase:
@@ -47,6 +66,8 @@ class ApiClientFactory:
             raise ValueError(f"unknown exchange: {ex_type}")
 
         client = factory_func()
+        if self.shared_limits:
+            self.shared_limits.share(client.limits, self.slot_of(key))
         self.API_CLIENTS[key] = client
 
         return client
@@ -0,0 +1,227 @@
+import asyncio
+import multiprocessing
+import struct
+import time
+from dataclasses import dataclass, field, fields
+from multiprocessing import shared_memory
+from typing import Any, Callable, Optional
+
+# tokens, updated and set up, of a shared bucket
+SHARED_BUCKET = struct.Struct("<3d")
+DOUBLE = struct.Struct("<d")
+# an api client each, every exchange and network
+SHARED_SLOTS = 8
+
+
+@dataclass
+class TokenBucket:
+    """
+    rate tokens per second, at most capacity of them saved up
+
+    In any one second window no more than rate + capacity requests go out,
+    so bursts can not straddle a counter reset
+    """
+
+    rate: float
+    capacity: float = 1
+    clock: Callable[[], float] = time.monotonic
+
+    def __post_init__(self):
+        self.tokens = float(self.capacity)
+        self.updated = self.clock()
+
+    def refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is free"""
+        self.refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def reserve(self, timeout: float) -> Optional[float]:
+        """Take a token free within timeout seconds, None if there is none"""
+        wait = self.wait_time()
+        if wait > timeout:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def release(self) -> None:
+        self.tokens += 1
+
+    async def acquire(self, timeout: float = 0) -> bool:
+        """
+        Reserve a token if it is free within timeout seconds, and wait for it
+
+        Waiters are served in order, each reservation pushes the next one back
+        """
+        wait = self.reserve(timeout)
+        if wait is None:
+            return False
+
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.release()
+                raise
+        return True
+
+    def drain(self, seconds: float) -> None:
+        """Hand out nothing for the next seconds, after a 429 for example"""
+        self.refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+@dataclass
+class SharedTokenBucket(TokenBucket):
+    """
+    A bucket whose tokens are in shared memory, every process holding
+    the same offset takes from the same tokens, one call at a time
+    """
+
+    buf: Any = None
+    offset: int = 0
+    lock: Any = None
+
+    def __post_init__(self):
+        with self.lock:
+            if not SHARED_BUCKET.unpack_from(self.buf, self.offset)[2]:
+                SHARED_BUCKET.pack_into(
+                    self.buf, self.offset, float(self.capacity), self.clock(), 1
+                )
+
+    @property  # type: ignore
+    def tokens(self) -> float:
+        return DOUBLE.unpack_from(self.buf, self.offset)[0]
+
+    @tokens.setter
+    def tokens(self, tokens: float) -> None:
+        DOUBLE.pack_into(self.buf, self.offset, tokens)
+
+    @property  # type: ignore
+    def updated(self) -> float:
+        return DOUBLE.unpack_from(self.buf, self.offset + DOUBLE.size)[0]
+
+    @updated.setter
+    def updated(self, updated: float) -> None:
+        DOUBLE.pack_into(self.buf, self.offset + DOUBLE.size, updated)
+
+    def wait_time(self) -> float:
+        with self.lock:
+            return super().wait_time()
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            return super().try_acquire()
+
+    def reserve(self, timeout: float) -> Optional[float]:
+        with self.lock:
+            return super().reserve(timeout)
+
+    def release(self) -> None:
+        with self.lock:
+            super().release()
+
+    def drain(self, seconds: float) -> None:
+        with self.lock:
+            super().drain(seconds)
+
+
+@dataclass
+class RateLimits:
+    """
+    One bucket per endpoint class, shared by every robot on the same api key
+    """
+
+    order: TokenBucket = field(default_factory=lambda: TokenBucket(rate=5, capacity=1))
+    cancel: TokenBucket = field(
+        default_factory=lambda: TokenBucket(rate=5, capacity=2)  # 300/min
+    )
+    read: TokenBucket = field(
+        default_factory=lambda: TokenBucket(rate=5, capacity=2)  # 300/min
+    )
+    balance: TokenBucket = field(
+        default_factory=lambda: TokenBucket(rate=1.5, capacity=1)  # 90/min
+    )
+
+    def buckets(self) -> tuple:
+        return (self.order, self.cancel, self.read, self.balance)
+
+    def drain(self, seconds: float) -> None:
+        for bucket in self.buckets():
+            bucket.drain(seconds)
+
+    def use_clock(self, clock: Callable[[], float]) -> None:
+        """Refill by another clock from now on, a virtual one in a replay"""
+        for bucket in self.buckets():
+            bucket.clock = clock
+            bucket.updated = clock()
+
+
+BUCKETS = tuple(bucket.name for bucket in fields(RateLimits))
+SHARED_SIZE = SHARED_SLOTS * len(BUCKETS) * SHARED_BUCKET.size
+
+
+@dataclass
+class SharedLimits:
+    """
+    Rate limit buckets in shared memory, a slot of them per api client
+
+    Made in the supervisor and attached in the robot workers,
+    so all of them together send no more than one api key may
+    """
+
+    shm: shared_memory.SharedMemory
+    lock: Any
+    owner: bool = False
+
+    @classmethod
+    def create(cls) -> "SharedLimits":
+        shm = shared_memory.SharedMemory(create=True, size=SHARED_SIZE)
+        shm.buf[:SHARED_SIZE] = bytes(SHARED_SIZE)
+        # reentrant, a locked call may call another
+        lock = multiprocessing.get_context("spawn").RLock()
+        return cls(shm=shm, lock=lock, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, lock: Any) -> "SharedLimits":
+        return cls(shm=shared_memory.SharedMemory(name=name), lock=lock)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def share(self, limits: RateLimits, slot: int) -> None:
+        """The buckets of limits take from the slot from now on"""
+        if not 0 <= slot < SHARED_SLOTS:
+            raise ValueError(f"no shared limits slot {slot}")
+
+        for index, name in enumerate(BUCKETS):
+            bucket = getattr(limits, name)
+            offset = (slot * len(BUCKETS) + index) * SHARED_BUCKET.size
+            shared = SharedTokenBucket(
+                rate=bucket.rate,
+                capacity=bucket.capacity,
+                clock=bucket.clock,
+                buf=self.shm.buf,
+                offset=offset,
+                lock=self.lock,
+            )
+            setattr(limits, name, shared)
+
+    def close(self) -> None:
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
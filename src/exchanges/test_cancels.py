@@ -0,0 +1,78 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.environment import sleep_seconds
+from src.exchanges.base import ExchangeAPIClientBase
+from src.exchanges.cancels import CancelOutcome, CancelScheduler
+
+
+@dataclass
+class CancelExchange(ExchangeAPIClientBase):
+    responses: Dict[int, Optional[dict]] = field(default_factory=dict)
+    sent: List[int] = field(default_factory=list)
+    active: int = 0
+    most_active: int = 0
+
+    async def cancel_order(self, order_id: int, acquire: bool = True) -> Optional[dict]:
+        if acquire and not await self.limits.cancel.acquire(1):
+            return None
+        self.sent.append(order_id)
+        self.active += 1
+        self.most_active = max(self.most_active, self.active)
+        await asyncio.sleep(0.02)
+        self.active -= 1
+        if order_id not in self.responses:
+            raise ConnectionError("timeout")
+        return self.responses[order_id]
+
+
+async def cancel_together():
+    exchange = CancelExchange(
+        responses={1: {"success": True}, 2: {"success": False}, 3: None}
+    )
+    cancels = CancelScheduler(exchange=exchange)
+
+    # the same order asked twice goes out once
+    outcomes, again = await asyncio.gather(
+        cancels.cancel_many([1, 2, 3, 4]), cancels.cancel_many([1])
+    )
+    assert outcomes == {
+        1: CancelOutcome.CANCELLED,
+        2: CancelOutcome.REFUSED,
+        3: CancelOutcome.FAILED,
+        4: CancelOutcome.FAILED,
+    }
+    assert again == {1: CancelOutcome.CANCELLED}
+    assert sorted(exchange.sent) == [1, 2, 3, 4]
+    assert exchange.most_active > 1
+    assert not cancels.in_flight
+
+    # over the budget, not sent at all
+    exchange.limits.cancel.drain(5)
+    assert await cancels.cancel(5) == CancelOutcome.NO_TOKEN
+    assert 5 not in exchange.sent
+    assert cancels.dict()["no_token"] == 1
+
+
+def test_cancel_scheduler():
+    asyncio.run(cancel_together())
+
+
+async def cancel_burst():
+    exchange = CancelExchange(responses={i: {"success": True} for i in range(10)})
+    cancels = CancelScheduler(exchange=exchange)
+
+    outcomes = await cancels.cancel_many(range(10))
+
+    # 2 saved up and 1 more within the deadline, the rest never went out
+    assert sorted(exchange.sent) == [0, 1, 2]
+    assert [outcomes[i] for i in range(3)] == [CancelOutcome.CANCELLED] * 3
+    assert [outcomes[i] for i in range(3, 10)] == [CancelOutcome.NO_TOKEN] * 7
+    assert cancels.dict()["no_token"] == 7
+    assert "failed" not in cancels.dict()
+
+
+def test_cancel_burst_over_budget(monkeypatch):
+    monkeypatch.setattr(sleep_seconds, "cancel_deadline", 0.25)
+    asyncio.run(cancel_burst())
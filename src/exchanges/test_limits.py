@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import time
+from dataclasses import dataclass
+
+from src.exchanges.limits import RateLimits, SharedLimits, TokenBucket
+
+
+@dataclass
+class FakeClock:
+    now: float = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=5, capacity=2, clock=clock)
+
+    # burst up to the capacity
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.wait_time() == 0.2
+
+    # a reset never hands out more than the refill
+    clock.now = 0.1
+    assert not bucket.try_acquire()
+    clock.now = 0.2
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    # long idle saves up only the capacity
+    clock.now = 10
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_drain():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=5, capacity=2, clock=clock)
+
+    bucket.drain(5)
+    clock.now = 4.9
+    assert not bucket.try_acquire()
+    clock.now = 5.3
+    assert bucket.try_acquire()
+
+
+async def reserve_in_order():
+    bucket = TokenBucket(rate=100, capacity=1)
+
+    assert await bucket.acquire()
+    # the next token is 10 ms away
+    assert not await bucket.acquire(timeout=0.001)
+    assert await bucket.acquire(timeout=0.05)
+
+    # a reservation pushes the next waiter back
+    results = await asyncio.gather(
+        bucket.acquire(timeout=0.015), bucket.acquire(timeout=0.015)
+    )
+    assert results == [True, False]
+
+
+def test_acquire_with_deadline():
+    asyncio.run(reserve_in_order())
+
+
+def send_orders(name, lock, start, seconds, sent) -> None:
+    """A robot worker sending orders as fast as its limits let it"""
+    shared = SharedLimits.attach(name, lock)
+    limits = RateLimits()
+    shared.share(limits, 0)
+    start.wait()
+    count = 0
+    until = time.monotonic() + seconds
+    while time.monotonic() < until:
+        if limits.order.try_acquire():
+            count += 1
+        time.sleep(0.001)
+    shared.close()
+    sent.put(count)
+
+
+def test_workers_share_one_key():
+    shared = SharedLimits.create()
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(3)
+    sent = context.Queue()
+    workers = [
+        context.Process(
+            target=send_orders, args=(shared.name, shared.lock, start, 1, sent)
+        )
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        start.wait(30)
+        counts = [sent.get(timeout=30) for _ in workers]
+        for worker in workers:
+            worker.join(5)
+    finally:
+        shared.close()
+
+    # one key may send 5 orders a second and a burst of 1, together not more
+    assert all(counts)
+    assert sum(counts) <= 5 * 1 + 1
+    assert sum(counts) >= 5
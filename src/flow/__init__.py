@@ -1 +1,7 @@
-from .api import flow_api
+from src.environment import robot_workers
+
+from .api import FlowApi
+from .api import flow_api as local_flow_api
+from .sharded import ShardedFlowApi
+
+flow_api = ShardedFlowApi(workers=robot_workers) if robot_workers else local_flow_api
@@ -4,6 +4,8 @@ from typing import List
 import src.pubsub.log_pub as log_pub
 from src.flow.runner import flow_runner
 from src.monitoring import logger
+from src.monitoring.latency import timings
+from src.monitoring.metrics import Scrape, metrics
 from src.stgs import StrategyConfig
 
 
@@ -48,5 +50,14 @@ class FlowApi:
     def get_tasks(self) -> List[str]:
         return flow_runner.get_tasks()
 
+    async def latency(self) -> dict:
+        return timings.dict()
+
+    async def scrape(self) -> Scrape:
+        return metrics.collect()
+
+    async def shutdown(self) -> None:
+        await self.stop_all_tasks()
+
 
 flow_api = FlowApi()
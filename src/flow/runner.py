@@ -6,13 +6,13 @@ from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, Optional
 
-import simplejson  # type: ignore
-
 import src.pubsub.log_pub as log_pub
 from src.environment import debug, sleep_seconds
 from src.monitoring import logger
+from src.monitoring.metrics import Scrape, metrics
 from src.periodic import periodic
 from src.proc import process_pool_executor, thread_pool_executor
+from src.pubsub.hub import MISSING
 from src.pubsub.pubs import PublisherBase
 from src.pubsub.radio import radio
 from src.robots import robot_factory
@@ -83,6 +83,7 @@ class FlowRunner:
         ]
         if not debug:
             coros.append(self.start_balance_station(robot))
+            coros.append(self.start_user_data_station(robot))
         coros = [c for c in coros if c]
 
         await asyncio.gather(*coros)
@@ -126,6 +127,8 @@ class FlowRunner:
             # leader and follower pubs are not really publishing for now
             radio.drop_listener(log_pub.DEFAULT_CHANNEL)
             radio.drop_listener(flowrun.robot.balance_pub.pubsub_key)
+            if flowrun.robot.user_data_pub:
+                radio.drop_listener(flowrun.robot.user_data_pub.pubsub_key)
             radio.drop_listener(flowrun.robot.leader_pub.pubsub_key)
             radio.drop_listener(flowrun.robot.follower_pub.pubsub_key)
             if flowrun.robot.bridge_pub:
@@ -134,9 +137,17 @@ class FlowRunner:
     def get_tasks(self) -> list:
         return list(self.flowruns.keys())
 
+    def collect_metrics(self, scrape: Scrape) -> None:
+        for flowrun in list(self.flowruns.values()):
+            flowrun.robot.collect_metrics(scrape)
+
     def start_balance_station(self, robot: LeaderFollowerTrader):
         return radio.create_station_if_not_exists(robot.balance_pub)
 
+    def start_user_data_station(self, robot: LeaderFollowerTrader):
+        if robot.user_data_pub:
+            return radio.create_station_if_not_exists(robot.user_data_pub)
+
     def start_leader_station(self, robot: LeaderFollowerTrader):
         return radio.create_station_if_not_exists(robot.leader_pub)
 
@@ -152,10 +163,19 @@ class FlowRunner:
 
 
 flow_runner = FlowRunner()
+metrics.register("robots", flow_runner.collect_metrics)
 
 
 @dataclass
 class StatsPub(PublisherBase):
+    """
+    Only the robots whose stats changed since the last broadcast,
+    everything on the first one
+    """
+
+    # top level key -> last sent
+    sent: Dict[str, Any] = field(default_factory=dict)
+
     def broadcast_stats(self):
         stats: Dict[str, Any] = {}
 
@@ -175,8 +195,18 @@ class StatsPub(PublisherBase):
 
             stats[flowrun.sha] = stat_dict
 
-        stats_msg = simplejson.dumps(stats, default=str)
-        log_pub.publish_stats(message=stats_msg)
+        message = {
+            "changed": {
+                key: value
+                for key, value in stats.items()
+                if self.sent.get(key, MISSING) != value
+            },
+            "removed": [key for key in self.sent if key not in stats],
+        }
+        if not self.sent:
+            message["full"] = True
+        self.sent = stats
+        log_pub.publish_stats(message=message)
 
     async def run(self):
         await periodic(self.broadcast_stats, sleep_seconds.broadcast_stats)
@@ -0,0 +1,287 @@
+import asyncio
+import multiprocessing
+import threading
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Set
+
+import src.pubsub.log_pub as log_pub
+from src.environment import sleep_seconds
+from src.exchanges.factory import api_client_factory
+from src.exchanges.limits import SharedLimits
+from src.monitoring import logger
+from src.monitoring.latency import Histogram, timings
+from src.monitoring.metrics import Family, Scrape, metrics
+from src.proc.shards import STOP, ShardPool, serve
+from src.pubsub import pub_factory
+from src.pubsub.accounts import STOP as ACCOUNTS_STOP
+from src.pubsub.accounts import AccountFeed
+from src.pubsub.board import BookBoard
+from src.pubsub.hub import log_hub
+from src.pubsub.radio import radio
+from src.robots.sliding.factory import create_account_pubs, create_book_pubs
+from src.stgs import StrategyConfig
+
+from .api import FlowApi
+
+
+@dataclass
+class WorkerFlowApi(FlowApi):
+    """FlowApi of a worker process, run_task returns once the robot is started"""
+
+    tasks: Set[asyncio.Task] = field(default_factory=set)
+
+    async def start_task(self, stg: StrategyConfig) -> str:
+        self.is_running(stg.sha)
+        task = asyncio.create_task(self.run_task(stg))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return stg.sha
+
+    def histograms(self) -> Dict[str, Histogram]:
+        return timings.histograms
+
+    def metric_families(self) -> List[Family]:
+        return list(metrics.collect().families.values())
+
+
+async def serve_robots(conn: Connection, accounts: Any) -> None:
+    loop_watch = timings.start_watching_loop()
+    pub_factory.accounts.listen(  # type: ignore
+        accounts, pub_factory.PUBS, asyncio.get_running_loop()
+    )
+    try:
+        await serve(conn, WorkerFlowApi())
+    finally:
+        if loop_watch:
+            loop_watch.cancel()
+
+
+def robot_worker(
+    index: int,
+    conn: Connection,
+    board_name: str,
+    wakers: List[Connection],
+    logs: Any,
+    accounts: List[Any],
+    limits_name: str,
+    limits_lock: Any,
+) -> None:
+    logger.info(f"robot worker {index} started")
+    log_pub.log_publisher.sink = log_pub.QueueSink(logs, source=f"worker-{index}")
+    for other, waker in enumerate(wakers):
+        if other != index:
+            waker.close()
+    # books and accounts come from the supervisor, no market streams here
+    pub_factory.board = BookBoard.attach(board_name, waker=wakers[index])
+    pub_factory.accounts = AccountFeed()
+    # orders of every worker count against the same api key
+    limits = SharedLimits.attach(limits_name, limits_lock)
+    api_client_factory.share_limits(limits)
+    try:
+        asyncio.run(serve_robots(conn, accounts[index]))
+    finally:
+        pub_factory.board.close()
+        limits.close()
+
+
+def relay_logs(logs: Any) -> None:
+    """Logs and stats of the workers to the dashboards, from a thread"""
+    while True:
+        events = logs.get()
+        if events is STOP:
+            return
+        log_hub.send(events)
+
+
+@dataclass
+class ShardedFlowApi:
+    """
+    The FlowApi of the supervisor, robots run in worker processes
+
+    A strategy always goes to the worker its sha hashes to,
+    each worker has its own loop, pubs and robots.
+    Market data is streamed here once per book and written to the board,
+    robots in every worker read it from there.
+    Balances and the private socket are polled and streamed here once per
+    api key and sent to every worker, the rate limit buckets are shared.
+    Logs and stats of the robots come back over a queue
+    """
+
+    workers: int
+    pool: ShardPool = field(init=False)
+    board: Optional[BookBoard] = None
+    limits: Optional[SharedLimits] = None
+    accounts: AccountFeed = field(default_factory=AccountFeed)
+    logs: Any = None
+    relay: Optional[threading.Thread] = None
+
+    # sha -> worker
+    placed: Dict[str, int] = field(default_factory=dict)
+
+    # sha -> pubsub keys of the books it reads
+    feeds: Dict[str, List[str]] = field(default_factory=dict)
+    # pubsub key -> station streaming it
+    stations: Dict[str, asyncio.Task] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.pool = ShardPool(
+            workers=self.workers,
+            target=robot_worker,
+            name="robots",
+            timeout=sleep_seconds.shard_call,
+            on_exit=self.worker_exited,
+        )
+
+    def start_board(self) -> BookBoard:
+        """Made on first use with the log queue, workers import this module too"""
+        if not self.board:
+            self.board = BookBoard.create()
+            self.limits = SharedLimits.create()
+            api_client_factory.share_limits(self.limits)
+            context = multiprocessing.get_context("spawn")
+            self.accounts.queues = [context.Queue() for _ in range(self.workers)]
+            self.logs = context.Queue(maxsize=1000)
+            self.relay = threading.Thread(
+                target=relay_logs, args=(self.logs,), name="log_relay", daemon=True
+            )
+            self.relay.start()
+            wakers = [self.board.add_waker() for _ in range(self.workers)]
+            self.pool.args = (
+                self.board.name,
+                wakers,
+                self.logs,
+                self.accounts.queues,
+                self.limits.name,
+                self.limits.lock,
+            )
+        return self.board
+
+    def is_running(self, sha: str):
+        if sha in self.placed:
+            raise Exception(f"{sha} already running")
+
+    def feed(self, stg: StrategyConfig) -> None:
+        """
+        Stream the books of the strategy, once for all robots reading them,
+        and the real account, testnet robots poll their exchange in the worker
+        """
+        board = self.start_board()
+        pubs = []
+        for pub in create_book_pubs(stg):
+            if pub:
+                board.attach_pub(pub)
+                pubs.append(pub)
+
+        if not stg.testnet:
+            for pub in create_account_pubs(stg):
+                if pub:
+                    self.accounts.attach(pub)
+                    pubs.append(pub)
+
+        for pub in pubs:
+            station = radio.create_station_if_not_exists(pub)
+            if station:
+                self.stations[pub.pubsub_key] = asyncio.create_task(station)
+        self.feeds[stg.sha] = [pub.pubsub_key for pub in pubs]
+
+    def unfeed(self, sha: str) -> None:
+        for key in self.feeds.pop(sha, []):
+            radio.drop_listener(key)
+            if any(key in keys for keys in self.feeds.values()):
+                continue
+            # a station restarting after an error outlives its listeners
+            task = self.stations.pop(key, None)
+            if task:
+                task.cancel()
+
+    def worker_exited(self, index: int) -> None:
+        """Its robots are gone with it, they can be started again"""
+        shas = [sha for sha, placed in self.placed.items() if placed == index]
+        for sha in shas:
+            del self.placed[sha]
+            self.unfeed(sha)
+        if shas:
+            msg = f"robots worker {index} exited, {shas} stopped"
+            logger.error(msg)
+            log_pub.publish_error(message=msg)
+
+    async def run_task(self, stg: StrategyConfig):
+        self.is_running(stg.sha)
+        index = self.pool.shard_of(stg.sha)
+        self.placed[stg.sha] = index
+        self.feed(stg)
+        try:
+            await self.pool.call(index, "start_task", stg)
+        except Exception:
+            del self.placed[stg.sha]
+            self.unfeed(stg.sha)
+            raise
+        logger.info(f"{stg.sha} runs on worker {index}")
+
+    async def stop_task(self, sha: str):
+        if sha not in self.placed:
+            raise Exception(f"{sha} not running")
+        try:
+            await self.pool.call(self.placed[sha], "stop_task", sha)
+        finally:
+            self.placed.pop(sha, None)
+            self.unfeed(sha)
+        return sha
+
+    async def stop_all_tasks(self) -> List[str]:
+        if not self.pool.shards:
+            return []
+
+        stopped_shas: List[str] = []
+        for shas in await self.pool.call_all("stop_all_tasks"):
+            stopped_shas += shas
+        for sha in list(self.feeds):
+            self.unfeed(sha)
+        self.placed.clear()
+
+        msg = f"{stopped_shas} stopped"
+        logger.info(msg)
+        log_pub.publish_message(message=msg)
+        return stopped_shas
+
+    def get_tasks(self) -> List[str]:
+        return list(self.placed)
+
+    async def latency(self) -> dict:
+        """Books are parsed here, decisions and orders in the workers"""
+        worker_histograms = []
+        if self.pool.shards:
+            worker_histograms = await self.pool.call_all("histograms")
+        return timings.dict(worker_histograms)
+
+    async def scrape(self) -> Scrape:
+        """Market data here, robots in the workers, labelled by worker"""
+        scrape = metrics.collect()
+        if not self.pool.shards:
+            return scrape
+
+        worker_families = await self.pool.call_all("metric_families")
+        for index, families in enumerate(worker_families):
+            scrape.merge(families, worker=str(index))
+        return scrape
+
+    async def shutdown(self) -> None:
+        await self.stop_all_tasks()
+        self.pool.stop()
+        if self.board:
+            self.board.close()
+            self.board = None
+        if self.limits:
+            self.limits.close()
+            self.limits = None
+        for queue in self.accounts.queues:
+            queue.put(ACCOUNTS_STOP)
+            queue.close()
+        self.accounts.queues = []
+        if self.logs:
+            self.logs.put(STOP)
+            if self.relay:
+                self.relay.join(1)
+            self.logs.close()
+            self.logs = None
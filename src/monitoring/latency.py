@@ -0,0 +1,180 @@
+"""
+Where the time goes between a frame and an order
+
+Stages are timed in nanoseconds into HDR style histograms, log-linear buckets
+of 16 per power of two, so a value is off by at most 1/16.
+Recording one is a bit_length, a shift and a list increment.
+
+Off unless LATENCY_TIMERS is set, then timed returns the function untouched
+"""
+import asyncio
+import functools
+import inspect
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+SUB_BITS = 4
+SUB = 1 << SUB_BITS
+BUCKETS = (64 - SUB_BITS + 1) * SUB
+
+PERCENTILES = (50, 99, 99.9)
+
+
+def bucket_of(value: int) -> int:
+    if value < SUB:
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BITS - 1
+    return (shift + 1) * SUB + (value >> shift) - SUB
+
+
+def highest_of(bucket: int) -> int:
+    """The largest value that falls in the bucket"""
+    if bucket < SUB:
+        return bucket
+    shift = bucket // SUB - 1
+    return ((bucket % SUB + SUB + 1) << shift) - 1
+
+
+@dataclass
+class Histogram:
+    counts: List[int] = field(default_factory=lambda: [0] * BUCKETS)
+    count: int = 0
+    total: int = 0
+    max: int = 0
+
+    def record(self, value: int) -> None:
+        if value < SUB:
+            bucket = max(value, 0)
+        else:
+            shift = value.bit_length() - SUB_BITS - 1
+            bucket = (shift + 1) * SUB + (value >> shift) - SUB
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        for bucket, n in enumerate(other.counts):
+            if n:
+                self.counts[bucket] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(math.ceil(p / 100 * self.count), 1)
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(highest_of(bucket), self.max)
+        return self.max
+
+    def dict(self) -> dict:
+        """Microseconds"""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean us": round(self.total / self.count / 1e3, 1),
+            **{f"p{p} us": round(self.percentile(p) / 1e3, 1) for p in PERCENTILES},
+            "max us": round(self.max / 1e3, 1),
+        }
+
+
+@dataclass
+class Timings:
+    """
+    A histogram per stage
+
+    receive: a Binance frame waiting in the mux queue for its pub
+    decode: json to typed frames
+    parse_book: a frame into the book
+    should_buy, should_sell: the decision, without sending the order
+    submit, cancel: order requests, rate limit waits included
+    loop_lag: how late the event loop wakes up a sleeper
+    """
+
+    enabled: bool = False
+    histograms: Dict[str, Histogram] = field(default_factory=dict)
+
+    def histogram(self, stage: str) -> Histogram:
+        if stage not in self.histograms:
+            self.histograms[stage] = Histogram()
+        return self.histograms[stage]
+
+    def record(self, stage: str, nanoseconds: int) -> None:
+        self.histogram(stage).record(nanoseconds)
+
+    def timed(self, stage: str) -> Callable[[F], F]:
+        """Decorate a function or a coroutine function to time every call"""
+
+        def decorate(func: F) -> F:
+            if not self.enabled:
+                return func
+
+            histogram = self.histogram(stage)
+            clock = time.perf_counter_ns
+
+            if inspect.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def timed_coroutine(*args, **kwargs):
+                    start = clock()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        histogram.record(clock() - start)
+
+                return timed_coroutine  # type: ignore
+
+            @functools.wraps(func)
+            def timed_function(*args, **kwargs):
+                start = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.record(clock() - start)
+
+            return timed_function  # type: ignore
+
+        return decorate
+
+    async def watch_loop(self, interval: float = 0.05) -> None:
+        histogram = self.histogram("loop_lag")
+        clock = time.perf_counter_ns
+        interval_ns = int(interval * 1e9)
+        while True:
+            start = clock()
+            await asyncio.sleep(interval)
+            histogram.record(max(clock() - start - interval_ns, 0))
+
+    def start_watching_loop(self) -> Optional[asyncio.Task]:
+        if not self.enabled:
+            return None
+        return asyncio.create_task(self.watch_loop())
+
+    def dict(self, others: Iterable[Dict[str, Histogram]] = ()) -> dict:
+        """Every stage, merged with the histograms of other processes"""
+        merged: Dict[str, Histogram] = {}
+        for histograms in (self.histograms, *others):
+            for stage, histogram in histograms.items():
+                merged.setdefault(stage, Histogram()).merge(histogram)
+        return {
+            "enabled": self.enabled,
+            **{stage: merged[stage].dict() for stage in sorted(merged)},
+        }
+
+
+timings = Timings(
+    enabled=os.getenv("LATENCY_TIMERS", "0").lower() in ("true", "1", "t")
+)
+timed = timings.timed
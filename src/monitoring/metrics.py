@@ -0,0 +1,107 @@
+"""
+Counters and gauges in the Prometheus text format, for GET /metrics
+
+The values are kept where they are counted, order stats, books and balances.
+Collectors read them only when scraped, so a scrape costs a line per sample
+and nothing is built or serialized between scrapes
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from src.monitoring import logger
+
+COUNTER = "counter"
+GAUGE = "gauge"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+@dataclass(frozen=True)
+class Metric:
+    name: str
+    kind: str
+    help: str
+
+
+def counter(name: str, help: str) -> Metric:
+    return Metric(name, COUNTER, help)
+
+
+def gauge(name: str, help: str) -> Metric:
+    return Metric(name, GAUGE, help)
+
+
+@dataclass
+class Family:
+    metric: Metric
+    samples: List[Tuple[Labels, float]] = field(default_factory=list)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def line_of(name: str, labels: Labels, value: float) -> str:
+    if labels:
+        pairs = ",".join(f'{key}="{escape(str(v))}"' for key, v in labels)
+        return f"{name}{{{pairs}}} {float(value)}"
+    return f"{name} {float(value)}"
+
+
+@dataclass
+class Scrape:
+    """The samples of one scrape, grouped by metric"""
+
+    families: Dict[str, Family] = field(default_factory=dict)
+
+    def family(self, metric: Metric) -> Family:
+        family = self.families.get(metric.name)
+        if not family:
+            family = self.families[metric.name] = Family(metric)
+        return family
+
+    def add(self, metric: Metric, value, **labels) -> None:
+        self.family(metric).samples.append((tuple(labels.items()), float(value)))
+
+    def merge(self, families: Iterable[Family], **labels) -> None:
+        """Families of another process, its samples tagged with labels"""
+        extra = tuple(labels.items())
+        for other in families:
+            samples = self.family(other.metric).samples
+            samples += [(sample + extra, value) for sample, value in other.samples]
+
+    def text(self) -> str:
+        lines = []
+        for name, family in self.families.items():
+            lines.append(f"# HELP {name} {family.metric.help}")
+            lines.append(f"# TYPE {name} {family.metric.kind}")
+            for labels, value in family.samples:
+                lines.append(line_of(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+Collector = Callable[[Scrape], None]
+
+
+@dataclass
+class Registry:
+    collectors: Dict[str, Collector] = field(default_factory=dict)
+
+    def register(self, key: str, collector: Collector) -> None:
+        self.collectors[key] = collector
+
+    def unregister(self, key: str) -> None:
+        self.collectors.pop(key, None)
+
+    def collect(self) -> Scrape:
+        scrape = Scrape()
+        for key, collector in list(self.collectors.items()):
+            try:
+                collector(scrape)
+            except Exception as e:
+                # the other collectors still count
+                logger.error(f"metrics {key}: {e}")
+        return scrape
+
+
+metrics = Registry()
@@ -0,0 +1,69 @@
+import asyncio
+import random
+
+from .latency import Histogram, Timings, bucket_of, highest_of
+
+
+def test_buckets_are_within_a_sixteenth():
+    rnd = random.Random(3)
+    for value in [*range(1000), *(rnd.randrange(10 ** 12) for _ in range(10000))]:
+        bucket = bucket_of(value)
+        assert highest_of(bucket - 1) < value <= highest_of(bucket)
+        assert highest_of(bucket) - value <= value / 16
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for value in range(1, 10001):
+        histogram.record(value * 1000)
+
+    assert histogram.count == 10000
+    assert abs(histogram.percentile(50) - 5_000_000) <= 5_000_000 / 16
+    assert abs(histogram.percentile(99) - 9_900_000) <= 9_900_000 / 16
+    assert histogram.percentile(100) == histogram.max == 10_000_000
+
+    other = Histogram()
+    other.record(20_000_000)
+    histogram.merge(other)
+    assert histogram.count == 10001
+    assert histogram.dict()["max us"] == 20000
+
+
+async def time_calls(timings: Timings):
+    @timings.timed("decode")
+    def decode(x):
+        return x * 2
+
+    @timings.timed("submit")
+    async def submit(x):
+        await asyncio.sleep(0.01)
+        return x
+
+    assert decode(2) == 4
+    assert await submit(3) == 3
+
+    watch = timings.start_watching_loop()
+    await asyncio.sleep(0.12)
+    if watch:
+        watch.cancel()
+
+
+def test_timed():
+    timings = Timings(enabled=True)
+    asyncio.run(time_calls(timings))
+    assert timings.histograms["decode"].count == 1
+    assert timings.histograms["submit"].percentile(50) >= 10_000_000
+    assert timings.histograms["loop_lag"].count >= 1
+    assert timings.dict()["submit"]["count"] == 1
+
+
+def test_disabled_timers_are_the_function():
+    timings = Timings(enabled=False)
+
+    def decode(x):
+        return x
+
+    assert timings.timed("decode")(decode) is decode
+    asyncio.run(time_calls(timings))
+    assert not timings.histograms
+    assert timings.dict() == {"enabled": False}
@@ -0,0 +1,48 @@
+from .metrics import Registry, Scrape, counter, gauge
+
+ORDERS = counter("test_orders_total", "Orders")
+SPREAD = gauge("test_spread_bps", "Spread")
+
+
+def test_scrape_text():
+    scrape = Scrape()
+    scrape.add(ORDERS, 3, sha="eth", side="buy")
+    scrape.add(ORDERS, 1, sha="eth", side="sell")
+    scrape.add(SPREAD, 2.5, book='a"b')
+
+    assert scrape.text().splitlines() == [
+        "# HELP test_orders_total Orders",
+        "# TYPE test_orders_total counter",
+        'test_orders_total{sha="eth",side="buy"} 3.0',
+        'test_orders_total{sha="eth",side="sell"} 1.0',
+        "# HELP test_spread_bps Spread",
+        "# TYPE test_spread_bps gauge",
+        'test_spread_bps{book="a\\"b"} 2.5',
+    ]
+
+
+def test_merge_other_processes():
+    worker = Scrape()
+    worker.add(ORDERS, 5, sha="xrp", side="buy")
+
+    scrape = Scrape()
+    scrape.add(ORDERS, 3, sha="eth", side="buy")
+    scrape.merge(worker.families.values(), worker="1")
+
+    lines = scrape.text().splitlines()
+    assert lines.count("# TYPE test_orders_total counter") == 1
+    assert 'test_orders_total{sha="xrp",side="buy",worker="1"} 5.0' in lines
+
+
+def test_registry_skips_failing_collectors():
+    registry = Registry()
+
+    def broken(scrape: Scrape) -> None:
+        raise ValueError("gone")
+
+    registry.register("broken", broken)
+    registry.register("spread", lambda scrape: scrape.add(SPREAD, 1, book="x"))
+    assert 'test_spread_bps{book="x"} 1.0' in registry.collect().text()
+
+    registry.unregister("spread")
+    assert registry.collect().text() == "\n"
@@ -0,0 +1,69 @@
+"""
+Prices and amounts as ints of 1e-8, exchanges send no more digits than that
+
+Ints compare and add exactly and cheaply on every frame,
+Decimals are made only when a book changes, for the robot and the orders
+"""
+import decimal
+from decimal import Decimal
+
+DECIMALS = 8
+SCALE = 10 ** DECIMALS
+
+# wide enough for any price, the global context keeps only 9 digits
+EXACT = decimal.Context(prec=40)
+
+TWO = Decimal(2)
+
+
+def to_ticks(value: str) -> int:
+    """ "3777.68000000" -> 377768000000"""
+    whole, _, fraction = value.partition(".")
+    return int(whole + fraction[:DECIMALS].ljust(DECIMALS, "0"))
+
+
+def decimal_to_ticks(value: Decimal) -> int:
+    """Decimal("3777.68") -> 377768000000"""
+    return int(value.scaleb(DECIMALS, EXACT))
+
+
+def decimals_of(ticks: int) -> int:
+    """Fraction digits the value needs, 377768000000 -> 2"""
+    if not ticks:
+        return 0
+    decimals = DECIMALS
+    while decimals and not ticks % 10:
+        ticks //= 10
+        decimals -= 1
+    return decimals
+
+
+def scale_of(value: str) -> int:
+    """Fraction digits as sent, trailing zeros too, "3777.6800" -> 4"""
+    return min(len(value.partition(".")[2]), DECIMALS)
+
+
+def decimals_in(value: Decimal) -> int:
+    """Fraction digits the Decimal carries, Decimal("3777.60") -> 2"""
+    return max(-int(value.as_tuple().exponent), 0)
+
+
+def to_decimal(ticks: int, decimals: int = DECIMALS) -> Decimal:
+    """Exact, with at least decimals fraction digits"""
+    units, rest = divmod(ticks, 10 ** (DECIMALS - decimals))
+    if rest:
+        return Decimal(ticks).scaleb(-DECIMALS, EXACT)
+    return Decimal(units).scaleb(-decimals, EXACT)
+
+
+def to_float(ticks: int) -> float:
+    return ticks / SCALE
+
+
+def mid_of(ask: int, bid: int, decimals: int = DECIMALS) -> Decimal:
+    return EXACT.divide(to_decimal(ask + bid, decimals), TWO)
+
+
+def spread_bps_of(ask: int, bid: int) -> Decimal:
+    """(ask - bid) / mid in bps"""
+    return Decimal(20000 * (ask - bid)) / Decimal(ask + bid)
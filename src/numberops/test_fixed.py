@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from .fixed import (
+    decimal_to_ticks,
+    decimals_in,
+    decimals_of,
+    mid_of,
+    scale_of,
+    spread_bps_of,
+    to_decimal,
+    to_float,
+    to_ticks,
+)
+
+
+def test_to_ticks():
+    assert to_ticks("3777.68000000") == 377768000000
+    assert to_ticks("3735") == 373500000000
+    assert to_ticks("0.00000001") == 1
+    assert to_ticks("0") == 0
+    assert decimal_to_ticks(Decimal("3777.68")) == 377768000000
+    assert decimal_to_ticks(Decimal("1E-8")) == 1
+
+
+def test_to_decimal():
+    ticks = to_ticks("13.5")
+    assert decimals_of(ticks) == 1
+    assert str(to_decimal(ticks, 2)) == "13.50"
+    assert to_decimal(ticks) == Decimal("13.5")
+    assert to_decimal(to_ticks("0.123"), 2) == Decimal("0.123")
+    assert to_float(ticks) == 13.5
+
+
+def test_scale():
+    assert scale_of("3777.6800") == 4
+    assert scale_of("3735") == 0
+    assert scale_of("0.000000001") == 8
+    assert decimals_in(Decimal("3777.60")) == 2
+    assert decimals_in(Decimal("62000")) == 0
+
+
+def test_mid_keeps_every_digit():
+    ask, bid = to_ticks("1234567.89"), to_ticks("1234567.88")
+    assert mid_of(ask, bid, 2) == Decimal("1234567.885")
+    assert round(spread_bps_of(to_ticks("3777.69"), to_ticks("3777.67")), 4) == Decimal(
+        "0.0529"
+    )
@@ -1,5 +1,6 @@
+import os
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-process_pool_executor = ProcessPoolExecutor(max_workers=2)
+process_pool_executor = ProcessPoolExecutor(max_workers=os.cpu_count())
 
 thread_pool_executor = ThreadPoolExecutor()
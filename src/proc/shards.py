@@ -0,0 +1,170 @@
+"""
+Worker processes, each serving an api object on its own event loop
+
+The supervisor talks to a worker over a Pipe, one request at a time:
+a request is (method, args), the answer (ok, result or error message).
+Workers are spawned, not forked, so they start without the supervisor's
+loop, sockets and threads
+"""
+import asyncio
+import inspect
+import multiprocessing
+import zlib
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Any, Callable, List, Optional, Tuple
+
+from src.monitoring import logger
+
+STOP = None
+
+
+def shard_of(key: str, shards: int) -> int:
+    """The same key goes to the same shard, in every process and every run"""
+    return zlib.crc32(key.encode()) % shards
+
+
+async def serve(conn: Connection, api: Any) -> None:
+    """Answer requests until STOP, or until the supervisor is gone"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            request = await loop.run_in_executor(None, conn.recv)
+        except (EOFError, OSError):
+            break
+        if request is STOP:
+            break
+
+        method, args = request
+        try:
+            result = getattr(api, method)(*args)
+            if inspect.isawaitable(result):
+                result = await result
+            conn.send((True, result))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+@dataclass
+class Shard:
+    index: int
+    process: Any
+    conn: Connection
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+@dataclass
+class ShardPool:
+    """
+    workers processes running target(index, conn, *args), started on first use
+
+    target must be importable by name, the spawned process imports it.
+    A worker that exits is started again in its place, after on_exit(index).
+    A worker that does not answer a call in timeout seconds is killed
+    """
+
+    workers: int
+    target: Callable[..., None]
+    name: str = "shard"
+    args: Tuple = ()
+    timeout: Optional[float] = None
+    on_exit: Optional[Callable[[int], None]] = None
+
+    shards: List[Shard] = field(default_factory=list)
+    restarts: int = 0
+    loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def spawn(self, index: int) -> Shard:
+        context = multiprocessing.get_context("spawn")
+        conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=self.target,
+            args=(index, child_conn, *self.args),
+            name=f"{self.name}-{index}",
+        )
+        process.start()
+        child_conn.close()
+        shard = Shard(index=index, process=process, conn=conn)
+        # readable once the process is gone
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(process.sentinel, self.exited, shard)
+        return shard
+
+    def start(self) -> None:
+        if self.shards:
+            return
+        self.shards = [self.spawn(index) for index in range(self.workers)]
+        logger.info(f"started {self.workers} {self.name} workers")
+
+    def exited(self, shard: Shard) -> None:
+        """Start another worker in place of the one gone"""
+        if self.loop:
+            self.loop.remove_reader(shard.process.sentinel)
+        shard.process.join(0)
+        if not shard.lock.locked():
+            # else the call in flight sees it closed and closes it
+            shard.conn.close()
+        index = shard.index
+        if index >= len(self.shards) or self.shards[index] is not shard:
+            return
+
+        logger.error(
+            f"{self.name} {index} exited with {shard.process.exitcode}, restarting"
+        )
+        if self.on_exit:
+            self.on_exit(index)
+        self.shards[index] = self.spawn(index)
+        self.restarts += 1
+
+    def shard_of(self, key: str) -> int:
+        return shard_of(key, self.workers)
+
+    async def call(self, index: int, method: str, *args) -> Any:
+        self.start()
+        shard = self.shards[index]
+        if not shard.process.is_alive():
+            self.exited(shard)
+            shard = self.shards[index]
+
+        loop = asyncio.get_running_loop()
+        async with shard.lock:
+            try:
+                await loop.run_in_executor(None, shard.conn.send, (method, args))
+                answered = await loop.run_in_executor(
+                    None, shard.conn.poll, self.timeout
+                )
+                if not answered:
+                    # hung, and a late answer would go to the next call
+                    shard.process.kill()
+                    await loop.run_in_executor(None, shard.process.join)
+                    raise Exception(
+                        f"{self.name} {index} did not answer {method} "
+                        f"in {self.timeout}s, restarting"
+                    )
+                ok, result = await loop.run_in_executor(None, shard.conn.recv)
+            except (EOFError, OSError):
+                shard.conn.close()
+                raise Exception(f"{self.name} {index} exited during {method}")
+        if not ok:
+            raise Exception(result)
+        return result
+
+    async def call_all(self, method: str, *args) -> List[Any]:
+        return await asyncio.gather(
+            *(self.call(index, method, *args) for index in range(self.workers))
+        )
+
+    def stop(self, timeout: Optional[float] = 5) -> None:
+        for shard in self.shards:
+            if self.loop:
+                self.loop.remove_reader(shard.process.sentinel)
+            try:
+                shard.conn.send(STOP)
+            except (BrokenPipeError, OSError):
+                pass
+        for shard in self.shards:
+            shard.process.join(timeout)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.conn.close()
+        self.shards = []
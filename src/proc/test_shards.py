@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from src.proc.shards import ShardPool, serve, shard_of
+
+
+@dataclass
+class EchoApi:
+    index: int
+
+    async def add(self, a: int, b: int) -> tuple:
+        return self.index, a + b
+
+    def fail(self) -> None:
+        raise ValueError("no")
+
+    def exit(self) -> None:
+        os._exit(1)
+
+    def hang(self) -> None:
+        time.sleep(60)
+
+
+def echo_worker(index, conn) -> None:
+    asyncio.run(serve(conn, EchoApi(index)))
+
+
+def test_shard_of():
+    assert shard_of("abc", 4) == shard_of("abc", 4)
+    assert {shard_of(str(i), 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+async def call_workers():
+    pool = ShardPool(workers=2, target=echo_worker)
+    try:
+        assert await pool.call(1, "add", 2, 3) == (1, 5)
+        assert await pool.call_all("add", 1, 1) == [(0, 2), (1, 2)]
+        with pytest.raises(Exception, match="no"):
+            await pool.call(0, "fail")
+        # still serving after an error
+        assert await pool.call(0, "add", 0, 0) == (0, 0)
+    finally:
+        pool.stop()
+
+    assert not pool.shards
+
+
+def test_shard_pool():
+    asyncio.run(call_workers())
+
+
+async def restart_workers():
+    exits = []
+    pool = ShardPool(workers=2, target=echo_worker, timeout=1, on_exit=exits.append)
+    try:
+        await pool.call(0, "add", 0, 0)
+        with pytest.raises(Exception, match="exited"):
+            await pool.call(0, "exit")
+        for _ in range(100):
+            if exits:
+                break
+            await asyncio.sleep(0.05)
+        assert exits == [0]
+        assert await pool.call(0, "add", 1, 1) == (0, 2)
+
+        # killed and started again, the other worker never noticed
+        with pytest.raises(Exception, match="did not answer"):
+            await pool.call(1, "hang")
+        assert await pool.call(1, "add", 2, 2) == (1, 4)
+        assert exits == [0, 1]
+        assert pool.restarts == 2
+    finally:
+        pool.stop()
+
+
+def test_workers_are_restarted():
+    asyncio.run(restart_workers())
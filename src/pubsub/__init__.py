@@ -1,4 +1,4 @@
 import src.pubsub.log_pub as log_pub
 
 from .factory import pub_factory
-from .pubs import BalancePub, BinancePub, PublisherBase
+from .pubs import BalancePub, BinancePub, PublisherBase, UserDataPub
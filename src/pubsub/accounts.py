@@ -0,0 +1,98 @@
+"""
+Balances and private socket events of the accounts, for robot workers
+
+The supervisor polls the balances and streams the private socket once per
+api key, and puts what comes on a queue per worker. A worker applies it to its
+own balance and user data pubs, and keeps the socket state for the pubs
+of robots started later
+"""
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from .pubs import BalancePub, PublisherBase, UserDataPub
+
+BALANCES = "balances"
+USER_EVENT = "user_event"
+LIVE = "live"
+
+STOP = None
+
+
+@dataclass
+class AccountFeed:
+    # supervisor, a queue per worker and pubsub key -> pub sending to them
+    queues: List[Any] = field(default_factory=list)
+    attached: Dict[str, PublisherBase] = field(default_factory=dict)
+
+    # worker, pubsub key -> logged in to the private socket
+    live: Dict[str, bool] = field(default_factory=dict)
+
+    def attach(self, pub: Any) -> None:
+        """Send what a balance or user data pub gets to every worker"""
+        key = pub.pubsub_key
+        if self.attached.get(key) is pub:
+            return
+        self.attached[key] = pub
+
+        if isinstance(pub, BalancePub):
+            pub.listeners.append(
+                lambda res, taken_at: self.send((BALANCES, key, res, taken_at))
+            )
+        elif isinstance(pub, UserDataPub):
+            pub.listeners.append(
+                lambda message_type, event: self.send(
+                    (USER_EVENT, key, message_type, event)
+                )
+            )
+            pub.live_listeners.append(lambda live: self.send((LIVE, key, live)))
+
+    def send(self, message: tuple) -> None:
+        for queue in self.queues:
+            queue.put(message)
+
+    def receive(self, message: tuple, pubs: Dict[str, PublisherBase]) -> None:
+        kind, key = message[:2]
+        if kind == LIVE:
+            self.live[key] = message[2]
+        pub = pubs.get(key)
+        if pub:
+            apply(pub, message)
+
+    def catch_up(self, pub: UserDataPub) -> None:
+        """A pub made in a worker is live if the supervisor's is"""
+        pub.set_live(self.live.get(pub.pubsub_key, False))
+
+    def listen(
+        self,
+        queue: Any,
+        pubs: Dict[str, PublisherBase],
+        loop: asyncio.AbstractEventLoop,
+    ) -> threading.Thread:
+        """Take messages off the queue in a thread, apply them on the loop"""
+
+        def relay() -> None:
+            while True:
+                message = queue.get()
+                if message is STOP:
+                    return
+                try:
+                    loop.call_soon_threadsafe(self.receive, message, pubs)
+                except RuntimeError:
+                    # the loop is closed
+                    return
+
+        thread = threading.Thread(target=relay, name="account_feed", daemon=True)
+        thread.start()
+        return thread
+
+
+def apply(pub: Any, message: tuple) -> None:
+    kind = message[0]
+    if kind == BALANCES and isinstance(pub, BalancePub):
+        pub.update_snapshot(*message[2:])
+    elif kind == USER_EVENT and isinstance(pub, UserDataPub):
+        pub.parse_event(*message[2:])
+    elif kind == LIVE and isinstance(pub, UserDataPub):
+        pub.set_live(message[2])
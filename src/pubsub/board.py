@@ -0,0 +1,221 @@
+"""
+The top of every book in shared memory, written by one process and read by many
+
+A slot per book, one cache line each: a sequence and the quote as ints.
+The writer makes the sequence odd, writes the quote and makes it even again.
+A reader takes the quote only if the sequence was even and unchanged around it,
+so it never waits on a lock and never sees half of an update.
+
+Each reader process has a pipe the writer sends a byte to after a write,
+the reader's loop wakes on it and polls only then.
+
+Prices are ticks of 1e-8 as in fixed, mid2 is ask + bid, twice the mid
+"""
+import asyncio
+import multiprocessing
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.numberops import fixed
+
+SLOTS = 64
+KEY_SIZE = 48
+LINE = 64
+
+COUNT = struct.Struct("<q")
+KEY = struct.Struct(f"<{KEY_SIZE}s")
+SEQ = struct.Struct("<q")
+# seq, version, ask, bid, mid2, decimals, written at (monotonic ns)
+SLOT = struct.Struct("<7q")
+
+KEYS_AT = LINE
+SLOTS_AT = KEYS_AT + SLOTS * KEY_SIZE
+SIZE = SLOTS_AT + SLOTS * LINE
+
+
+class BoardQuote(NamedTuple):
+    seq: int
+    version: int
+    ask: int
+    bid: int
+    mid2: int
+    decimals: int
+    written_at: int
+
+
+@dataclass
+class BookBoard:
+    shm: shared_memory.SharedMemory
+    owner: bool = False
+
+    # key -> slot, the writer fills it as books come, readers as they find them
+    slots: Dict[str, int] = field(default_factory=dict)
+
+    # writer only
+    versions: Dict[int, int] = field(default_factory=dict)
+    # reader and writer end of a pipe per reader process,
+    # connections only to pass them to a spawned process, bytes go by os.write
+    wakers: List[Tuple[Connection, Connection]] = field(default_factory=list)
+
+    # reader only
+    waker: Optional[Connection] = None
+    watchers: List[Callable[[], object]] = field(default_factory=list)
+
+    @classmethod
+    def create(cls) -> "BookBoard":
+        shm = shared_memory.SharedMemory(create=True, size=SIZE)
+        shm.buf[:SIZE] = bytes(SIZE)
+        return cls(shm=shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, waker: Optional[Connection] = None) -> "BookBoard":
+        return cls(shm=shared_memory.SharedMemory(name=name), waker=waker)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def count(self) -> int:
+        return COUNT.unpack_from(self.shm.buf, 0)[0]
+
+    def slot_of(self, key: str) -> Optional[int]:
+        """The slot of the book, None until the writer has written it once"""
+        slot = self.slots.get(key)
+        if slot is not None:
+            return slot
+
+        encoded = KEY.pack(key.encode())
+        buf = self.shm.buf
+        for slot in range(self.count()):
+            start = KEYS_AT + slot * KEY_SIZE
+            if buf[start : start + KEY_SIZE] == encoded:
+                self.slots[key] = slot
+                return slot
+        return None
+
+    def add_slot(self, key: str) -> int:
+        if len(key.encode()) > KEY_SIZE:
+            raise ValueError(f"board key too long: {key}")
+        slot = self.count()
+        if slot == SLOTS:
+            raise ValueError(f"board full, no slot for {key}")
+
+        # the key first, readers look only below the count
+        KEY.pack_into(self.shm.buf, KEYS_AT + slot * KEY_SIZE, key.encode())
+        COUNT.pack_into(self.shm.buf, 0, slot + 1)
+        self.slots[key] = slot
+        return slot
+
+    def write(self, key: str, ask: int, bid: int, decimals: int = 0) -> None:
+        """decimals is the price scale of the pub, readers show prices with it"""
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self.add_slot(key)
+
+        version = self.versions.get(slot, 0) + 1
+        self.versions[slot] = version
+
+        buf = self.shm.buf
+        offset = SLOTS_AT + slot * LINE
+        seq = SEQ.unpack_from(buf, offset)[0]
+        SEQ.pack_into(buf, offset, seq + 1)
+        SLOT.pack_into(
+            buf,
+            offset,
+            seq + 1,
+            version,
+            ask,
+            bid,
+            ask + bid,
+            decimals,
+            time.monotonic_ns(),
+        )
+        SEQ.pack_into(buf, offset, seq + 2)
+        self.wake()
+
+    def add_waker(self) -> Connection:
+        """The end a reader process waits on, give it to attach there"""
+        reader, writer = multiprocessing.Pipe(duplex=False)
+        os.set_blocking(writer.fileno(), False)
+        self.wakers.append((reader, writer))
+        return reader
+
+    def wake(self) -> None:
+        for _, writer in self.wakers:
+            try:
+                os.write(writer.fileno(), b"\0")
+            except OSError:
+                # full, the reader has a wake up pending, or it is gone
+                pass
+
+    def publish(self, pub) -> None:
+        """A pub listener, writes every new book of the pub"""
+        quote = pub.book.quote
+        self.write(
+            pub.pubsub_key,
+            fixed.decimal_to_ticks(quote.ask),
+            fixed.decimal_to_ticks(quote.bid),
+            max(fixed.decimals_in(quote.ask), fixed.decimals_in(quote.bid)),
+        )
+
+    def attach_pub(self, pub) -> None:
+        if self.publish not in pub.listeners:
+            pub.listeners.append(self.publish)
+
+    def seq(self, slot: int) -> int:
+        """Changes on every write, cheap enough to poll"""
+        return SEQ.unpack_from(self.shm.buf, SLOTS_AT + slot * LINE)[0]
+
+    def read(self, slot: int) -> BoardQuote:
+        buf = self.shm.buf
+        offset = SLOTS_AT + slot * LINE
+        while True:
+            quote = BoardQuote(*SLOT.unpack_from(buf, offset))
+            if quote.seq & 1:
+                continue
+            if SEQ.unpack_from(buf, offset)[0] == quote.seq:
+                return quote
+
+    def watch(self, callback: Callable[[], object]) -> bool:
+        """Call back on the loop after writes, False if no writer wakes this board"""
+        if not self.waker:
+            return False
+        if not self.watchers:
+            os.set_blocking(self.waker.fileno(), False)
+            asyncio.get_running_loop().add_reader(self.waker.fileno(), self.woken)
+        self.watchers.append(callback)
+        return True
+
+    def unwatch(self, callback: Callable[[], object]) -> None:
+        if callback in self.watchers:
+            self.watchers.remove(callback)
+        if self.waker and not self.watchers:
+            asyncio.get_running_loop().remove_reader(self.waker.fileno())
+
+    def woken(self) -> None:
+        try:
+            while os.read(self.waker.fileno(), 4096):  # type: ignore
+                pass
+            # the writer is gone, nothing will come
+            asyncio.get_running_loop().remove_reader(self.waker.fileno())  # type: ignore
+        except BlockingIOError:
+            pass
+        for callback in list(self.watchers):
+            callback()
+
+    def close(self) -> None:
+        self.slots.clear()
+        for reader, writer in self.wakers:
+            reader.close()
+            writer.close()
+        self.wakers.clear()
+        if self.waker:
+            self.waker.close()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
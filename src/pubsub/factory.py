@@ -1,9 +1,14 @@
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, Optional, Union
 
+from src.environment import RECORD_DIR
 from src.exchanges.factory import ExchangeType, NetworkType, api_client_factory
+from src.monitoring.metrics import Scrape, metrics
+from src.recorder import book_recorder
 
-from .pubs import BalancePub, BinancePub, BTPub, PubsubProducer
+from .accounts import AccountFeed
+from .board import BookBoard
+from .pubs import BalancePub, BinancePub, BoardPub, BTPub, PubsubProducer, UserDataPub
 
 
 @dataclass
@@ -11,13 +16,23 @@ class PubFactory:
 
     PUBS: Dict[str, PubsubProducer] = field(default_factory=dict)
 
+    # set in robot workers, books come from the board instead of the streams
+    board: Optional[BookBoard] = None
+    # and real balances and account events from the supervisor,
+    # a testnet exchange is in the worker, its robots poll it there
+    accounts: Optional[AccountFeed] = None
+
+    def collect_metrics(self, scrape: Scrape) -> None:
+        for pub in list(self.PUBS.values()):
+            pub.collect_metrics(scrape)
+
     def remove_pub(self, pubsub_key: str):
         if pubsub_key in self.PUBS:
             del self.PUBS[pubsub_key]  # type: ignore
 
     def create_binance_pub_if_not_exists(
         self, ex_type: ExchangeType, network: NetworkType, symbol: str
-    ) -> BinancePub:
+    ) -> Union[BinancePub, BoardPub]:
 
         pubsub_key = "_".join((ex_type.value, network.value, symbol))
         if pubsub_key in self.PUBS:
@@ -27,7 +42,12 @@ class PubFactory:
             ex_type, network
         )
 
+        if self.board:
+            return self.create_board_pub(pubsub_key, api_client, symbol)
+
         pub = BinancePub(pubsub_key=pubsub_key, api_client=api_client, symbol=symbol)
+        if RECORD_DIR:
+            book_recorder.attach(pub)
 
         self.PUBS[pubsub_key] = pub
 
@@ -35,7 +55,7 @@ class PubFactory:
 
     def create_bt_pub_if_not_exists(
         self, ex_type: ExchangeType, network: NetworkType, symbol: str
-    ) -> BTPub:
+    ) -> Union[BTPub, BoardPub]:
 
         pubsub_key = "_".join((ex_type.value, network.value, symbol))
         if pubsub_key in self.PUBS:
@@ -45,12 +65,30 @@ class PubFactory:
             ex_type, network
         )
 
+        if self.board:
+            return self.create_board_pub(pubsub_key, api_client, symbol)
+
         pub = BTPub(pubsub_key=pubsub_key, api_client=api_client, symbol=symbol)
+        if RECORD_DIR:
+            book_recorder.attach(pub)
 
         self.PUBS[pubsub_key] = pub
 
         return pub
 
+    def create_board_pub(self, pubsub_key: str, api_client, symbol: str) -> BoardPub:
+        pub = BoardPub(
+            pubsub_key=pubsub_key,
+            api_client=api_client,
+            symbol=symbol,
+            board=self.board,  # type: ignore
+        )
+        self.PUBS[pubsub_key] = pub
+        return pub
+
+    def fed(self, network: NetworkType) -> bool:
+        return bool(self.accounts) and network == NetworkType.REAL
+
     def create_balance_pub_if_not_exists(
         self, ex_type: ExchangeType, network: NetworkType
     ) -> BalancePub:
@@ -63,7 +101,31 @@ class PubFactory:
             ex_type, network
         )
 
-        pub = BalancePub(pubsub_key=pubsub_key, exchange=api_client)
+        pub = BalancePub(
+            pubsub_key=pubsub_key, exchange=api_client, fed=self.fed(network)
+        )
+
+        self.PUBS[pubsub_key] = pub
+
+        return pub
+
+    def create_user_data_pub_if_not_exists(
+        self, ex_type: ExchangeType, network: NetworkType
+    ) -> UserDataPub:
+        pubsub_key = "_".join((ex_type.value, network.value, "user_data"))
+
+        if pubsub_key in self.PUBS:
+            return self.PUBS[pubsub_key]  # type: ignore
+
+        api_client = api_client_factory.create_api_client_if_not_exists(
+            ex_type, network
+        )
+
+        pub = UserDataPub(
+            pubsub_key=pubsub_key, exchange=api_client, fed=self.fed(network)
+        )
+        if self.accounts and pub.fed:
+            self.accounts.catch_up(pub)
 
         self.PUBS[pubsub_key] = pub
 
@@ -71,3 +133,4 @@ class PubFactory:
 
 
 pub_factory = PubFactory()
+metrics.register("pubs", pub_factory.collect_metrics)
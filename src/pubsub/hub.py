@@ -0,0 +1,208 @@
+"""
+Logs, errors and stats for the dashboards connected to /ws
+
+The log publisher thread hands events to the loop, the hub copies them
+to a bounded queue per client. A slow browser loses its oldest logs and
+gets its stats deltas merged into one, it never holds up the robots.
+Stats are deltas all the way, from the robots to the browser
+"""
+import asyncio
+import collections
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from src.monitoring.metrics import Scrape, counter, gauge, metrics
+
+STATS = "STATS"
+
+DASHBOARDS = gauge("blackops_dashboards", "Clients on /ws")
+DASHBOARD_DROPPED = counter(
+    "blackops_dashboard_dropped_total", "Log events a slow client never got"
+)
+
+MISSING = object()
+
+
+@dataclass
+class Delta:
+    """
+    Top level stats keys changed and removed since the last one sent,
+    a full one has every key and replaces what was there
+    """
+
+    changed: dict = field(default_factory=dict)
+    removed: Set[str] = field(default_factory=set)
+    time: str = ""
+    full: bool = False
+
+    @classmethod
+    def of(cls, message: dict, time: str = "") -> "Delta":
+        return cls(
+            changed=dict(message.get("changed", {})),
+            removed=set(message.get("removed", ())),
+            time=time,
+            full=message.get("full", False),
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.removed or self.full)
+
+    def copy(self) -> "Delta":
+        return Delta(dict(self.changed), set(self.removed), self.time, self.full)
+
+    def merge(self, later: "Delta") -> None:
+        if later.full:
+            self.changed, self.removed, self.full = {}, set(), True
+        for key in later.removed:
+            self.changed.pop(key, None)
+        self.removed -= later.changed.keys()
+        if not self.full:
+            self.removed |= later.removed
+        self.changed.update(later.changed)
+        self.time = later.time
+
+    def dict(self) -> dict:
+        message = {"changed": self.changed, "removed": sorted(self.removed)}
+        if self.full:
+            message["full"] = True
+        return message
+
+
+def merge_stats(earlier: dict, later: dict) -> None:
+    """Two stats events of a channel into the earlier one"""
+    delta = Delta.of(earlier["data"]["message"])
+    delta.merge(Delta.of(later["data"]["message"]))
+    earlier["data"] = {"message": delta.dict(), "time": later["data"]["time"]}
+
+
+@dataclass(eq=False)
+class Client:
+    max_queue: int = 1000
+    dropped: int = 0
+
+    def __post_init__(self):
+        self.queue: collections.deque = collections.deque(maxlen=self.max_queue)
+        # channel -> stats delta not sent yet
+        self.stats: Dict[str, Delta] = {}
+        self.ready = asyncio.Event()
+
+    def put(self, event: dict) -> None:
+        if len(self.queue) == self.max_queue:
+            self.dropped += 1
+        self.queue.append(event)
+        self.ready.set()
+
+    def put_stats(self, channel: str, delta: Delta) -> None:
+        if channel in self.stats:
+            self.stats[channel].merge(delta)
+        else:
+            self.stats[channel] = delta.copy()
+        self.ready.set()
+
+    def take(self) -> List[dict]:
+        events = list(self.queue)
+        self.queue.clear()
+        for channel, delta in self.stats.items():
+            data = {"message": delta.dict(), "time": delta.time}
+            events.append({"channel": channel, "name": STATS, "data": data})
+        self.stats = {}
+        self.ready.clear()
+        return events
+
+    async def next_events(self) -> List[dict]:
+        """Everything queued since the last call, waits if there is nothing"""
+        await self.ready.wait()
+        return self.take()
+
+
+@dataclass
+class Hub:
+    """
+    A LogSink for the dashboards
+
+    Stats come as deltas per source, the supervisor and each worker,
+    a source starts with a full one. They are merged into one state per
+    channel and passed on as what they changed in it
+    """
+
+    max_queue: int = 1000
+    loop: Optional[asyncio.AbstractEventLoop] = None
+
+    clients: Set[Client] = field(default_factory=set)
+    dropped: int = 0
+
+    # channel -> source -> its stats
+    snapshots: Dict[str, Dict[str, dict]] = field(default_factory=dict)
+    # channel -> every source merged
+    stats: Dict[str, dict] = field(default_factory=dict)
+
+    def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        metrics.register("dashboards", self.collect_metrics)
+
+    def subscribe(self) -> Client:
+        """A new client starts from the current stats"""
+        client = Client(max_queue=self.max_queue)
+        for channel, stats in self.stats.items():
+            client.put_stats(channel, Delta(changed=dict(stats)))
+        self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client: Client) -> None:
+        if client in self.clients:
+            self.clients.discard(client)
+            self.dropped += client.dropped
+
+    def send(self, events: List[dict]) -> None:
+        """From the log publisher thread, dropped until the loop is known"""
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.publish, events)
+
+    def publish(self, events: List[dict]) -> None:
+        for event in events:
+            if event["name"] == STATS:
+                self.publish_stats(event)
+                continue
+            for client in self.clients:
+                client.put(event)
+
+    def publish_stats(self, event: dict) -> None:
+        channel, source = event["channel"], event.get("source", "")
+        received = Delta.of(event["data"]["message"])
+        sources = self.snapshots.setdefault(channel, {})
+        snapshot = sources.setdefault(source, {})
+        stats = self.stats.setdefault(channel, {})
+
+        removed = set(received.removed)
+        if received.full:
+            # a restarted source forgets what it had
+            removed |= snapshot.keys() - received.changed.keys()
+        for key in removed:
+            snapshot.pop(key, None)
+        snapshot.update(received.changed)
+
+        delta = Delta(time=event["data"]["time"])
+        for key in removed:
+            # keys every source has, like time, are of the latest one left
+            value = next((s[key] for s in sources.values() if key in s), MISSING)
+            if value is MISSING:
+                if stats.pop(key, MISSING) is not MISSING:
+                    delta.removed.add(key)
+            else:
+                stats[key] = delta.changed[key] = value
+        for key, value in received.changed.items():
+            if received.full and stats.get(key, MISSING) == value:
+                continue
+            stats[key] = delta.changed[key] = value
+        if not delta:
+            return
+        for client in self.clients:
+            client.put_stats(channel, delta)
+
+    def collect_metrics(self, scrape: Scrape) -> None:
+        scrape.add(DASHBOARDS, len(self.clients))
+        dropped = self.dropped + sum(client.dropped for client in self.clients)
+        scrape.add(DASHBOARD_DROPPED, dropped)
+
+
+log_hub = Hub()
@@ -1,14 +1,18 @@
+import collections
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime
+from queue import Full
+from typing import Any, Dict, List, Optional, Protocol
 
 from src.environment import LOG_RADIO
 from src.monitoring import logger
-from src.pubsub.pusher_client import pusher_client
+from src.pubsub.hub import STATS, log_hub, merge_stats
 
 DEFAULT_CHANNEL = LOG_RADIO
 
 ERROR = "ERROR"
 MESSAGE = "MESSAGE"
-STATS = "STATS"
 
 
 def add_time(message):
@@ -18,28 +22,143 @@ def add_time(message):
     }
 
 
+class LogSink(Protocol):
+    def send(self, events: List[dict]) -> None:
+        ...
+
+
+@dataclass
+class QueueSink:
+    """To the supervisor, from a worker process"""
+
+    queue: Any
+    source: str
+
+    # stats deltas not sent yet by channel, they can not be lost
+    stats: Dict[str, dict] = field(default_factory=dict)
+
+    def send(self, events: List[dict]) -> None:
+        logs = []
+        for event in events:
+            event["source"] = self.source
+            if event["name"] != STATS:
+                logs.append(event)
+            elif event["channel"] in self.stats:
+                merge_stats(self.stats[event["channel"]], event)
+            else:
+                self.stats[event["channel"]] = event
+        try:
+            self.queue.put_nowait(logs + list(self.stats.values()))
+            self.stats = {}
+        except Full:
+            # the supervisor is behind, the logs are lost
+            pass
+
+
+@dataclass
+class MemorySink:
+    events: List[dict] = field(default_factory=list)
+
+    def send(self, events: List[dict]) -> None:
+        self.events.extend(events)
+
+
+@dataclass
+class LogPublisher:
+    """
+    Queue events in the event loop, send them in batches from a thread
+
+    When the queue is full the oldest events are dropped,
+    stats deltas are merged into one per channel
+    """
+
+    sink: LogSink = field(default_factory=lambda: log_hub)
+    max_queue: int = 1000
+    batch_size: int = 100
+    autostart: bool = True
+
+    dropped: int = 0
+
+    def __post_init__(self):
+        self.queue: collections.deque = collections.deque(maxlen=self.max_queue)
+        self.stats: Dict[str, dict] = {}
+        self.cond = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+
+    def publish(self, channel: str, name: str, message) -> None:
+        event = {"channel": channel, "name": name, "data": add_time(message)}
+        with self.cond:
+            if name == STATS and channel in self.stats:
+                merge_stats(self.stats[channel], event)
+            elif name == STATS:
+                self.stats[channel] = event
+            else:
+                if len(self.queue) == self.max_queue:
+                    self.dropped += 1
+                self.queue.append(event)
+            self.cond.notify()
+
+        if self.autostart:
+            self.start()
+
+    def start(self) -> None:
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.run, name="log_pub", daemon=True)
+        self.thread.start()
+
+    def take_batch(self) -> List[dict]:
+        events = []
+        while self.queue and len(events) < self.batch_size:
+            events.append(self.queue.popleft())
+        while self.stats and len(events) < self.batch_size:
+            channel = next(iter(self.stats))
+            events.append(self.stats.pop(channel))
+        return events
+
+    def send(self, events: List[dict]) -> None:
+        try:
+            self.sink.send(events)
+        except Exception as e:
+            logger.error(f"log_pub: {e}")
+
+    def run(self) -> None:
+        while True:
+            with self.cond:
+                while not self.queue and not self.stats:
+                    self.cond.wait()
+                events = self.take_batch()
+            self.send(events)
+
+    def flush(self) -> None:
+        """Send everything queued, from the calling thread"""
+        while True:
+            with self.cond:
+                events = self.take_batch()
+            if not events:
+                return
+            self.send(events)
+
+
+log_publisher = LogPublisher()
+
+
 def publish_error(message, channel: str = DEFAULT_CHANNEL):
     try:
-        pusher_client.trigger(channel, ERROR, add_time(message))
+        log_publisher.publish(channel, ERROR, message)
     except Exception as e:
         logger.error(e)
 
 
 def publish_message(message, channel: str = DEFAULT_CHANNEL):
     try:
-        pusher_client.trigger(channel, MESSAGE, add_time(message))
+        log_publisher.publish(channel, MESSAGE, message)
     except Exception as e:
         logger.error(e)
 
 
 def publish_stats(message, channel: str = DEFAULT_CHANNEL):
     try:
-        pusher_client.trigger(channel, STATS, add_time(message))
+        log_publisher.publish(channel, STATS, message)
     except Exception as e:
         logger.error(e)
-
-
-if __name__ == "__main__":
-    import json
-
-    publish_stats(message=json.dumps({"dsd": "fsdfds"}))
@@ -4,20 +4,50 @@ import statistics
 from dataclasses import dataclass, field
 from datetime import datetime
 from decimal import Decimal
-from typing import AsyncGenerator, Dict, Optional, Union
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import talib
 
+import src.pubsub.log_pub as log_pub
 import src.streams.bn as bn_streams
 import src.streams.btcturk as btc_streams
-from src.domain.models import BPS, DECIMAL_2, Asset, AssetSymbol, Book
+from src.domain.frames import BookFrame, BookTicker
+from src.domain.ledger import Ledger
+from src.domain.models import BPS, Asset, AssetSymbol, Book
+from src.domain.orderbook import OrderBook
 from src.environment import sleep_seconds
 from src.exchanges.base import ExchangeAPIClientBase
 from src.monitoring import logger
-from src.numberops import RollingMean
+from src.monitoring.latency import timed
+from src.monitoring.metrics import Scrape, counter, gauge
+from src.numberops import RollingMean, fixed
 from src.periodic import periodic
 from src.proc import process_pool_executor, thread_pool_executor
+from src.pubsub.board import BookBoard
+
+BOOK_SEEN = counter("blackops_book_seen_total", "Book changes readers woke up for")
+BOOK_PROCESSED = counter("blackops_book_processed_total", "Book changes acted on")
+BOOK_ASK = gauge("blackops_book_ask", "Best ask")
+BOOK_BID = gauge("blackops_book_bid", "Best bid")
+BOOK_SPREAD = gauge("blackops_book_spread_bps", "Spread over mid in bps")
+
+BALANCE_FREE = gauge("blackops_balance_free", "Free balance")
+BALANCE_LOCKED = gauge("blackops_balance_locked", "Balance locked in orders")
+LEDGER_DRIFT = gauge("blackops_ledger_drift", "Snapshot minus ledger at reconcile")
+LEDGER_RESERVED = gauge("blackops_ledger_reserved", "Orders holding a reservation")
+
+USER_EVENTS = counter("blackops_user_events_total", "Private socket events")
+USER_LIVE = gauge("blackops_user_stream_live", "Logged in to the private socket")
+
+
+def collect_book_metrics(scrape: Scrape, key: str, book: Book) -> None:
+    quote = book.quote
+    scrape.add(BOOK_SEEN, book.seen, book=key)
+    scrape.add(BOOK_PROCESSED, book.processed, book=key)
+    scrape.add(BOOK_ASK, quote.ask, book=key)
+    scrape.add(BOOK_BID, quote.bid, book=key)
+    scrape.add(BOOK_SPREAD, quote.spread_bps, book=key)
 
 
 @dataclass
@@ -27,6 +57,32 @@ class PublisherBase:
     async def run(self):
         pass
 
+    def collect_metrics(self, scrape: Scrape) -> None:
+        pass
+
+
+@dataclass
+class BookUpdates:
+    """
+    Wake up readers when a new book arrives, instead of polling the book
+
+    Every waiter of the current event is released on notify,
+    then a fresh event is created for the next update
+    """
+
+    event: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self) -> None:
+        event = self.event
+        self.event = asyncio.Event()
+        event.set()
+
+    async def wait(self, book: Book, seen: int) -> int:
+        """Return the version of the book once it is newer than seen"""
+        while book.seen <= seen:
+            await self.event.wait()
+        return book.seen
+
 
 @dataclass
 class BalancePub(PublisherBase):
@@ -34,16 +90,32 @@ class BalancePub(PublisherBase):
     last_updated = datetime.now()
     assets: Dict[AssetSymbol, Asset] = field(default_factory=dict)
 
+    # set while a user data socket keeps the balances
+    live: bool = False
+
+    # what we expect between snapshots, kept on the same assets
+    ledger: Ledger = field(default_factory=Ledger)
+    snapshot_task: Optional[asyncio.Task] = None
+
+    # set in robot workers, the supervisor polls and sends the snapshots
+    fed: bool = False
+    # called with every snapshot polled and when it was taken
+    listeners: List[Callable[[dict, float], None]] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.ledger.assets = self.assets
+
     async def run(self):
+        if self.fed:
+            # the first snapshot here, the supervisor sends the ones after
+            self.snapshot_now()
+            await asyncio.Event().wait()
+
         coros = [
             periodic(
                 self.publish_balance,
                 sleep_seconds.update_balances,
             ),
-            periodic(
-                self.exchange.clear_orders_in_last_second,
-                0.97,
-            ),
         ]
         await asyncio.gather(*coros)
 
@@ -54,18 +126,144 @@ class BalancePub(PublisherBase):
     def get_asset(self, symbol: AssetSymbol):
         return self.assets.get(symbol)
 
+    def reconcile_due(self) -> bool:
+        passed = (datetime.now() - self.last_updated).total_seconds()
+        return passed >= sleep_seconds.reconcile_balances
+
+    def reconcile_now(self) -> None:
+        self.last_updated = datetime.min
+
+    def snapshot_now(self) -> None:
+        """Without waiting for the next poll, one at a time"""
+        self.reconcile_now()
+        if self.snapshot_task and not self.snapshot_task.done():
+            return
+        self.snapshot_task = asyncio.create_task(self.publish_balance())
+
     async def publish_balance(self):
+        if self.live and not self.reconcile_due():
+            return
+
+        taken_at = self.ledger.clock()
         res = await self.exchange.get_account_balance()
         if res:
-            self.update_balances(res)
-            self.last_updated = datetime.now()
+            self.update_snapshot(res, taken_at)
+            for listener in self.listeners:
+                listener(res, taken_at)
+
+    def update_snapshot(self, res: dict, taken_at: float) -> None:
+        self.update_balances(res, taken_at)
+        self.last_updated = datetime.now()
 
-    def update_balances(self, balances) -> None:
+    def update_balances(self, balances, taken_at: Optional[float] = None) -> None:
         balance_dict: dict = self.exchange.parse_account_balance(balances)
-        for symbol, asset in self.assets.items():
+        snapshot = {}
+        for symbol in self.assets:
             data = balance_dict[symbol]
-            asset.free = Decimal(data["free"])
-            asset.locked = Decimal(data["locked"])
+            snapshot[symbol] = (Decimal(data["free"]), Decimal(data["locked"]))
+        self.ledger.reconcile_all(snapshot, taken_at)
+
+    def update_balance_event(self, event: dict) -> None:
+        """Only the assets in the event change"""
+        balance_dict: dict = self.exchange.parse_account_balance(event)
+        snapshot = {
+            symbol: (Decimal(data["free"]), Decimal(data["locked"]))
+            for symbol, data in balance_dict.items()
+        }
+        self.ledger.reconcile_all(snapshot)
+
+    def collect_metrics(self, scrape: Scrape) -> None:
+        key = self.pubsub_key
+        for symbol, asset in self.assets.items():
+            scrape.add(BALANCE_FREE, asset.free, balances=key, asset=symbol)
+            scrape.add(BALANCE_LOCKED, asset.locked, balances=key, asset=symbol)
+            drift = self.ledger.drift.get(symbol, 0)
+            scrape.add(LEDGER_DRIFT, drift, balances=key, asset=symbol)
+        scrape.add(LEDGER_RESERVED, len(self.ledger.reservations), balances=key)
+
+
+@dataclass
+class UserDataPub(PublisherBase):
+    """
+    Order and balance events of the account from the private socket
+
+    Balances go to the balance pubs as they change, every event to the listeners.
+    While logged in, the balance and open order polls only reconcile
+    """
+
+    exchange: ExchangeAPIClientBase
+
+    balance_pubs: List[BalancePub] = field(default_factory=list)
+
+    # called with (type, event), an OrderApi for example
+    listeners: List[Callable[[int, dict], None]] = field(default_factory=list)
+    # called when the socket logs in or goes down
+    live_listeners: List[Callable[[bool], None]] = field(default_factory=list)
+
+    user_stream: Optional[AsyncGenerator] = None
+    live: bool = False
+    events: int = 0
+
+    # set in robot workers, the supervisor streams and sends the events
+    fed: bool = False
+
+    def add_balance_pub(self, balance_pub: BalancePub) -> None:
+        if balance_pub not in self.balance_pubs:
+            self.balance_pubs.append(balance_pub)
+            balance_pub.live = self.live
+
+    def set_live(self, live: bool) -> None:
+        changed = live != self.live
+        self.live = live
+        for balance_pub in self.balance_pubs:
+            balance_pub.live = live
+        if changed:
+            for listener in self.live_listeners:
+                listener(live)
+
+    def parse_event(self, message_type: int, event: dict) -> None:
+        self.events += 1
+
+        if message_type == btc_streams.USER_LOGIN:
+            self.set_live(True)
+            # events may be lost while the socket was down
+            for balance_pub in self.balance_pubs:
+                balance_pub.reconcile_now()
+
+        elif message_type == btc_streams.BALANCE_UPDATE:
+            for balance_pub in self.balance_pubs:
+                balance_pub.update_balance_event(event)
+
+        for listener in self.listeners:
+            listener(message_type, event)
+
+    def collect_metrics(self, scrape: Scrape) -> None:
+        scrape.add(USER_EVENTS, self.events, stream=self.pubsub_key)
+        scrape.add(USER_LIVE, int(self.live), stream=self.pubsub_key)
+
+    async def run(self):
+        if self.fed:
+            await asyncio.Event().wait()
+
+        while True:
+            if not self.user_stream:
+                self.user_stream = self.exchange.create_user_stream()
+            if not self.user_stream:
+                raise ValueError("No user stream")
+
+            try:
+                async for message_type, event in self.user_stream:
+                    self.parse_event(message_type, event)
+            except Exception as e:
+                msg = f"UserDataPub {self.pubsub_key}: {e}"
+                logger.error(msg)
+                log_pub.publish_error(message=msg)
+            finally:
+                self.set_live(False)
+                self.user_stream = None
+
+            # poll meanwhile, then log in again
+            await asyncio.sleep(sleep_seconds.user_stream_retry)
 
 
 @dataclass
@@ -74,39 +272,110 @@ class BTPub(PublisherBase):
     api_client: ExchangeAPIClientBase
 
     book: Book = field(default_factory=Book)
+    book_updates: BookUpdates = field(default_factory=BookUpdates)
+
+    order_book: OrderBook = field(default_factory=OrderBook)
+    # best ask and bid in ticks
+    top: Tuple[int, int] = (0, 0)
+    # fraction digits of the symbol's prices, fixed once known, from the
+    # exchange info if given, else from the price strings of the first snapshot
+    price_decimals: Optional[int] = None
 
     book_stream: Optional[AsyncGenerator] = None
 
+    # called with the pub on every new book, a recorder for example
+    listeners: List[Callable] = field(default_factory=list)
+
     def __post_init__(self):
-        self.book_stream = btc_streams.create_book_stream(self.symbol)
+        self.book_stream = btc_streams.create_obdiff_stream(self.symbol)
+
+    async def wait_for_book(self, seen: int) -> int:
+        return await self.book_updates.wait(self.book, seen)
+
+    def book_changed(self) -> None:
+        self.book_updates.notify()
+        for listener in self.listeners:
+            listener(self)
+
+    def collect_metrics(self, scrape: Scrape) -> None:
+        collect_book_metrics(scrape, self.pubsub_key, self.book)
 
     async def run(self):
         await self.publish_stream()
 
-    def parse_book(self, book):
+    def update_order_book(self, frame: BookFrame) -> bool:
+        message_type = frame.type
+        asks = self.api_client.parse_levels(frame.asks)
+        bids = self.api_client.parse_levels(frame.bids)
+        sequence = frame.sequence
+
+        if message_type == btc_streams.ORDERBOOK_FULL:
+            if self.price_decimals is None:
+                levels = list(frame.asks) + list(frame.bids)
+                if levels:
+                    prices = [fixed.scale_of(level.price) for level in levels]
+                    self.price_decimals = max(prices)
+            self.order_book.apply_snapshot(asks, bids, sequence)
+            return True
+
+        if message_type == btc_streams.ORDERBOOK_DIFF:
+            return self.order_book.apply_diff(asks, bids, sequence)
+
+        return False
+
+    @timed("parse_book")
+    def parse_book(self, frame: BookFrame):
         try:
-            ask = self.api_client.get_best_ask(book)
-            bid = self.api_client.get_best_bid(book)
-
-            if ask and bid:
-                self.book.ask = ask
-                self.book.bid = bid
-                mid = (ask + bid) / DECIMAL_2
-                self.book.mid = mid
-                self.book.spread_bps = (ask - bid) / mid / BPS
-                self.book.seen += 1
+            if not self.update_order_book(frame):
+                return
+
+            ask = self.order_book.best_ask()
+            bid = self.order_book.best_bid()
+
+            if not ask or not bid:
+                return
+
+            # deeper levels moved, the top did not
+            if (ask, bid) == self.top:
+                return
+
+            decimals = self.price_decimals or 0
+            self.top = (ask, bid)
+            self.book.update(
+                ask=fixed.to_decimal(ask, decimals),
+                bid=fixed.to_decimal(bid, decimals),
+                mid=fixed.mid_of(ask, bid, decimals),
+                spread_bps=fixed.spread_bps_of(ask, bid),
+            )
+            self.book.seen += 1
+            self.book_changed()
         except Exception as e:
             logger.info(f"BTPub: {e}")
             return
 
     async def publish_stream(self):
-        if not self.book_stream:
-            raise ValueError("No stream")
-
-        async for book in self.book_stream:
-            if book:
-                self.parse_book(book)
-            await asyncio.sleep(0)
+        while True:
+            if not self.book_stream:
+                raise ValueError("No stream")
+
+            async for book in self.book_stream:
+                if book:
+                    self.parse_book(book)
+                if self.order_book.gap:
+                    break
+                await asyncio.sleep(0)
+
+            # missed a diff or the stream ended, join again for a fresh snapshot
+            if self.order_book.gap:
+                sequence = self.order_book.sequence
+                logger.info(f"BTPub {self.symbol}: gap after {sequence}, resnapshot")
+            else:
+                logger.info(f"BTPub {self.symbol}: stream ended, resnapshot")
+                await asyncio.sleep(sleep_seconds.book_stream_retry)
+
+            await self.book_stream.aclose()
+            self.order_book.clear()
+            self.book_stream = btc_streams.create_obdiff_stream(self.symbol)
 
 
 @dataclass
@@ -131,8 +400,13 @@ class BinancePub(PublisherBase):
     api_client: ExchangeAPIClientBase
 
     book: Book = field(default_factory=Book)
+    book_updates: BookUpdates = field(default_factory=BookUpdates)
 
     book_stream: Optional[AsyncGenerator] = None
+    listeners: List[Callable] = field(default_factory=list)
+
+    # the last ask and bid strings
+    quote: Tuple[str, str] = ("", "")
 
     slope: Slope = field(default_factory=Slope)
 
@@ -145,37 +419,54 @@ class BinancePub(PublisherBase):
     def __post_init__(self):
         self.book_stream = bn_streams.create_book_stream(self.symbol)
 
+    async def wait_for_book(self, seen: int) -> int:
+        return await self.book_updates.wait(self.book, seen)
+
+    def book_changed(self) -> None:
+        self.book_updates.notify()
+        for listener in self.listeners:
+            listener(self)
+
+    def collect_metrics(self, scrape: Scrape) -> None:
+        collect_book_metrics(scrape, self.pubsub_key, self.book)
+
     async def run(self):
         await asyncio.gather(
             self.publish_stream(),
             # periodic(self.publish_klines, 5))
         )
 
-    def parse_book(self, book):
+    @timed("parse_book")
+    def parse_book(self, ticker: BookTicker):
         try:
-            if "data" in book:
-                ask = Decimal(book["data"]["a"])
-                bid = Decimal(book["data"]["b"])
+            quote = (ticker.ask, ticker.bid)
+
+            # most tickers only change the quantities
+            if quote == self.quote:
+                return
+            self.quote = quote
+
+            ask = Decimal(quote[0])
+            bid = Decimal(quote[1])
 
-                if ask and bid and (ask != self.book.ask or bid != self.book.bid):
+            last = self.book.quote
 
-                    self.book.ask = ask
-                    self.book.bid = bid
+            if ask and bid and (ask != last.ask or bid != last.bid):
 
-                    mid = (ask + bid) / DECIMAL_2
+                mid = fixed.EXACT.divide(fixed.EXACT.add(ask, bid), fixed.TWO)
 
-                    self.book.spread_bps = (ask - bid) / mid / BPS
+                self.book.update(ask, bid, mid, (ask - bid) / mid / BPS)
 
-                    # self.ma_small.add(mid)
-                    # self.ma_mid.add(mid)
+                # self.ma_small.add(mid)
+                # self.ma_mid.add(mid)
 
-                    if mid != self.book.mid:
-                        # self.micro_ok = bool(
-                        #     self.ma_small.get_average()
-                        #     > self.ma_mid.get_average()
-                        # )
-                        self.book.mid = mid
-                        self.book.seen += 1
+                if mid != last.mid:
+                    # self.micro_ok = bool(
+                    #     self.ma_small.get_average()
+                    #     > self.ma_mid.get_average()
+                    # )
+                    self.book.seen += 1
+                    self.book_changed()
         except Exception as e:
             logger.error(e)
 
@@ -216,4 +507,74 @@ class BinancePub(PublisherBase):
             await asyncio.sleep(0)
 
 
-PubsubProducer = Union[BalancePub, BinancePub, BTPub]
+@dataclass
+class BoardPub(PublisherBase):
+    """
+    The book of a pub in another process, read from the book board
+
+    Reads like the pub it stands for, book and wait_for_book,
+    api_client is the one for orders in this process
+    """
+
+    symbol: str
+    api_client: ExchangeAPIClientBase
+    board: BookBoard
+
+    book: Book = field(default_factory=Book)
+    book_updates: BookUpdates = field(default_factory=BookUpdates)
+    listeners: List[Callable] = field(default_factory=list)
+
+    slot: Optional[int] = None
+    seq: int = 0
+
+    async def wait_for_book(self, seen: int) -> int:
+        return await self.book_updates.wait(self.book, seen)
+
+    def book_changed(self) -> None:
+        self.book_updates.notify()
+        for listener in self.listeners:
+            listener(self)
+
+    def collect_metrics(self, scrape: Scrape) -> None:
+        collect_book_metrics(scrape, self.pubsub_key, self.book)
+
+    def poll(self) -> bool:
+        """Take the book from the board if it changed, True if it did"""
+        if self.slot is None:
+            self.slot = self.board.slot_of(self.pubsub_key)
+            if self.slot is None:
+                return False
+
+        if self.board.seq(self.slot) == self.seq:
+            return False
+
+        quote = self.board.read(self.slot)
+        self.seq = quote.seq
+        if not quote.ask or not quote.bid:
+            return False
+
+        self.book.update(
+            ask=fixed.to_decimal(quote.ask, quote.decimals),
+            bid=fixed.to_decimal(quote.bid, quote.decimals),
+            mid=fixed.EXACT.divide(
+                fixed.to_decimal(quote.mid2, quote.decimals), fixed.TWO
+            ),
+            spread_bps=fixed.spread_bps_of(quote.ask, quote.bid),
+        )
+        self.book.seen += 1
+        self.book_changed()
+        return True
+
+    async def run(self):
+        """Woken by the writer, polls every poll_board if no one wakes the board"""
+        if not self.board.watch(self.poll):
+            await periodic(self.poll, sleep_seconds.poll_board)
+            return
+        try:
+            self.poll()
+            await asyncio.Event().wait()
+        finally:
+            self.board.unwatch(self.poll)
+
+
+PubsubProducer = Union[BalancePub, BinancePub, BTPub, BoardPub, UserDataPub]
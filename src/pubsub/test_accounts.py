@@ -0,0 +1,81 @@
+import asyncio
+import queue
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+import src.streams.btcturk as btc_streams
+from src.domain import Asset
+from src.exchanges.btcturk.base import BtcturkBase
+
+from .accounts import AccountFeed
+from .pubs import BalancePub, UserDataPub
+
+
+@dataclass
+class BalanceExchange(BtcturkBase):
+    polls: int = 0
+    balances: dict = field(
+        default_factory=lambda: {
+            "data": [
+                {"asset": "ETH", "free": "2", "locked": "1"},
+                {"asset": "TRY", "free": "5000", "locked": "0"},
+            ]
+        }
+    )
+
+    async def get_account_balance(self) -> Optional[dict]:
+        self.polls += 1
+        return self.balances
+
+
+def drain(sent: queue.Queue, worker: AccountFeed, pubs: dict) -> None:
+    while not sent.empty():
+        worker.receive(sent.get_nowait(), pubs)
+
+
+async def fan_out():
+    exchange = BalanceExchange()
+    sent: queue.Queue = queue.Queue()
+    supervisor = AccountFeed(queues=[sent])
+
+    balance_pub = BalancePub(pubsub_key="bt_balance", exchange=exchange)
+    user_data_pub = UserDataPub(pubsub_key="bt_user_data", exchange=exchange)
+    supervisor.attach(balance_pub)
+    supervisor.attach(user_data_pub)
+    supervisor.attach(balance_pub)
+
+    worker = AccountFeed()
+    fed_balance = BalancePub(pubsub_key="bt_balance", exchange=exchange, fed=True)
+    fed_balance.add_asset(Asset(symbol="ETH"))
+    fed_user_data = UserDataPub(pubsub_key="bt_user_data", exchange=exchange, fed=True)
+    fed_user_data.add_balance_pub(fed_balance)
+    events = []
+    fed_user_data.listeners.append(lambda *event: events.append(event))
+    pubs = {"bt_balance": fed_balance}
+
+    # polled once here, every worker gets it
+    await balance_pub.publish_balance()
+    assert sent.qsize() == 1
+    drain(sent, worker, pubs)
+    assert fed_balance.assets["ETH"].free == Decimal(2)
+    assert exchange.polls == 1
+
+    # the socket logged in before the worker made its user data pub
+    user_data_pub.parse_event(btc_streams.USER_LOGIN, {"ok": True})
+    drain(sent, worker, pubs)
+    assert not fed_user_data.live
+    worker.catch_up(fed_user_data)
+    assert fed_user_data.live and fed_balance.live
+
+    pubs["bt_user_data"] = fed_user_data
+    order = {"id": 1}
+    user_data_pub.parse_event(btc_streams.ORDER_INSERT, order)
+    user_data_pub.set_live(False)
+    drain(sent, worker, pubs)
+    assert events == [(btc_streams.ORDER_INSERT, order)]
+    assert not fed_balance.live
+
+
+def test_account_feed():
+    asyncio.run(fan_out())
@@ -0,0 +1,160 @@
+import asyncio
+import multiprocessing
+import time
+from decimal import Decimal
+
+from src.exchanges.btcturk.base import BtcturkBase
+from src.exchanges.factory import ExchangeType, NetworkType
+from src.numberops.fixed import to_ticks
+
+from .board import BookBoard
+from .factory import PubFactory
+from .pubs import BoardPub, BTPub
+
+
+def read_versions(name: str, key: str, until: int, queue) -> None:
+    board = BookBoard.attach(name)
+    slot = None
+    while slot is None:
+        slot = board.slot_of(key)
+
+    versions = []
+    while not versions or versions[-1] < until:
+        quote = board.read(slot)
+        # ask and bid always of the same write
+        assert quote.ask - quote.bid == 100
+        if not versions or quote.version != versions[-1]:
+            versions.append(quote.version)
+    board.close()
+    queue.put(versions)
+
+
+def test_board_write_read():
+    board = BookBoard.create()
+    try:
+        assert board.slot_of("bn_ETHUSDT") is None
+
+        board.write("bn_ETHUSDT", to_ticks("3777.69"), to_ticks("3777.68"))
+        board.write("bt_ETHTRY", to_ticks("62000"), to_ticks("61990"))
+
+        reader = BookBoard.attach(board.name)
+        slot = reader.slot_of("bt_ETHTRY")
+        assert slot == 1
+        quote = reader.read(slot)
+        assert (quote.version, quote.ask, quote.decimals) == (1, to_ticks("62000"), 0)
+        assert quote.seq == reader.seq(slot) == 2
+        reader.close()
+    finally:
+        board.close()
+
+
+def test_board_across_processes():
+    board = BookBoard.create()
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    reader = context.Process(
+        target=read_versions, args=(board.name, "bn_ETHUSDT", 20000, queue)
+    )
+    reader.start()
+    try:
+        for i in range(1, 20001):
+            board.write("bn_ETHUSDT", 10 ** 8 + i + 100, 10 ** 8 + i)
+        versions = queue.get(timeout=30)
+        reader.join(5)
+    finally:
+        board.close()
+
+    assert versions[-1] == 20000
+    assert versions == sorted(versions)
+
+
+def read_woken(name: str, waker, until: int, queue) -> None:
+    board = BookBoard.attach(name, waker=waker)
+    pub = BoardPub(
+        pubsub_key="bt_ETHTRY", api_client=BtcturkBase(), symbol="ETHTRY", board=board
+    )
+
+    async def read():
+        run = asyncio.create_task(pub.run())
+        seen = await pub.wait_for_book(0)
+        queue.put("ready")
+        wall, cpu = time.monotonic(), time.process_time()
+        # a write is two steps of the sequence
+        while pub.seq < 2 * until:
+            seen = await pub.wait_for_book(seen)
+        queue.put((time.process_time() - cpu) / (time.monotonic() - wall))
+        run.cancel()
+
+    asyncio.run(read())
+    board.close()
+
+
+def test_board_wakes_readers():
+    board = BookBoard.create()
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    reader = context.Process(
+        target=read_woken, args=(board.name, board.add_waker(), 201, queue)
+    )
+    reader.start()
+    try:
+        board.write("bt_ETHTRY", 10 ** 8 + 100, 10 ** 8)
+        assert queue.get(timeout=30) == "ready"
+        for i in range(1, 201):
+            board.write("bt_ETHTRY", 10 ** 8 + i + 100, 10 ** 8 + i)
+            time.sleep(0.005)
+        cpu_share = queue.get(timeout=30)
+        reader.join(5)
+    finally:
+        board.close()
+
+    # woken per write, not spinning between them
+    assert cpu_share < 0.3
+
+
+async def read_books():
+    board = BookBoard.create()
+    pub = BoardPub(
+        pubsub_key="bt_ETHTRY", api_client=BtcturkBase(), symbol="ETHTRY", board=board
+    )
+    try:
+        assert not pub.poll()
+
+        board.write("bt_ETHTRY", to_ticks("3775.2"), to_ticks("3735"))
+        waiter = asyncio.create_task(pub.wait_for_book(0))
+        assert pub.poll()
+        assert await waiter == 1
+        assert pub.book.ask == Decimal("3775.2")
+        assert pub.book.bid == Decimal("3735.0")
+        assert pub.book.mid == Decimal("3755.1")
+
+        # nothing new
+        assert not pub.poll()
+
+        run = asyncio.create_task(pub.run())
+        board.write("bt_ETHTRY", to_ticks("3775.3"), to_ticks("3735"))
+        assert await asyncio.wait_for(pub.wait_for_book(1), 1) == 2
+        run.cancel()
+    finally:
+        board.close()
+
+
+def test_board_pub():
+    asyncio.run(read_books())
+
+
+def test_factory_reads_the_board():
+    board = BookBoard.create()
+    try:
+        pub = PubFactory(board=board).create_bt_pub_if_not_exists(
+            ExchangeType.BTCTURK, NetworkType.REAL, "ETHTRY"
+        )
+        assert isinstance(pub, BoardPub)
+        assert pub.pubsub_key == "btcturk_real_ETHTRY"
+
+        pub = PubFactory().create_bt_pub_if_not_exists(
+            ExchangeType.BTCTURK, NetworkType.REAL, "ETHTRY"
+        )
+        assert isinstance(pub, BTPub)
+    finally:
+        board.close()
@@ -0,0 +1,120 @@
+import asyncio
+from queue import Full
+
+from .hub import STATS, Hub
+from .log_pub import ERROR, LogPublisher, QueueSink
+
+
+def stats_event(changed: dict, source: str = "", removed=(), full=False) -> dict:
+    message = {"changed": changed, "removed": list(removed)}
+    if full:
+        message["full"] = True
+    event = {"channel": "0", "name": STATS, "data": {"message": message, "time": ""}}
+    if source:
+        event["source"] = source
+    return event
+
+
+def error_event(message) -> dict:
+    return {"channel": "0", "name": ERROR, "data": {"message": message, "time": ""}}
+
+
+async def slow_client():
+    hub = Hub(max_queue=2)
+    hub.publish([stats_event({"settings": 1, "a": {"orders": 0}}, full=True)])
+
+    client = hub.subscribe()
+    events = await client.next_events()
+    assert events[0]["data"]["message"] == {
+        "changed": {"settings": 1, "a": {"orders": 0}},
+        "removed": [],
+    }
+
+    # the client is not reading
+    hub.publish([error_event(i) for i in range(3)])
+    hub.publish([stats_event({"a": {"orders": 1}, "b": 0})])
+    hub.publish([stats_event({"b": 1}, removed=["a"])])
+    # restarted
+    hub.publish([stats_event({}, full=True)])
+    hub.publish([stats_event({"settings": 1, "b": 1}, full=True)])
+
+    events = await client.next_events()
+    assert [e["data"]["message"] for e in events] == [
+        1,
+        2,
+        {"changed": {"settings": 1, "b": 1}, "removed": ["a"]},
+    ]
+    assert client.dropped == 1
+
+    hub.unsubscribe(client)
+    assert hub.dropped == 1
+    assert not hub.clients
+
+
+def test_slow_client_drops_logs_and_merges_stats():
+    asyncio.run(slow_client())
+
+
+async def worker_stats():
+    hub = Hub()
+    client = hub.subscribe()
+    hub.publish([stats_event({"time": 1, "a": 0}, "worker-0", full=True)])
+    hub.publish([stats_event({"time": 1, "b": 0}, "worker-1", full=True)])
+    assert hub.stats["0"] == {"time": 1, "a": 0, "b": 0}
+
+    # a robot stopped on worker 0
+    hub.publish([stats_event({"time": 2}, "worker-0", removed=["a"])])
+    events = await client.next_events()
+    assert events[0]["data"]["message"] == {
+        "changed": {"time": 2, "b": 0},
+        "removed": ["a"],
+    }
+    assert hub.stats["0"] == {"time": 2, "b": 0}
+
+    # worker 1 was restarted without its robot, the time of worker 0 is left
+    hub.publish([stats_event({}, "worker-1", full=True)])
+    events = await client.next_events()
+    assert events[0]["data"]["message"] == {"changed": {"time": 2}, "removed": ["b"]}
+    assert hub.stats["0"] == {"time": 2}
+
+
+def test_stats_of_sources_are_merged():
+    asyncio.run(worker_stats())
+
+
+async def from_the_publisher_thread():
+    hub = Hub()
+    hub.start()
+    client = hub.subscribe()
+
+    publisher = LogPublisher(sink=hub)
+    publisher.publish("0", ERROR, "from a thread")
+
+    events = await asyncio.wait_for(client.next_events(), 1)
+    assert events[0]["data"]["message"] == "from a thread"
+
+
+def test_hub_is_a_log_sink():
+    asyncio.run(from_the_publisher_thread())
+
+
+def test_stats_deltas_are_never_lost():
+    class FullQueue:
+        full = True
+        events: list = []
+
+        def put_nowait(self, events):
+            if self.full:
+                raise Full
+            self.events.extend(events)
+
+    queue = FullQueue()
+    sink = QueueSink(queue, source="worker-0")
+    sink.send([stats_event({"a": 0, "b": 0}, full=True), error_event("lost")])
+    sink.send([stats_event({"a": 1}, removed=["b"])])
+
+    queue.full = False
+    sink.send([stats_event({"c": 0})])
+    assert [event["data"]["message"] for event in queue.events] == [
+        {"changed": {"a": 1, "c": 0}, "removed": [], "full": True}
+    ]
@@ -0,0 +1,54 @@
+from .log_pub import ERROR, STATS, LogPublisher, MemorySink
+
+
+def test_log_publisher_batches():
+    sink = MemorySink()
+    publisher = LogPublisher(sink=sink, batch_size=3, autostart=False)
+
+    for i in range(5):
+        publisher.publish("0", ERROR, f"error {i}")
+
+    # nothing is sent from the caller
+    assert sink.events == []
+
+    publisher.flush()
+    assert [e["data"]["message"] for e in sink.events] == [
+        f"error {i}" for i in range(5)
+    ]
+    assert sink.events[0]["channel"] == "0"
+    assert sink.events[0]["name"] == ERROR
+
+
+def test_log_publisher_drops_and_merges():
+    sink = MemorySink()
+    publisher = LogPublisher(sink=sink, max_queue=2, autostart=False)
+
+    for i in range(4):
+        publisher.publish("0", ERROR, i)
+        publisher.publish("0", STATS, {"changed": {i % 2: i}, "removed": []})
+    publisher.publish("1", STATS, {"changed": {}, "removed": ["a"]})
+
+    publisher.flush()
+    messages = [(e["channel"], e["name"], e["data"]["message"]) for e in sink.events]
+
+    assert publisher.dropped == 2
+    assert messages == [
+        ("0", ERROR, 2),
+        ("0", ERROR, 3),
+        ("0", STATS, {"changed": {0: 2, 1: 3}, "removed": []}),
+        ("1", STATS, {"changed": {}, "removed": ["a"]}),
+    ]
+
+
+def test_log_publisher_thread():
+    sink = MemorySink()
+    publisher = LogPublisher(sink=sink)
+
+    publisher.publish("0", ERROR, "in the background")
+
+    for _ in range(100):
+        if sink.events:
+            break
+        publisher.thread.join(0.01)  # type: ignore
+
+    assert sink.events[0]["data"]["message"] == "in the background"
@@ -0,0 +1,190 @@
+import asyncio
+from decimal import Decimal
+
+from src.domain.frames import BookTicker
+from src.environment import sleep_seconds
+from src.exchanges.binance.main import BinanceBase
+from src.exchanges.btcturk.base import BtcturkBase
+from src.monitoring.metrics import Scrape
+from src.streams import btcturk as btc_streams
+from src.streams.decode import book_frame_of, book_ticker_of
+
+from .pubs import BinancePub, BTPub
+
+
+def create_binance_book(ask: str, bid: str) -> BookTicker:
+    return book_ticker_of({"s": "ETHUSDT", "a": ask, "b": bid})
+
+
+def parse_bt_book(pub: BTPub, msg: dict) -> None:
+    pub.parse_book(book_frame_of(msg))
+
+
+async def wait_for_new_books():
+    pub = BinancePub(pubsub_key="test", api_client=BinanceBase(), symbol="ETHUSDT")
+
+    waiter = asyncio.create_task(pub.wait_for_book(0))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    pub.parse_book(create_binance_book("3777.69", "3777.68"))
+    assert await waiter == 1
+
+    # same mid, no wake up
+    waiter = asyncio.create_task(pub.wait_for_book(1))
+    pub.parse_book(create_binance_book("3777.69", "3777.68"))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    pub.parse_book(create_binance_book("3777.78", "3777.77"))
+    assert await waiter == 2
+
+    # an update that happened before waiting is not missed
+    assert await pub.wait_for_book(0) == 2
+
+
+def test_wait_for_book():
+    asyncio.run(wait_for_new_books())
+
+
+def test_bt_pub_order_book():
+    pub = BTPub(pubsub_key="test", api_client=BtcturkBase(), symbol="ETHUSDT")
+
+    parse_bt_book(
+        pub,
+        {
+            "type": 431,
+            "CS": 100,
+            "AO": [{"A": "1.3", "P": "3775.2"}, {"A": "0.09", "P": "3782.3"}],
+            "BO": [{"A": "0.05", "P": "3735"}, {"A": "1", "P": "3734"}],
+        },
+    )
+    assert pub.book.ask == Decimal("3775.2")
+    assert pub.book.bid == Decimal("3735")
+    assert pub.book.seen == 1
+
+    # a quote held by a reader is never changed under it
+    quote = pub.book.quote
+    assert quote.version == 1
+
+    parse_bt_book(
+        pub,
+        {
+            "type": 432,
+            "CS": 101,
+            "AO": [{"A": "0", "P": "3775.2"}],
+            "BO": [{"A": "2", "P": "3740"}],
+        },
+    )
+    assert pub.book.ask == Decimal("3782.3")
+    assert pub.book.bid == Decimal("3740")
+    assert pub.book.seen == 2
+    assert pub.book.version == 2
+    assert (quote.ask, quote.bid, quote.mid) == (
+        Decimal("3775.2"),
+        Decimal("3735.0"),
+        Decimal("3755.10"),
+    )
+
+    # only a deeper level moved
+    parse_bt_book(
+        pub, {"type": 432, "CS": 102, "AO": [{"A": "5", "P": "3790"}], "BO": []}
+    )
+    assert pub.book.seen == 2
+
+    parse_bt_book(pub, {"type": 432, "CS": 104, "AO": [], "BO": []})
+    assert pub.order_book.gap
+    assert pub.book.seen == 2
+
+
+def test_bt_pub_price_scale_is_fixed():
+    pub = BTPub(pubsub_key="test", api_client=BtcturkBase(), symbol="ETHUSDT")
+    parse_bt_book(
+        pub,
+        {
+            "type": 431,
+            "CS": 100,
+            "AO": [{"A": "1", "P": "3775.20"}, {"A": "1", "P": "3782.3"}],
+            "BO": [{"A": "1", "P": "3735"}],
+        },
+    )
+    assert pub.price_decimals == 2
+    assert str(pub.book.ask) == "3775.20"
+    assert str(pub.book.bid) == "3735.00"
+
+    # whatever the prices since, the scale stays
+    parse_bt_book(pub, {"type": 432, "CS": 101, "AO": [{"A": "0", "P": "3775.2"}]})
+    assert str(pub.book.ask) == "3782.30"
+    parse_bt_book(
+        pub,
+        {
+            "type": 431,
+            "CS": 200,
+            "AO": [{"A": "1", "P": "3790"}],
+            "BO": [{"A": "1", "P": "3735"}],
+        },
+    )
+    assert pub.price_decimals == 2
+    assert str(pub.book.ask) == "3790.00"
+
+    # given from the exchange info
+    pub = BTPub(
+        pubsub_key="test", api_client=BtcturkBase(), symbol="ETHUSDT", price_decimals=0
+    )
+    parse_bt_book(
+        pub,
+        {
+            "type": 431,
+            "CS": 1,
+            "AO": [{"A": "1", "P": "3790.5"}],
+            "BO": [{"A": "1", "P": "3735"}],
+        },
+    )
+    assert str(pub.book.bid) == "3735"
+
+
+async def finite_stream(sequence: int, ask: str):
+    yield book_frame_of(
+        {
+            "type": 431,
+            "CS": sequence,
+            "AO": [{"A": "1", "P": ask}],
+            "BO": [{"A": "1", "P": "3735"}],
+        }
+    )
+
+
+async def resnapshot_on_stream_end():
+    pub = BTPub(pubsub_key="test", api_client=BtcturkBase(), symbol="ETHUSDT")
+    pub.book_stream = finite_stream(100, "3775.2")
+
+    task = asyncio.create_task(pub.publish_stream())
+    assert await pub.wait_for_book(0) == 1
+    assert pub.book.ask == Decimal("3775.2")
+
+    # the first stream ended without a gap, a new one brings a fresh snapshot
+    assert await asyncio.wait_for(pub.wait_for_book(1), 1) == 2
+    assert pub.book.ask == Decimal("3780.1")
+
+    task.cancel()
+
+
+def test_bt_pub_resnapshots_when_stream_ends(monkeypatch):
+    monkeypatch.setattr(sleep_seconds, "book_stream_retry", 0)
+    monkeypatch.setattr(
+        btc_streams, "create_obdiff_stream", lambda _: finite_stream(7, "3780.1")
+    )
+    asyncio.run(resnapshot_on_stream_end())
+
+
+def test_book_metrics():
+    pub = BinancePub(
+        pubsub_key="bn_ETHUSDT", api_client=BinanceBase(), symbol="ETHUSDT"
+    )
+    pub.parse_book(create_binance_book("3777.69", "3777.68"))
+
+    scrape = Scrape()
+    pub.collect_metrics(scrape)
+    lines = scrape.text().splitlines()
+    assert 'blackops_book_seen_total{book="bn_ETHUSDT"} 1.0' in lines
+    assert 'blackops_book_ask{book="bn_ETHUSDT"} 3777.69' in lines
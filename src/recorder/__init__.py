@@ -0,0 +1,2 @@
+from .format import list_record_files, read_all_records, read_records
+from .recorder import BookRecorder, RecordWriter, book_recorder
@@ -0,0 +1,99 @@
+"""
+One file is a header and fixed size little endian rows, appended as books arrive
+
+    header: magic, version, depth, key
+    row: time ns, seen, ask, bid, [depth x (price, amount) asks], [... bids]
+
+Rows map one to one onto a numpy structured array
+"""
+import glob
+import os
+import struct
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.numberops.fixed import to_float
+
+MAGIC = b"BKRC"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHH32s")
+
+Level = Tuple[int, int]  # ticks, as in the order book
+
+
+def row_struct(depth: int) -> struct.Struct:
+    return struct.Struct("<qIdd" + "d" * depth * 4)
+
+
+def row_dtype(depth: int) -> np.dtype:
+    fields: list = [("time", "<i8"), ("seen", "<u4"), ("ask", "<f8"), ("bid", "<f8")]
+    if depth:
+        fields += [("asks", "<f8", (depth, 2)), ("bids", "<f8", (depth, 2))]
+    return np.dtype(fields)
+
+
+def pack_header(key: str, depth: int) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, depth, key.encode()[:32])
+
+
+def unpack_header(data: bytes) -> Tuple[str, int]:
+    """key, depth"""
+    magic, version, depth, key = HEADER.unpack(data[: HEADER.size])
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a book record file: {magic!r} v{version}")
+    return key.rstrip(b"\0").decode(), depth
+
+
+def flatten_levels(levels: Sequence[Level], depth: int) -> List[float]:
+    values: List[float] = []
+    for price, amount in levels[:depth]:
+        values += (to_float(price), to_float(amount))
+    values += [0.0] * (depth * 2 - len(values))
+    return values
+
+
+def pack_row(
+    rows: struct.Struct,
+    depth: int,
+    time_ns: int,
+    seen: int,
+    ask: Decimal,
+    bid: Decimal,
+    asks: Sequence[Level] = (),
+    bids: Sequence[Level] = (),
+) -> bytes:
+    values = [time_ns, seen, float(ask), float(bid)]
+    if depth:
+        values += flatten_levels(asks, depth) + flatten_levels(bids, depth)
+    return rows.pack(*values)
+
+
+def read_records(path: str, mmap: bool = False) -> np.ndarray:
+    """Rows of one file, memory mapped read only if mmap"""
+    with open(path, "rb") as f:
+        _, depth = unpack_header(f.read(HEADER.size))
+
+    dtype = row_dtype(depth)
+    size = os.path.getsize(path) - HEADER.size
+    count = size // dtype.itemsize  # a half written last row is left out
+
+    if mmap:
+        if not count:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=count)
+    return np.fromfile(path, dtype=dtype, count=count, offset=HEADER.size)
+
+
+def list_record_files(directory: str, key: str) -> List[str]:
+    """Oldest first, file names sort by the time they were opened"""
+    return sorted(glob.glob(os.path.join(directory, f"{key}_*.bin")))
+
+
+def read_all_records(directory: str, key: str) -> Optional[np.ndarray]:
+    arrays = [read_records(path) for path in list_record_files(directory, key)]
+    if not arrays:
+        return None
+    return np.concatenate(arrays)
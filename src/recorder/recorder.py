@@ -0,0 +1,166 @@
+import collections
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional
+
+from src.environment import RECORD_DEPTH, RECORD_DIR
+from src.monitoring import logger
+
+from .format import pack_header, pack_row, row_struct
+
+
+@dataclass
+class RecordWriter:
+    """
+    Append rows of one book to files under directory,
+    a new file every day or every max_bytes
+    """
+
+    directory: str
+    key: str
+    depth: int = 0
+    max_bytes: int = 256 * 1024 * 1024
+
+    def __post_init__(self):
+        self.rows = row_struct(self.depth)
+        self.file: Optional[BinaryIO] = None
+        self.path: str = ""
+        self.written = 0
+        self.day = ""
+
+    def open(self) -> None:
+        now = datetime.utcnow()
+        os.makedirs(self.directory, exist_ok=True)
+
+        name = f"{self.key}_{now:%Y%m%d_%H%M%S_%f}.bin"
+        self.path = os.path.join(self.directory, name)
+        self.file = open(self.path, "ab")
+        self.file.write(pack_header(self.key, self.depth))
+        self.written = 0
+        self.day = f"{now:%Y%m%d}"
+
+    def should_rotate(self) -> bool:
+        return (
+            self.written >= self.max_bytes or f"{datetime.utcnow():%Y%m%d}" != self.day
+        )
+
+    def write(self, records: List[tuple]) -> None:
+        if not self.file or self.should_rotate():
+            self.close()
+            self.open()
+
+        data = b"".join(pack_row(self.rows, self.depth, *r) for r in records)
+        self.file.write(data)  # type: ignore
+        self.file.flush()  # type: ignore
+        self.written += len(data)
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+@dataclass
+class BookRecorder:
+    """
+    Pubs hand their books over in the event loop, a thread packs and writes them
+
+    A full queue drops the oldest books, the loop never waits on the disk
+    """
+
+    directory: str = RECORD_DIR
+    depth: int = RECORD_DEPTH
+    max_queue: int = 100000
+    max_bytes: int = 256 * 1024 * 1024
+    autostart: bool = True
+
+    dropped: int = 0
+
+    def __post_init__(self):
+        self.queue: collections.deque = collections.deque(maxlen=self.max_queue)
+        self.writers: Dict[str, RecordWriter] = {}
+        self.cond = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def attach(self, pub) -> None:
+        """Record every book of the pub from now on"""
+        if self.record not in pub.listeners:
+            pub.listeners.append(self.record)
+
+    def record(self, pub) -> None:
+        book = pub.book
+        quote = book.quote
+        asks: list = []
+        bids: list = []
+        order_book = getattr(pub, "order_book", None)
+        if self.depth and order_book:
+            asks = order_book.asks.levels(self.depth)
+            bids = order_book.bids.levels(self.depth)
+
+        record = (time.time_ns(), book.seen, quote.ask, quote.bid, asks, bids)
+        with self.cond:
+            if len(self.queue) == self.max_queue:
+                self.dropped += 1
+            self.queue.append((pub.pubsub_key, record))
+            self.cond.notify()
+
+        if self.autostart:
+            self.start()
+
+    def start(self) -> None:
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.run, name="recorder", daemon=True)
+        self.thread.start()
+
+    def take_batch(self) -> Dict[str, List[tuple]]:
+        batch: Dict[str, List[tuple]] = {}
+        while self.queue:
+            key, record = self.queue.popleft()
+            batch.setdefault(key, []).append(record)
+        return batch
+
+    def get_writer(self, key: str) -> RecordWriter:
+        if key not in self.writers:
+            self.writers[key] = RecordWriter(
+                directory=self.directory,
+                key=key,
+                depth=self.depth,
+                max_bytes=self.max_bytes,
+            )
+        return self.writers[key]
+
+    def write(self, batch: Dict[str, List[tuple]]) -> None:
+        for key, records in batch.items():
+            try:
+                self.get_writer(key).write(records)
+            except Exception as e:
+                logger.error(f"recorder {key}: {e}")
+
+    def run(self) -> None:
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+            self.flush()
+
+    def flush(self) -> None:
+        """Write everything queued, from the calling thread"""
+        # one writer at a time keeps the rows in order
+        with self.write_lock:
+            with self.cond:
+                batch = self.take_batch()
+            self.write(batch)
+
+    def close(self) -> None:
+        self.flush()
+        with self.write_lock:
+            for writer in self.writers.values():
+                writer.close()
+
+
+book_recorder = BookRecorder()
@@ -0,0 +1,61 @@
+from src.domain.frames import BookFrame, Level
+from src.exchanges.btcturk.base import BtcturkBase
+from src.pubsub.pubs import BTPub
+from src.recorder import BookRecorder, read_all_records, read_records
+from src.recorder.format import HEADER, row_dtype
+
+
+def create_book(sequence: int, ask: str, bid: str) -> BookFrame:
+    return BookFrame(
+        type=431,
+        sequence=sequence,
+        asks=[Level(ask, "1"), Level("3790", "2")],
+        bids=[Level(bid, "3")],
+    )
+
+
+def test_record_books(tmp_path):
+    recorder = BookRecorder(directory=str(tmp_path), depth=2, autostart=False)
+    pub = BTPub(
+        pubsub_key="btcturk_real_ETHTRY", api_client=BtcturkBase(), symbol="ETHTRY"
+    )
+    recorder.attach(pub)
+    recorder.attach(pub)
+
+    pub.parse_book(create_book(1, "3775.2", "3735"))
+    pub.parse_book(create_book(2, "3776.5", "3735"))
+    recorder.close()
+
+    records = read_all_records(str(tmp_path), "btcturk_real_ETHTRY")
+    assert records is not None
+    assert list(records["seen"]) == [1, 2]
+    assert list(records["ask"]) == [3775.2, 3776.5]
+    assert records["asks"][0].tolist() == [[3775.2, 1], [3790, 2]]
+    assert records["bids"][1].tolist() == [[3735, 3], [0, 0]]
+    assert records["time"][0] <= records["time"][1]
+
+
+def test_rotate_and_drop(tmp_path):
+    recorder = BookRecorder(
+        directory=str(tmp_path), max_queue=2, max_bytes=1, autostart=False
+    )
+    pub = BTPub(pubsub_key="bridge", api_client=BtcturkBase(), symbol="USDTTRY")
+    recorder.attach(pub)
+
+    for i in range(3):
+        pub.parse_book(create_book(i, f"13.5{i}", "13.49"))
+    assert recorder.dropped == 1
+    recorder.flush()
+
+    pub.parse_book(create_book(9, "13.6", "13.49"))
+    recorder.close()
+
+    files = sorted(tmp_path.iterdir())
+    assert len(files) == 2
+    assert [len(read_records(str(f), mmap=True)) for f in files] == [2, 1]
+
+    # a half written row is not read
+    with open(files[1], "ab") as f:
+        f.write(b"\0" * 3)
+    assert len(read_records(str(files[1]))) == 1
+    assert files[1].stat().st_size == HEADER.size + row_dtype(0).itemsize + 3
@@ -1,3 +1,5 @@
+from typing import Any, Tuple
+
 from src.domain import Asset
 from src.domain.models import create_asset_pair
 from src.exchanges.factory import ExchangeType, NetworkType
@@ -9,30 +11,17 @@ from .config import settings
 from .main import LeaderFollowerTrader
 
 
-def sliding_window_factory(config: LeaderFollowerConfig):
-
-    config.is_valid()
-
+def create_book_pubs(config: LeaderFollowerConfig) -> Tuple[Any, Any, Any]:
+    """leader, follower and bridge pubs, the bridge is None without a bridge"""
     stg = config.input
     network = NetworkType.TESTNET if config.testnet else NetworkType.REAL
-
-    balance_pub = pub_factory.create_balance_pub_if_not_exists(
-        ex_type=ExchangeType(config.follower_exchange), network=network
-    )
-
     pair = create_asset_pair(stg.base, stg.quote)
-    balance_pub.add_asset(pair.base)
-    balance_pub.add_asset(pair.quote)
 
     follower_pub = pub_factory.create_bt_pub_if_not_exists(
         ex_type=ExchangeType(config.follower_exchange),
         network=network,
         symbol=pair.symbol,  # eth try
     )
-    if network == NetworkType.TESTNET:
-        follower_pub.api_client.dummy_exchange.add_balance(  # type:ignore
-            Asset(symbol=stg.quote), settings.max_step * settings.quote_step_qty * 2
-        )
 
     bridge_pub = None
     if stg.bridge:
@@ -54,11 +43,52 @@ def sliding_window_factory(config: LeaderFollowerConfig):
             symbol=pair.symbol,
         )
 
+    return leader_pub, follower_pub, bridge_pub
+
+
+def create_account_pubs(config: LeaderFollowerConfig) -> Tuple[Any, Any]:
+    """balance and user data pubs of the follower account, no user data on testnet"""
+    stg = config.input
+    network = NetworkType.TESTNET if config.testnet else NetworkType.REAL
+
+    balance_pub = pub_factory.create_balance_pub_if_not_exists(
+        ex_type=ExchangeType(config.follower_exchange), network=network
+    )
+
+    pair = create_asset_pair(stg.base, stg.quote)
+    balance_pub.add_asset(pair.base)
+    balance_pub.add_asset(pair.quote)
+
+    user_data_pub = None
+    if network == NetworkType.REAL:
+        user_data_pub = pub_factory.create_user_data_pub_if_not_exists(
+            ex_type=ExchangeType(config.follower_exchange), network=network
+        )
+        user_data_pub.add_balance_pub(balance_pub)
+
+    return balance_pub, user_data_pub
+
+
+def sliding_window_factory(config: LeaderFollowerConfig):
+
+    config.is_valid()
+
+    stg = config.input
+    network = NetworkType.TESTNET if config.testnet else NetworkType.REAL
+
+    balance_pub, user_data_pub = create_account_pubs(config)
+    leader_pub, follower_pub, bridge_pub = create_book_pubs(config)
+    if network == NetworkType.TESTNET:
+        follower_pub.api_client.dummy_exchange.add_balance(  # type:ignore
+            Asset(symbol=stg.quote), settings.max_step * settings.quote_step_qty * 2
+        )
+
     trader = LeaderFollowerTrader(
         config=config,
         leader_pub=leader_pub,
         follower_pub=follower_pub,
         bridge_pub=bridge_pub,
         balance_pub=balance_pub,
+        user_data_pub=user_data_pub,
     )
     return trader
@@ -1,29 +1,48 @@
 import asyncio
+import collections
 import decimal
-from copy import copy
 from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from decimal import Decimal
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 
 from src.domain import BPS, OrderType, create_asset_pair
+from src.domain.models import ZERO
 from src.environment import sleep_seconds
 from src.monitoring import logger
-from src.numberops import round_decimal_floor, round_decimal_half_up
+from src.monitoring.latency import timed
+from src.monitoring.metrics import Scrape, counter, gauge
+from src.numberops import fixed, round_decimal_floor, round_decimal_half_up
 from src.periodic import periodic
-from src.pubsub.pubs import BalancePub, BinancePub, BTPub
+from src.pubsub.pubs import BalancePub, BinancePub, BTPub, UserDataPub
 from src.robots.base import RobotBase
 from src.robots.sliding.orders import OrderApi
 from src.stgs.sliding.config import LeaderFollowerConfig
 
 from .config import settings
 
+ORDERS = counter("blackops_orders_total", "Orders by side and event")
+ORDER_FAILS = counter("blackops_order_fails_total", "Orders not sent, by reason")
+CANCELS = counter("blackops_cancels_total", "Cancels by outcome")
+ORDERS_LIVE = gauge("blackops_orders_live", "Orders not done yet, by state")
+TAKER_PRICE = gauge("blackops_taker_price", "Prices the robot would take at")
+
+ORDER_EVENTS = ("delivered", "cancelled", "filled")
+FAIL_REASONS = ("open_orders", "hit_order_limit", "parent", "bad_response", "self_lock")
+
 
-@dataclass
 class Theo:
-    sell: Decimal = Decimal(0)
-    mid: Decimal = Decimal(0)
-    buy: Decimal = Decimal(0)
+    """Prices the robot would take at"""
+
+    __slots__ = ("sell", "mid", "buy")
+
+    def __init__(self) -> None:
+        self.sell = ZERO
+        self.mid = ZERO
+        self.buy = ZERO
+
+    def dict(self) -> dict:
+        return {"sell": self.sell, "mid": self.mid, "buy": self.buy}
 
 
 @dataclass
@@ -34,6 +53,7 @@ class LeaderFollowerTrader(RobotBase):
     follower_pub: BTPub
     balance_pub: BalancePub
     bridge_pub: Optional[BTPub] = None
+    user_data_pub: Optional[UserDataPub] = None
 
     base_step_qty: Optional[Decimal] = None
 
@@ -50,6 +70,9 @@ class LeaderFollowerTrader(RobotBase):
             config=self.config,
             pair=self.pair,
             exchange=self.follower_pub.api_client,
+            user_data=self.user_data_pub,
+            ledger=self.balance_pub.ledger,
+            balance_pub=self.balance_pub,
         )
 
     def set_base_step_qty(self, price: Decimal) -> None:
@@ -57,6 +80,8 @@ class LeaderFollowerTrader(RobotBase):
 
     async def run(self) -> None:
         logger.info(f"Starting {self.config.sha}..")
+        # open connections before the first order needs one
+        await self.follower_pub.api_client.warm_up()
         await self.run_streams()
 
     async def run_streams(self) -> None:
@@ -67,55 +92,61 @@ class LeaderFollowerTrader(RobotBase):
                 self.order_api.refresh_open_orders,
                 sleep_seconds.refresh_open_orders,
             ),
-            periodic(
-                self.order_api.clear_orders_in_last_second,
-                0.95,
-            ),
         ]
 
         await asyncio.gather(*aws)
 
     # LEADER
     async def poll_leader_pub(self) -> None:
-        pre = None
+        seen = 0
         while True:
-            if not self.leader_pub.book.mid or self.leader_pub.book.mid == pre:
-                await asyncio.sleep(0)
-                continue
+            # sleep until the leader mid changes
+            seen = await self.leader_pub.wait_for_book(seen)
 
             try:
                 self.set_taker_mids()
                 await self.should_sell()
 
-                pre = copy(self.leader_pub.book.mid)
                 self.leader_pub.book.processed += 1
 
-                await asyncio.sleep(0)
-
             except Exception as e:
                 logger.error(e)
 
     async def poll_follower_pub(self):
+        seen = 0
         while True:
-            if self.follower_pub.book.processed < self.follower_pub.book.seen:
-                await self.should_sell()
-                await self.should_buy()
-                self.follower_pub.book.processed = copy(self.follower_pub.book.seen)
+            seen = await self.follower_pub.wait_for_book(seen)
 
-            await asyncio.sleep(0)
+            await self.should_sell()
+            await self.should_buy()
+            self.follower_pub.book.processed = seen
 
     def set_taker_mids(self):
-        if not self.bridge_pub or not self.bridge_pub.book.mid:
+        bridge_mid = self.bridge_pub.book.quote.mid if self.bridge_pub else ZERO
+        if not bridge_mid:
             raise Exception("No bridge mid")
 
-        self.taker.mid = self.leader_pub.book.mid * self.bridge_pub.book.mid
+        leader_mid = self.leader_pub.book.quote.mid
+        self.taker.mid = fixed.EXACT.multiply(leader_mid, bridge_mid)
         if not self.base_step_qty:
             self.set_base_step_qty(self.taker.mid)
 
     # SELL
     async def should_sell(self):
+        order = self.sell_order()
+        if not order:
+            return
+
+        await self.order_api.send_order(OrderType.SELL, *order)
+        return True
+
+    @timed("should_sell")
+    def sell_order(self) -> Optional[Tuple[Decimal, int]]:
+        """Price and qty to sell at, if the books say sell"""
+        follower = self.follower_pub.book.quote
+
         # wait for the bid and base_step_qty to be set
-        if not self.follower_pub.book.bid or not self.base_step_qty:
+        if not follower.bid or not self.base_step_qty:
             return
 
         current_step = self.get_current_step()
@@ -137,12 +168,12 @@ class LeaderFollowerTrader(RobotBase):
         # if spread_diff > 0:
         #     price_coeff -= spread_diff * settings.unit_signal_bps.spread_risk
 
-        self.taker.sell = self.taker.mid * price_coeff
+        self.taker.sell = fixed.EXACT.multiply(self.taker.mid, price_coeff)
 
-        price = self.taker.sell.quantize(self.follower_pub.book.bid, decimal.ROUND_DOWN)
+        price = self.taker.sell.quantize(follower.bid, decimal.ROUND_DOWN, fixed.EXACT)
 
         # do not sell if bid is too low
-        if self.follower_pub.book.bid < price:
+        if follower.bid < price:
             return
 
         qty = self.get_sell_qty()
@@ -150,8 +181,7 @@ class LeaderFollowerTrader(RobotBase):
         if not self.can_sell(price, qty):
             return
 
-        await self.order_api.send_order(OrderType.SELL, price, qty)
-        return True
+        return price, qty
 
     def can_sell(self, price, qty) -> bool:
         # do we have enough to sell, and is it too little to sell
@@ -167,14 +197,23 @@ class LeaderFollowerTrader(RobotBase):
 
     # BUY
     async def should_buy(self):
+        order = self.buy_order()
+        if order:
+            await self.order_api.send_order(OrderType.BUY, *order)
+
+    @timed("should_buy")
+    def buy_order(self) -> Optional[Tuple[Decimal, int]]:
+        """Price and qty to buy at, if the books say buy"""
+        follower = self.follower_pub.book.quote
+
         # wait for the ask and base_step_qty to be set
-        if not self.follower_pub.book.ask or not self.base_step_qty:
+        if not follower.ask or not self.base_step_qty:
             return
 
         # do not buy if spread unhealthy
         if (
-            self.leader_pub.book.spread_bps > settings.max_spread_bps
-            or self.follower_pub.book.spread_bps > settings.max_spread_bps
+            self.leader_pub.book.quote.spread_bps > settings.max_spread_bps
+            or follower.spread_bps > settings.max_spread_bps
         ):
             # self.order_api.stats.buy_stats.no_buy.max_spread += 1
             return
@@ -187,7 +226,7 @@ class LeaderFollowerTrader(RobotBase):
         # if not self.leader_pub.micro_ok:
         #     return
 
-        price = self.taker.buy.quantize(self.follower_pub.book.ask, decimal.ROUND_DOWN)
+        price = self.taker.buy.quantize(follower.ask, decimal.ROUND_DOWN, fixed.EXACT)
 
         current_step = self.get_current_step()
 
@@ -201,10 +240,10 @@ class LeaderFollowerTrader(RobotBase):
         # if self.leader_pub.slope.down:
         #     price_coeff -= settings.unit_signal_bps.slope_risk
 
-        self.taker.buy = self.taker.mid * price_coeff
+        self.taker.buy = fixed.EXACT.multiply(self.taker.mid, price_coeff)
 
         # do not waste orders if ask is too high
-        if self.follower_pub.book.ask > price:
+        if follower.ask > price:
             return
 
         qty = self.get_buy_qty(current_step)
@@ -215,7 +254,7 @@ class LeaderFollowerTrader(RobotBase):
         if self.pair.quote.free < price * qty:
             return
 
-        await self.order_api.send_order(OrderType.BUY, price, qty)
+        return price, qty
 
     def get_current_step(self):
         return self.pair.base.total_balance / self.base_step_qty
@@ -232,15 +271,42 @@ class LeaderFollowerTrader(RobotBase):
     async def close(self) -> None:
         await self.order_api.cancel_open_orders()
 
+    def collect_metrics(self, scrape: Scrape) -> None:
+        sha = self.config.sha
+        stats = self.order_api.stats
+        for side, side_stats in (("buy", stats.buy_stats), ("sell", stats.sell_stats)):
+            for event in ORDER_EVENTS:
+                value = getattr(side_stats, event)
+                scrape.add(ORDERS, value, sha=sha, side=side, event=event)
+
+        for reason in FAIL_REASONS:
+            value = getattr(stats.fail_counts, reason)
+            scrape.add(ORDER_FAILS, value, sha=sha, reason=reason)
+
+        for outcome, value in self.order_api.cancels.outcomes.items():
+            scrape.add(CANCELS, value, sha=sha, outcome=outcome)
+
+        live = self.order_api.registry.live.values()
+        states = collections.Counter(order.state.value for order in live)
+        for state, value in states.items():
+            scrape.add(ORDERS_LIVE, value, sha=sha, state=state)
+
+        for side, price in self.taker.dict().items():
+            scrape.add(TAKER_PRICE, price, sha=sha, side=side)
+
     def create_stats_message(self) -> dict:
         return {
             "start time": self.start_time,
             "base_step_qty": self.base_step_qty,
-            "open fresh": self.order_api.open_orders_fresh,
+            "orders": self.order_api.registry.dict(),
+            "user data": bool(self.user_data_pub and self.user_data_pub.live),
             "pair": self.pair.dict(),
-            "leader": asdict(self.leader_pub.book),
-            "follower": asdict(self.follower_pub.book),
-            "taker": asdict(self.taker),
+            "ledger": self.balance_pub.ledger.dict(),
+            "pool": self.follower_pub.api_client.pool_stats(),
+            "leader": self.leader_pub.book.dict(),
+            "follower": self.follower_pub.book.dict(),
+            "taker": self.taker.dict(),
             # "slope": asdict(self.leader_pub.slope),
             "order": asdict(self.order_api.stats),
+            "cancels": self.order_api.cancels.dict(),
         }
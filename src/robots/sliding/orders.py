@@ -6,11 +6,17 @@ from decimal import Decimal
 from typing import Optional
 
 import src.pubsub.log_pub as log_pub
-from src.domain import Asset, AssetPair, OrderId, OrderType
+import src.streams.btcturk as btc_streams
+from src.domain import AssetPair, OrderId, OrderType
+from src.domain.ledger import Ledger
+from src.domain.models import ZERO
+from src.domain.registry import Order, OrderRegistry, OrderState
 from src.environment import sleep_seconds
 from src.exchanges.base import ExchangeAPIClientBase
+from src.exchanges.cancels import CancelOutcome, CancelScheduler
 from src.exchanges.locks import Locks
 from src.monitoring import logger
+from src.pubsub.pubs import BalancePub, UserDataPub
 from src.stgs import LeaderFollowerConfig
 
 from .config import settings
@@ -58,13 +64,8 @@ class OrderStats:
     fail_counts: FailCounts = field(default_factory=FailCounts)
 
 
-@dataclass
-class Order:
-    order_id: OrderId
-    symbol: str
-    side: str
-    price: Decimal
-    qty: Decimal
+def loop_time() -> float:
+    return asyncio.get_event_loop().time()
 
 
 @dataclass
@@ -73,9 +74,9 @@ class OrderApi:
     pair: AssetPair
     exchange: ExchangeAPIClientBase
 
-    open_orders: collections.deque = field(default_factory=collections.deque)
-    cancelled_orders: dict = field(default_factory=dict)
-    # probably_filled: list = field(default_factory=list)
+    registry: OrderRegistry = field(
+        default_factory=lambda: OrderRegistry(clock=loop_time)
+    )
 
     last_cancelled: collections.deque = field(
         default_factory=lambda: collections.deque(maxlen=3)
@@ -87,115 +88,198 @@ class OrderApi:
     stats: OrderStats = field(default_factory=OrderStats)
 
     locks: Locks = field(default_factory=Locks)
-    open_orders_fresh: bool = True
-
-    orders_in_last_second: int = 0
-    max_orders_per_second: int = 3
-
-    async def clear_orders_in_last_second(self):
-        self.orders_in_last_second = 0
-
-    async def cancel_open_orders(self) -> None:
-        try:
-            if not self.open_orders:
-                return None
-
-            if self.locks.cancel.locked():
-                return None
-
-            async with self.locks.cancel:
-                while self.open_orders:
-                    order: Order = self.open_orders[0]
-                    await self.cancel_order(order)
-                    self.open_orders.popleft()
 
-                if self.open_orders_fresh:
-                    self.cancelled_orders = {}
+    # pushes order events, open orders are polled only to reconcile
+    user_data: Optional[UserDataPub] = None
+    # poll the open orders once the loop time passes it
+    reconcile_at: Optional[float] = None
+
+    # balances move with our orders, not only when the balance poll returns
+    ledger: Optional[Ledger] = None
+    # tells how the orders that closed without an event ended
+    balance_pub: Optional[BalancePub] = None
+
+    # cancels that did not get a token in time
+    cancels_due: bool = False
+
+    def __post_init__(self) -> None:
+        self.cancels = CancelScheduler(exchange=self.exchange)
+        if self.user_data:
+            self.user_data.listeners.append(self.on_user_event)
+        if self.ledger:
+            self.ledger.listeners.append(self.on_settled)
+
+    def reconcile_later(self) -> None:
+        """Ask the exchange, after giving the events a chance if the socket is up"""
+        delay = 0.0
+        if self.user_data and self.user_data.live:
+            delay = sleep_seconds.reconcile_open_orders
+        at = loop_time() + delay
+        if self.reconcile_at is None or at < self.reconcile_at:
+            self.reconcile_at = at
+
+    def on_user_event(self, message_type: int, event: dict) -> None:
+        if message_type == btc_streams.USER_LOGIN:
+            # events may be lost while the socket was down, only a poll can tell
+            self.reconcile_at = loop_time()
+            return
 
-        except Exception as e:
-            msg = f"cancel_open_orders: {e}"
-            logger.error(msg)
-            log_pub.publish_error(message=msg)
+        order = self.registry.get(event.get("id"))
+        if message_type == btc_streams.ORDER_INSERT:
+            # may come before the submit response
+            order = self.registry.get_client(event.get("newOrderClientId"))
+            if order and order.state == OrderState.PENDING:
+                self.registry.opened(order, event["id"])
+            return
 
-    async def cancel_order(self, order: Order) -> None:
-        if order.order_id in self.cancelled_orders:
+        if not order:
             return
 
-        await self.poll_for_lock(self.exchange.locks.cancel)
+        if message_type == btc_streams.ORDER_DELETE:
+            self.order_cancelled(order)
+        elif message_type == btc_streams.ORDER_MATCHED:
+            self.order_matched(order, Decimal(str(event.get("numLeft", 0))))
+        elif message_type == btc_streams.ORDER_UPDATE:
+            order.left = Decimal(str(event.get("numLeft", order.left)))
+
+    def on_settled(self, client_id: str, filled: bool) -> None:
+        """The balances tell how a closed order ended, unless an event did"""
+        order = self.registry.get_client(client_id)
+        if not order or order.state != OrderState.CLOSED:
+            return
+        if filled:
+            self.order_matched(order, ZERO)
+        else:
+            self.order_cancelled(order)
 
-        ok = await self.exchange.cancel_order(order.order_id)
+    def order_matched(self, order: Order, left: Decimal) -> None:
+        if not self.registry.matched(order, left):
+            return
+        if self.ledger:
+            self.ledger.fill(order.client_id, left)
+        if order.state == OrderState.FILLED:
+            self.count_filled(order)
 
-        if ok:
-            self.cancel_successful(order)
-        else:
-            self.cancel_failed(order)
+    def order_cancelled(self, order: Order) -> None:
+        if not self.registry.cancelled(order):
+            return
+        if self.ledger:
+            self.ledger.release(order.client_id)
 
-    def cancel_successful(self, order: Order) -> None:
-        self.cancelled_orders[order.order_id] = order
         self.last_cancelled.append(order)
-        # logger.info(f"cancelled: {asdict(order)}")
-
         if order.side == OrderType.BUY:
-            # self.pair.base.free -= order.qty
             self.stats.buy_stats.cancelled += 1
         else:
-            # self.pair.base.free += order.qty
             self.stats.sell_stats.cancelled += 1
 
-    def cancel_failed(self, order: Order) -> None:
-        # couldn't cancel but maybe filled
-        self.open_orders_fresh = False
+    def count_filled(self, order: Order) -> None:
+        self.last_filled.append(order)
         if order.side == OrderType.BUY:
             self.stats.buy_stats.filled += 1
         else:
             self.stats.sell_stats.filled += 1
 
-        self.last_filled.append(order)
+    async def cancel_open_orders(self) -> None:
+        """All at once, orders already being cancelled are left to that cancel"""
+        try:
+            orders = [
+                order
+                for order in self.registry.cancellable()
+                if self.registry.cancelling(order)
+            ]
+            if not orders:
+                return None
+
+            outcomes = await self.cancels.cancel_many(
+                order.order_id for order in orders  # type: ignore
+            )
+            for order in orders:
+                self.cancel_done(order, outcomes[order.order_id])  # type: ignore
+
+        except Exception as e:
+            msg = f"cancel_open_orders: {e}"
+            logger.error(msg)
+            log_pub.publish_error(message=msg)
+
+    def cancel_done(self, order: Order, outcome: CancelOutcome) -> None:
+        if order.state != OrderState.CANCEL_PENDING:
+            return  # an event was faster
+
+        if outcome == CancelOutcome.CANCELLED:
+            self.order_cancelled(order)
+        elif outcome == CancelOutcome.NO_TOKEN:
+            # never sent, try again on the next refresh
+            self.registry.transition(order, order.resting_state())
+            self.cancels_due = True
+        else:
+            # probably filled, the events or a poll will tell
+            self.reconcile_later()
 
     async def poll_for_lock(self, lock):
         while lock.locked():
             await asyncio.sleep(sleep_seconds.poll_for_lock)
 
+    def reconcile_due(self) -> bool:
+        return self.reconcile_at is not None and loop_time() >= self.reconcile_at
+
     async def refresh_open_orders(self) -> None:
-        if self.open_orders_fresh:
+        if self.cancels_due:
+            self.cancels_due = False
+            await self.cancel_open_orders()
+
+        if not self.reconcile_due():
             return None
 
         if self.locks.read.locked():
             return None
 
+        # an order on its way would look missing
+        if self.locks.buy.locked() or self.locks.sell.locked():
+            return None
+
         async with self.locks.read:
             await self.poll_for_lock(self.exchange.locks.read)
 
+            taken_at = loop_time()
             res: Optional[dict] = await self.exchange.get_open_orders(self.pair)
-            # loop = asyncio.get_event_loop()
             if res:
-                # loop.run_in_executor(thread_pool_executor, self.get_and_refresh, res)
-                self.get_and_refresh(res)
+                self.get_and_refresh(res, taken_at)
 
         await self.cancel_open_orders()
 
-    def get_and_refresh(self, res):
+    def get_and_refresh(self, res: dict, taken_at: float) -> None:
         orderlist = self.exchange.get_sorted_order_list(res)
-        self.refresh_open_order_successful(orderlist)
-
-    def refresh_open_order_successful(self, orderlist: list) -> None:
-        orders = [
-            Order(
-                order_id=order_dict.get("id"),
-                price=Decimal(order_dict["price"]),
-                qty=Decimal(order_dict.get("leftAmount", 0)),
-                symbol=order_dict.get("pairSymbol"),
-                side=order_dict.get("type"),
-            )
-            for order_dict in orderlist
-        ]
+        self.refresh_open_order_successful(orderlist, taken_at)
+
+    def refresh_open_order_successful(self, orderlist: list, taken_at: float) -> None:
+        closed = False
+        for order in self.registry.reconcile(orderlist, taken_at):
+            if order.state == OrderState.REJECTED:
+                if self.ledger:
+                    self.ledger.release(order.client_id)
+                continue
+            # filled or cancelled, a 441 or the next balance snapshot will tell
+            closed = True
+            if self.ledger:
+                self.ledger.closed(
+                    order.client_id,
+                    order.side,
+                    self.pair.base.symbol,
+                    self.pair.quote.symbol,
+                    order.price,
+                    order.left,
+                )
+
+        if closed and self.balance_pub:
+            self.balance_pub.snapshot_now()
 
-        for order in orders:
-            if order.order_id not in self.cancelled_orders:
-                self.open_orders.append(order)
+        if self.ledger:
+            # partial fills the events missed
+            for order in self.registry.live.values():
+                self.ledger.fill(order.client_id, order.left)
 
-        self.open_orders_fresh = True
-        self.cancelled_orders = {}
+        if self.reconcile_at is not None and self.reconcile_at <= taken_at:
+            self.reconcile_at = None
 
     async def deliver_ok(self, order: Order):
         if order.side == OrderType.BUY:
@@ -203,14 +287,14 @@ class OrderApi:
         else:
             self.stats.sell_stats.delivered += 1
 
-        self.orders_in_last_second += 1
         await asyncio.sleep(
             sleep_seconds.wait_before_cancel
         )  # allow time for order to be filled
 
-        self.open_orders.append(order)
-
         await self.cancel_open_orders()
+        if self.ledger:
+            # balances are already up to date, no need to wait for a poll
+            return
         if order.side == OrderType.BUY:
             await asyncio.sleep(sleep_seconds.wait_after_deliver_buy)
         else:
@@ -222,25 +306,21 @@ class OrderApi:
         # wait a bit, maybe gets better next time
         await asyncio.sleep(sleep_seconds.wait_after_failed_order)
 
-    async def submit_ok(
-        self,
-        order_log: dict,
-        side: OrderType,
-        price: Decimal,
-        qty: int,
-    ):
+    def reject(self, order: Order) -> None:
+        self.registry.rejected(order)
+        if self.ledger:
+            self.ledger.release(order.client_id)
+
+    async def submit_ok(self, order_log: dict, order: Order):
         order_id = self.parse_order_id(order_log)
         if order_id:
-            order = Order(
-                order_id=order_id,
-                side=side.value,
-                price=price,
-                qty=Decimal(qty),
-                symbol=self.pair.symbol,
-            )
+            self.registry.opened(order, order_id)
             await self.deliver_ok(order)
         else:
-            logger.info(f"{self.pair} {side} {qty} {price} : {order_log}")
+            logger.info(
+                f"{self.pair} {order.side} {order.qty} {order.price} : {order_log}"
+            )
+            self.reject(order)
             await self.deliver_fail()
 
     async def send_order(
@@ -251,11 +331,12 @@ class OrderApi:
     ) -> Optional[OrderId]:
         try:
 
-            if self.orders_in_last_second >= self.max_orders_per_second:
+            # no token for this order in time, the exchange would drop it
+            if self.exchange.limits.order.wait_time() > sleep_seconds.order_deadline:
                 self.stats.fail_counts.hit_order_limit += 1
                 return None
 
-            if len(self.open_orders) > 0 or not self.open_orders_fresh:
+            if self.registry.has_live():
                 self.stats.fail_counts.open_orders += 1
                 return None
 
@@ -269,12 +350,30 @@ class OrderApi:
                 return None
 
             async with lock:
-                order_log: Optional[dict] = await self.exchange.submit_limit_order(
-                    self.pair, side, float(price), qty
+                order = self.registry.new(
+                    self.pair.symbol, side.value, price, Decimal(qty)
                 )
+                if self.ledger:
+                    self.ledger.reserve(
+                        order.client_id,
+                        order.side,
+                        self.pair.base.symbol,
+                        self.pair.quote.symbol,
+                        price,
+                        order.qty,
+                    )
+                try:
+                    order_log: Optional[dict] = await self.exchange.submit_limit_order(
+                        self.pair, side, float(price), qty, client_id=order.client_id
+                    )
+                except Exception:
+                    # it may have reached the exchange, a poll will find it
+                    self.reconcile_later()
+                    raise
                 if order_log:
-                    await self.submit_ok(order_log, side, price, qty)
+                    await self.submit_ok(order_log, order)
                 else:
+                    self.reject(order)
                     self.stats.fail_counts.parent += 1
             return None
         except Exception as e:
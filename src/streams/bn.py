@@ -1,13 +1,20 @@
 import asyncio
+import time
 from contextlib import asynccontextmanager
-from typing import Callable
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
 
 import async_timeout
+import simplejson as json  # type: ignore
+import websockets
 from aiohttp.client_exceptions import ClientConnectionError
 from binance import AsyncClient, BinanceSocketManager  # type:ignore
+from websockets.exceptions import WebSocketException
 
 import src.pubsub.log_pub as log_pub
 from src.monitoring import logger
+from src.monitoring.latency import timings
+from src.streams.decode import decoder
 
 
 class BinanceWebSocketException(Exception):
@@ -32,6 +39,9 @@ class BinanceFactory:
         client = await self.get_client()
         yield client
         await client.close_connection()
+        # do not hand out a closed client to the next stream
+        self.client = None
+        self.sm = None
 
     @asynccontextmanager
     async def socket_manager_context(self):
@@ -114,6 +124,150 @@ async def reconnecting_binance_generator(generator_factory: Callable):
             raise e
 
 
+@dataclass
+class BinanceStreamMux:
+    """
+    One combined stream socket for every symbol
+
+    Streams are subscribed and unsubscribed on the live socket as pubs come and go,
+    each frame is decoded once to a BookTicker and queued for its stream.
+    A socket carries up to 1024 streams, plenty for our pairs.
+    """
+
+    uri: str = "wss://stream.binance.com:9443/stream"
+    queue_size: int = 8
+
+    # binance allows 5 incoming messages per second
+    request_interval: float = 0.25
+
+    # stream -> queues of (perf_counter_ns when received, ticker)
+    subscribers: Dict[str, List[asyncio.Queue]] = field(default_factory=dict)
+    active: Set[str] = field(default_factory=set)
+    changed: Optional[asyncio.Event] = None
+    task: Optional[asyncio.Task] = None
+    request_id: int = 0
+
+    async def stream(self, symbol: str, stream_type: str):
+        name = f"{symbol.lower()}@{stream_type}"
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribe(name, queue)
+        try:
+            while True:
+                received, ticker = await queue.get()
+                if timings.enabled:
+                    timings.record("receive", time.perf_counter_ns() - received)
+                yield ticker
+        finally:
+            self.unsubscribe(name, queue)
+
+    def subscribe(self, name: str, queue: asyncio.Queue) -> None:
+        self.subscribers.setdefault(name, []).append(queue)
+        self.notify_changed()
+        if not self.task or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def unsubscribe(self, name: str, queue: asyncio.Queue) -> None:
+        queues = self.subscribers.get(name, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self.subscribers.pop(name, None)
+            self.notify_changed()
+
+        if not self.subscribers and self.task:
+            self.task.cancel()
+            self.task = None
+
+    def notify_changed(self) -> None:
+        if not self.changed:
+            self.changed = asyncio.Event()
+        self.changed.set()
+
+    def dispatch(self, data: Any) -> None:
+        name, ticker, error = decoder.decode_bn(data)
+        if not name or not ticker:
+            # a reply to subscribe or unsubscribe
+            if error:
+                logger.error(f"binance mux: {error}")
+            return
+
+        # decoded, now waiting for the pub
+        item = (time.perf_counter_ns(), ticker)
+
+        for queue in self.subscribers.get(name, ()):
+            if queue.full():
+                # the reader is behind, drop the oldest book
+                queue.get_nowait()
+            queue.put_nowait(item)
+
+    async def request(self, ws: Any, method: str, params: list) -> None:
+        self.request_id += 1
+        message = {"method": method, "params": params, "id": self.request_id}
+        await ws.send(json.dumps(message))
+
+    async def sync_subscriptions(self, ws: Any) -> None:
+        while True:
+            if not self.changed:
+                self.changed = asyncio.Event()
+            await self.changed.wait()
+            self.changed.clear()
+
+            wanted = set(self.subscribers)
+            new = wanted - self.active
+            gone = self.active - wanted
+
+            # batch every change since the last request into one message
+            if new:
+                await self.request(ws, "SUBSCRIBE", sorted(new))
+            if gone:
+                await self.request(ws, "UNSUBSCRIBE", sorted(gone))
+            self.active = wanted
+
+            await asyncio.sleep(self.request_interval)
+
+    async def consume(self, ws: Any) -> None:
+        self.active = set()
+        self.notify_changed()
+        syncer = asyncio.create_task(self.sync_subscriptions(ws))
+        try:
+            while True:
+                data = await ws.recv()
+                if not data:
+                    continue
+                try:
+                    self.dispatch(data)
+                except Exception as e:
+                    logger.error(f"binance mux dispatch: {e}")
+        finally:
+            syncer.cancel()
+
+    async def run(self) -> None:
+        """Reconnects on any error, the readers wait on this task"""
+        retries = 0
+        while self.subscribers:
+            try:
+                async with websockets.connect(uri=self.uri) as ws:  # type: ignore
+                    retries = 0
+                    await self.consume(ws)
+            except (
+                ConnectionError,
+                WebSocketException,
+                asyncio.TimeoutError,
+                OSError,
+            ) as e:
+                retries += 1
+                logger.info(f"Reconnecting binance mux ({retries}), {e}")
+            except Exception as e:
+                retries += 1
+                msg = f"Binance mux lost: {e}, reconnecting ({retries})"
+                logger.error(msg)
+                log_pub.publish_error(message=msg)
+            await asyncio.sleep(min(retries, 10) * 0.1)
+
+
+bn_mux = BinanceStreamMux()
+
+
 def create_stream(symbol: str, stream_type: str):
     def create_new_socket_conn():
         return binance_stream_generator(symbol, stream_type)
@@ -122,7 +276,7 @@ def create_stream(symbol: str, stream_type: str):
 
 
 def create_book_stream(symbol: str):
-    return create_stream(symbol, "bookTicker")
+    return bn_mux.stream(symbol, "bookTicker")
 
 
 def create_kline_stream(symbol: str):
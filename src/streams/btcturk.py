@@ -1,11 +1,12 @@
 import asyncio
 from enum import Enum
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable, Optional
 
 import simplejson as json  # type: ignore
 
 from src.monitoring import logger
-from src.web.ws import ResilientGenerator, ws_stream
+from src.streams.decode import decoder
+from src.web.ws import ResilientGenerator, ws_stream, ws_subscribe_stream
 
 
 def get_orderbook_message(symbol: str):
@@ -42,6 +43,30 @@ def get_ticker_message(symbol: str):
 
 MessageType = Enum("MessageType", "ORDERBOOK TRADE OBDIFF TICKER")
 
+ORDERBOOK_FULL = 431
+ORDERBOOK_DIFF = 432
+
+# private events of the account
+USER_LOGIN = 114
+BALANCE_UPDATE = 201
+USER_TRADE = 423
+ORDER_MATCHED = 441
+ORDER_INSERT = 451
+ORDER_DELETE = 452
+ORDER_UPDATE = 453
+
+USER_EVENTS = {
+    USER_LOGIN,
+    BALANCE_UPDATE,
+    USER_TRADE,
+    ORDER_MATCHED,
+    ORDER_INSERT,
+    ORDER_DELETE,
+    ORDER_UPDATE,
+}
+
+USER_URI = "wss://ws-feed-pro.btcturk.com/"
+
 
 message_funcs = {
     MessageType.ORDERBOOK: get_orderbook_message,
@@ -51,43 +76,104 @@ message_funcs = {
 }
 
 
-def create_bt_gen(message_type: MessageType, symbol, sleep_seconds):
+def create_bt_gen(
+    message_type: MessageType,
+    symbol,
+    sleep_seconds: Optional[float] = None,
+    conflate: bool = True,
+):
     uri = "wss://ws-feed-pro.btcturk.com/"
 
     message_func = message_funcs[message_type]
     message = message_func(symbol)
     message = json.dumps(message)
 
-    # get sleep from env
+    if sleep_seconds is None:
+        # join once, then consume every pushed frame
+        return ws_subscribe_stream(uri, message, conflate=conflate)
+
+    # re-join and read one frame every sleep_seconds
     gen = ws_stream(uri, message, sleep=sleep_seconds)  # 0.1 sec = 100 ms
 
     return gen
 
 
 def create_reconnecting_ws_stream(
-    message_type: MessageType, symbol: str, sleep_seconds: float
+    message_type: MessageType,
+    symbol: str,
+    sleep_seconds: Optional[float] = None,
+    conflate: bool = True,
 ):
     def gen_factory():
-        return create_bt_gen(message_type, symbol, sleep_seconds)
+        return create_bt_gen(message_type, symbol, sleep_seconds, conflate)
 
     return ResilientGenerator().reconnecting_generator(gen_factory)
 
 
 async def parsing_generator(gen: AsyncGenerator):
+    """Typed book frames of the raw ones"""
     async for data in gen:
         if data:
             try:
-                yield json.loads(data)[1]
+                yield decoder.decode_bt(data)
             except Exception as e:
                 logger.error(f"parsing_gen: {e}")
                 continue
 
 
-def create_book_stream(symbol: str, sleep_seconds: float = 0.11) -> AsyncGenerator:
-    gen = create_reconnecting_ws_stream(MessageType.ORDERBOOK, symbol, sleep_seconds)
+def create_book_stream(
+    symbol: str, sleep_seconds: Optional[float] = None, conflate: bool = True
+) -> AsyncGenerator:
+    """
+    Push mode by default, give sleep_seconds to poll the book instead
+    """
+    gen = create_reconnecting_ws_stream(
+        MessageType.ORDERBOOK, symbol, sleep_seconds, conflate
+    )
     return parsing_generator(gen)
 
 
+def create_obdiff_stream(symbol: str) -> AsyncGenerator:
+    """
+    A full book after join, then only the changed levels
+
+    Diffs are never conflated, a dropped one would break the sequence
+    """
+    gen = create_reconnecting_ws_stream(MessageType.OBDIFF, symbol, conflate=False)
+    return parsing_generator(gen)
+
+
+async def user_event_generator(gen: AsyncGenerator):
+    """(type, event) of the account events, a refused login raises"""
+    async for data in gen:
+        try:
+            message_type, event = decoder.decode_user(data)
+        except Exception as e:
+            logger.error(f"user_event_gen: {e}")
+            continue
+
+        if message_type == USER_LOGIN and not event.get("ok"):
+            raise ConnectionRefusedError(f"user stream login: {event.get('message')}")
+
+        if message_type in USER_EVENTS:
+            yield message_type, event
+
+
+def create_user_stream(uri: str, create_login: Callable[[], list]) -> AsyncGenerator:
+    """
+    Order and balance events of the account, pushed as they happen
+
+    Every connection logs in with a freshly signed message,
+    a login event follows each reconnect, events in between may be lost
+    """
+
+    def gen_factory():
+        return ws_subscribe_stream(uri, json.dumps(create_login()))
+
+    gen = ResilientGenerator().reconnecting_generator(gen_factory)
+    return user_event_generator(gen)
+
+
 async def test_parsing_gen(symbol: str):
     async for book in create_book_stream(symbol):
         print(book)
@@ -0,0 +1,108 @@
+"""
+JSON decoding of the market data frames
+
+With msgspec a frame decodes straight into the frames of src.domain.frames,
+the fields we do not read are skipped without building them.
+Without it orjson or the standard library decode the whole frame
+and the fields are picked after
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from src.domain.frames import BookFrame, BookTicker, Level
+from src.monitoring.latency import timed
+
+try:
+    import msgspec  # type: ignore
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+Data = Union[str, bytes]
+
+if msgspec:
+
+    class CombinedFrame(msgspec.Struct):
+        stream: str = ""
+        data: Optional[BookTicker] = None
+        error: Any = None
+
+
+def levels_of(orders: Optional[List[dict]]) -> List[Level]:
+    if not orders:
+        return []
+    return [Level(order["P"], order["A"]) for order in orders]
+
+
+def book_frame_of(msg: dict) -> BookFrame:
+    return BookFrame(
+        type=msg.get("type", 0),
+        sequence=msg.get("CS"),
+        asks=levels_of(msg.get("AO")),
+        bids=levels_of(msg.get("BO")),
+    )
+
+
+def book_ticker_of(data: dict) -> BookTicker:
+    return BookTicker(ask=data["a"], bid=data["b"], update_id=data.get("u", 0))
+
+
+def fastest() -> str:
+    if msgspec:
+        return "msgspec"
+    if orjson:
+        return "orjson"
+    return "json"
+
+
+@dataclass
+class Decoder:
+    """
+    BTCTurk and Binance frames to typed frames
+
+    name is msgspec, orjson or json, the fastest installed by default
+    """
+
+    name: str = field(default_factory=fastest)
+
+    def __post_init__(self) -> None:
+        if self.name == "msgspec":
+            self.bt_decoder = msgspec.json.Decoder(Tuple[int, BookFrame])
+            self.bn_decoder = msgspec.json.Decoder(CombinedFrame)
+
+        self.loads: Callable[[Data], Any] = json.loads
+        if self.name == "orjson":
+            self.loads = orjson.loads
+        elif self.name == "msgspec":
+            self.loads = msgspec.json.decode
+
+    @timed("decode")
+    def decode_bt(self, data: Data) -> BookFrame:
+        """[type, {..}] from the BTCTurk socket"""
+        if self.name == "msgspec":
+            return self.bt_decoder.decode(data)[1]
+        return book_frame_of(self.loads(data)[1])
+
+    @timed("decode")
+    def decode_bn(self, data: Data) -> Tuple[str, Optional[BookTicker], Any]:
+        """Stream name, book ticker and error of a combined stream frame"""
+        if self.name == "msgspec":
+            frame = self.bn_decoder.decode(data)
+            return frame.stream, frame.data, frame.error
+
+        msg = self.loads(data)
+        ticker = book_ticker_of(msg["data"]) if "data" in msg else None
+        return msg.get("stream", ""), ticker, msg.get("error")
+
+    def decode_user(self, data: Data) -> Tuple[int, dict]:
+        """[type, {..}] from the private BTCTurk socket, rare enough to stay a dict"""
+        message_type, event = self.loads(data)
+        return message_type, event
+
+
+decoder = Decoder()
@@ -0,0 +1,32 @@
+"""
+Book streams fed by hand, for replays and benchmarks
+
+The leader, bridge and follower pubs of a robot read queues
+instead of the exchanges, frames are put on them in any order
+"""
+import asyncio
+from typing import Any, AsyncGenerator, Dict, Sequence
+
+LEADER = "leader"
+BRIDGE = "bridge"
+FOLLOWER = "follower"
+
+SOURCES = (LEADER, BRIDGE, FOLLOWER)
+
+
+async def queue_stream(queue: asyncio.Queue) -> AsyncGenerator:
+    """A book stream fed by hand"""
+    while True:
+        frame = await queue.get()
+        yield frame
+        queue.task_done()
+
+
+async def use_queues(pubs: Sequence[Any]) -> Dict[str, asyncio.Queue]:
+    """The leader, bridge and follower pubs read a queue each from now on"""
+    queues: Dict[str, asyncio.Queue] = {}
+    for source, pub in zip(SOURCES, pubs):
+        queues[source] = asyncio.Queue()
+        await pub.book_stream.aclose()
+        pub.book_stream = queue_stream(queues[source])
+    return queues
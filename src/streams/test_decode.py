@@ -0,0 +1,56 @@
+import pytest
+import simplejson as json  # type: ignore
+
+from src.domain.frames import Level
+from src.streams.decode import Decoder, msgspec, orjson
+
+names = ["json"] + ["orjson"] * bool(orjson) + ["msgspec"] * bool(msgspec)
+
+bt_frame = [
+    432,
+    {
+        "CS": 101,
+        "PS": "ETHUSDT",
+        "AO": [{"A": "0", "P": "3775.2"}, {"A": "1.3", "P": "3776"}],
+        "BO": [{"A": "2", "P": "3740"}],
+        "channel": "obdiff",
+        "event": "ETHUSDT",
+        "type": 432,
+    },
+]
+
+bn_frame = {
+    "stream": "ethusdt@bookTicker",
+    "data": {
+        "u": 400900217,
+        "s": "ETHUSDT",
+        "b": "3777.68",
+        "B": "31.2",
+        "a": "3777.69",
+        "A": "4",
+    },
+}
+
+
+@pytest.mark.parametrize("name", names)
+def test_decode_bt(name):
+    frame = Decoder(name).decode_bt(json.dumps(bt_frame))
+
+    assert frame.type == 432
+    assert frame.sequence == 101
+    assert frame.asks == [Level("3775.2", "0"), Level("3776", "1.3")]
+    assert frame.bids == [Level("3740", "2")]
+
+
+@pytest.mark.parametrize("name", names)
+def test_decode_bn(name):
+    decoder = Decoder(name)
+
+    stream, ticker, error = decoder.decode_bn(json.dumps(bn_frame))
+    assert stream == "ethusdt@bookTicker"
+    assert (ticker.ask, ticker.bid) == ("3777.69", "3777.68")
+    assert ticker.update_id == 400900217
+    assert error is None
+
+    # a reply to subscribe
+    assert decoder.decode_bn('{"result": null, "id": 1}') == ("", None, None)
@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import simplejson as json  # type: ignore
+
+import src.streams.bn as bn
+from src.streams.bn import BinanceStreamMux
+
+
+@dataclass
+class FakeWS:
+    frames: asyncio.Queue = field(default_factory=asyncio.Queue)
+    sent: list = field(default_factory=list)
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+    async def recv(self):
+        return await self.frames.get()
+
+
+def book_frame(stream: str, ask: str, bid: str) -> str:
+    return json.dumps({"stream": stream, "data": {"a": ask, "b": bid}})
+
+
+async def mux_two_symbols():
+    mux = BinanceStreamMux(request_interval=0)
+    ws = FakeWS()
+
+    eth: asyncio.Queue = asyncio.Queue()
+    avax: asyncio.Queue = asyncio.Queue()
+    mux.subscribers = {"ethusdt@bookTicker": [eth], "avaxusdt@bookTicker": [avax]}
+
+    consumer = asyncio.create_task(mux.consume(ws))
+    await asyncio.sleep(0.01)
+
+    # one request for every stream
+    assert len(ws.sent) == 1
+    assert ws.sent[0]["method"] == "SUBSCRIBE"
+    assert ws.sent[0]["params"] == ["avaxusdt@bookTicker", "ethusdt@bookTicker"]
+
+    ws.frames.put_nowait(book_frame("ethusdt@bookTicker", "3777.69", "3777.68"))
+    ws.frames.put_nowait(book_frame("avaxusdt@bookTicker", "90.2", "90.1"))
+    ws.frames.put_nowait(json.dumps({"result": None, "id": 1}))
+    await asyncio.sleep(0.01)
+
+    # queued with the time it was received
+    _, ticker = await eth.get()
+    assert ticker.ask == "3777.69"
+    _, ticker = await avax.get()
+    assert ticker.bid == "90.1"
+    assert eth.empty() and avax.empty()
+
+    mux.unsubscribe("avaxusdt@bookTicker", avax)
+    await asyncio.sleep(0.01)
+    assert ws.sent[-1]["method"] == "UNSUBSCRIBE"
+    assert ws.sent[-1]["params"] == ["avaxusdt@bookTicker"]
+
+    consumer.cancel()
+
+
+def test_mux():
+    asyncio.run(mux_two_symbols())
+
+
+async def drop_oldest():
+    mux = BinanceStreamMux()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    mux.subscribers = {"ethusdt@bookTicker": [queue]}
+
+    for ask in ("1", "2", "3"):
+        mux.dispatch(book_frame("ethusdt@bookTicker", ask, "0.5"))
+
+    assert [(await queue.get())[1].ask for _ in range(2)] == ["2", "3"]
+
+
+def test_slow_reader_drops_oldest():
+    asyncio.run(drop_oldest())
+
+
+class BrokenWS(FakeWS):
+    async def recv(self):
+        # not a connection error, the mux used to end here
+        raise KeyError("data")
+
+
+async def read_after_an_error(connections: list):
+    mux = BinanceStreamMux(request_interval=0)
+    reader = mux.stream("ETHUSDT", "bookTicker")
+    first = asyncio.create_task(reader.__anext__())
+    for _ in range(100):
+        if len(connections) == 2:
+            break
+        await asyncio.sleep(0.01)
+    assert len(connections) == 2
+
+    connections[-1].frames.put_nowait(book_frame("ethusdt@bookTicker", "2", "1"))
+    assert (await asyncio.wait_for(first, 1)).ask == "2"
+    assert mux.task and not mux.task.done()
+    await reader.aclose()
+
+
+def test_mux_outlives_unexpected_errors(monkeypatch):
+    connections: list = []
+
+    @asynccontextmanager
+    async def connect(uri):
+        ws = FakeWS() if connections else BrokenWS()
+        connections.append(ws)
+        yield ws
+
+    monkeypatch.setattr(bn.websockets, "connect", connect)
+    asyncio.run(read_after_an_error(connections))
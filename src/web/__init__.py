@@ -1,2 +1,2 @@
 from .url import update_url_query_params
-from .ws import ws_stream
+from .ws import ws_stream, ws_subscribe_stream
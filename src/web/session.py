@@ -0,0 +1,106 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import aiohttp
+
+from src.environment import http_pool
+from src.monitoring import logger
+
+
+@dataclass
+class PoolCounts:
+    """What aiohttp tells the trace hooks"""
+
+    created: int = 0
+    reused: int = 0
+    in_flight: int = 0
+
+
+@dataclass
+class PooledSession:
+    """
+    One long lived session per client, connections are kept warm and reused
+
+    aiohttp already sets TCP_NODELAY on every connection
+    """
+
+    limit: int = field(default_factory=lambda: http_pool.limit)
+    limit_per_host: int = field(default_factory=lambda: http_pool.limit_per_host)
+    keepalive_timeout: float = field(
+        default_factory=lambda: http_pool.keepalive_timeout
+    )
+    ttl_dns_cache: int = field(default_factory=lambda: http_pool.ttl_dns_cache)
+    warm_connections: int = field(default_factory=lambda: http_pool.warm_connections)
+
+    session: Optional[aiohttp.ClientSession] = None
+    counts: PoolCounts = field(default_factory=PoolCounts)
+
+    def get(self) -> aiohttp.ClientSession:
+        if not self.session or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.ttl_dns_cache,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector, trace_configs=[self.trace()]
+            )
+        return self.session
+
+    def trace(self) -> aiohttp.TraceConfig:
+        counts = self.counts
+
+        async def created(*_: Any) -> None:
+            counts.created += 1
+
+        async def reused(*_: Any) -> None:
+            counts.reused += 1
+
+        async def started(*_: Any) -> None:
+            counts.in_flight += 1
+
+        async def ended(*_: Any) -> None:
+            counts.in_flight -= 1
+
+        config = aiohttp.TraceConfig()
+        config.on_connection_create_end.append(created)
+        config.on_connection_reuseconn.append(reused)
+        config.on_request_start.append(started)
+        config.on_request_end.append(ended)
+        config.on_request_exception.append(ended)
+        return config
+
+    async def warm_up(self, url: str) -> None:
+        """Open connections before the first order needs them"""
+        session = self.get()
+
+        async def touch():
+            try:
+                async with session.head(url) as res:
+                    await res.read()
+            except Exception as e:
+                logger.info(f"warm_up {url}: {e}")
+
+        await asyncio.gather(*[touch() for _ in range(self.warm_connections)])
+
+    def stats(self) -> dict:
+        if not self.session or self.session.closed:
+            return {"open": False}
+
+        connector = self.session.connector
+        return {
+            "open": True,
+            "limit": connector.limit if connector else self.limit,
+            "limit_per_host": connector.limit_per_host if connector else 0,
+            "created": self.counts.created,
+            "reused": self.counts.reused,
+            "in_flight": self.counts.in_flight,
+        }
+
+    async def close(self) -> None:
+        if self.session:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,55 @@
+import asyncio
+
+from aiohttp import web
+
+from src.environment import http_pool
+
+from .session import PooledSession
+
+
+async def ok(request):
+    return web.Response(text="ok")
+
+
+async def warm_local_server():
+    app = web.Application()
+    app.router.add_get("/", ok)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f"http://127.0.0.1:{port}/"
+
+    pool = PooledSession(warm_connections=3)
+    assert pool.stats() == {"open": False}
+
+    try:
+        await pool.warm_up(url)
+        stats = pool.stats()
+        assert stats["created"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["limit"] == pool.limit
+
+        # the same session is reused, on a warm connection
+        session = pool.get()
+        async with session.get(url) as res:
+            assert await res.text() == "ok"
+        assert pool.get() is session
+        assert pool.stats()["created"] == 3
+        assert pool.stats()["reused"] == 1
+    finally:
+        await pool.close()
+        await runner.cleanup()
+
+
+def test_warm_up():
+    asyncio.run(warm_local_server())
+
+
+def test_sizes_come_from_settings(monkeypatch):
+    monkeypatch.setattr(http_pool, "limit", 5)
+    monkeypatch.setattr(http_pool, "limit_per_host", 2)
+    pool = PooledSession()
+    assert (pool.limit, pool.limit_per_host) == (5, 2)
@@ -0,0 +1,35 @@
+import asyncio
+from dataclasses import dataclass, field
+
+import pytest
+from websockets.exceptions import ConnectionClosedError
+
+from .ws import conflated_frames
+
+
+@dataclass
+class FakeWS:
+    frames: list = field(default_factory=list)
+
+    async def recv(self):
+        await asyncio.sleep(0)
+        if not self.frames:
+            raise ConnectionClosedError(None, None)
+        return self.frames.pop(0)
+
+
+async def read_slowly(ws: FakeWS, seen: list):
+    async for frame in conflated_frames(ws):
+        seen.append(frame)
+        await asyncio.sleep(0.01)  # slow consumer
+
+
+def test_conflated_frames():
+    ws = FakeWS(frames=list(range(10)))
+    seen: list = []
+
+    with pytest.raises(ConnectionClosedError):
+        asyncio.run(read_slowly(ws, seen))
+
+    # the first frame wakes the consumer, the rest are conflated to the latest
+    assert seen == [0, 9]
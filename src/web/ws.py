@@ -1,6 +1,7 @@
 import asyncio
+import collections
 from dataclasses import dataclass
-from typing import Callable
+from typing import Any, AsyncGenerator, Callable
 
 import websockets
 from websockets.exceptions import ConnectionClosedError, WebSocketException
@@ -17,6 +18,49 @@ async def ws_stream(uri: str, message: str, sleep=0):
             await asyncio.sleep(sleep)
 
 
+async def ws_subscribe_stream(uri: str, message: str, conflate: bool = False):
+    """
+    Subscribe once and yield every pushed frame as it arrives
+
+    If conflate is set, a slow consumer only gets the latest frame
+    """
+    async with websockets.connect(uri=uri) as ws:  # type: ignore
+        await ws.send(message)
+        if conflate:
+            async for data in conflated_frames(ws):
+                yield data
+        else:
+            while True:
+                yield await ws.recv()
+
+
+async def conflated_frames(ws: Any) -> AsyncGenerator:
+    latest: collections.deque = collections.deque(maxlen=1)
+    ready = asyncio.Event()
+
+    async def read():
+        try:
+            while True:
+                latest.append(await ws.recv())
+                ready.set()
+        finally:
+            # wake up the consumer to see the error
+            ready.set()
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            if not latest and not reader.done():
+                await ready.wait()
+                ready.clear()
+            if latest:
+                yield latest.popleft()
+            elif reader.done():
+                reader.result()  # raise the connection error
+    finally:
+        reader.cancel()
+
+
 @dataclass
 class ResilientGenerator:
     retries = 0